@@ -2,7 +2,7 @@ import openpyxl
 import re
 import xml.etree.ElementTree as ET
 import logging
-from typing import List, Tuple, Optional
+from typing import Iterator, List, Tuple, Optional
 
 # Configuration
 xlsx_path = r'C:/NikWorckSpase/Testingfiles/pdfToXML/26580476.xlsx'
@@ -10,6 +10,10 @@ output_xml_path = xlsx_path.replace(".xlsx", "_references.xml")
 END_MARKER_TEXT = "This content downloaded from"
 PAGE_PATTERN = r"\b(page\.?)\s*\d+"
 TIME_PATTERN = r"\b\d{1,2}:\d{2}(:\d{2})?\b"
+START_PATTERN = r"^\d+[\.\)]?\s+.*"
+
+TIME_REGEX = re.compile(TIME_PATTERN)
+START_REGEX = re.compile(START_PATTERN)
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -24,8 +28,7 @@ def is_smaller_than_main_text(current_font_size: Optional[int], main_text_font_s
 
 def matches_start_pattern(text: str) -> bool:
     """Check if text matches the start pattern of a reference."""
-    start_pattern = r"^\d+[\.\)]?\s+.*"
-    return bool(re.match(start_pattern, text))
+    return START_REGEX.match(text) is not None
 
 def contains_end_marker(text: str) -> bool:
     """Check if text contains the end marker."""
@@ -33,68 +36,93 @@ def contains_end_marker(text: str) -> bool:
 
 def matches_time_pattern(text: str) -> bool:
     """Check if text matches a time pattern (HH:MM or HH:MM:SS)."""
-    return bool(re.search(TIME_PATTERN, text))
+    return TIME_REGEX.search(text) is not None
 
 def extract_references_from_xlsx(xlsx_path: str) -> List[Tuple[int, str, str]]:
     """Extracts references from an XLSX file."""
+    references = []
+    for reference in iter_references_from_xlsx(xlsx_path):
+        references.append(reference)
+        logging.info(f"Saved reference #{reference[0]} from sheet {reference[2]}")
+    logging.info(f"Extracted {len(references)} references from {xlsx_path}")
+    return references
+
+def sheet_row_count(sheet) -> int:
+    """Number of rows of a read-only sheet, counted if the file has no dimensions"""
+    if sheet.max_row is not None:
+        return sheet.max_row
+    sheet.reset_dimensions()
+    return sum(1 for _ in sheet.iter_rows(values_only=True))
+
+def iter_references_from_xlsx(xlsx_path: str) -> Iterator[Tuple[int, str, str]]:
+    """
+    Yields the references of an XLSX file as (number, text, sheet name)
+
+    The workbook is opened read-only: rows are parsed from the sheet XML as
+    they are read and the font of a cell is looked up in the styles table, so
+    the memory use does not grow with the size of the workbook.
+    """
     try:
-        workbook = openpyxl.load_workbook(xlsx_path, data_only=False)
+        workbook = openpyxl.load_workbook(xlsx_path, read_only=True, data_only=False)
         logging.info(f"Opened workbook: {xlsx_path}")
     except Exception as e:
         logging.error(f"Error opening XLSX file: {e}")
-        return []
+        return
 
-    references = []
     current_ref_num = 1
     threshold_found = False
     main_text_font_size = None
 
-    for sheet_name in workbook.sheetnames:
-        sheet = workbook[sheet_name]
-        row_count = sheet.max_row
-        start_row = row_count // 2
+    try:
+        for sheet_name in workbook.sheetnames:
+            sheet = workbook[sheet_name]
+            start_row = max(sheet_row_count(sheet) // 2, 1)
 
-        current_reference = []
-        rows = list(sheet.iter_rows(min_row=start_row, values_only=False))
-        logging.info(f"Processing sheet: {sheet_name}, starting from row {start_row}")
+            current_reference = []
+            logging.info(f"Processing sheet: {sheet_name}, starting from row {start_row}")
 
-        for i, row in enumerate(rows):
-            for cell in row:
-                if cell.value and isinstance(cell.value, str):
-                    current_font_size = cell.font.size if cell.font and contains_lowercase(cell.value) else None
+            for row in sheet.iter_rows(min_row=start_row):
+                for cell in row:
+                    value = cell.value
+                    if not value or not isinstance(value, str):
+                        continue
+
+                    font = cell.font if contains_lowercase(value) else None
+                    current_font_size = font.size if font else None
                     if main_text_font_size is None and current_font_size:
                         main_text_font_size = current_font_size
 
-
-                    if (matches_start_pattern(cell.value) or
+                    if (matches_start_pattern(value) or
                         (is_smaller_than_main_text(current_font_size, main_text_font_size) and current_font_size != main_text_font_size) or
                         threshold_found):
                         threshold_found = True
-                        current_reference.append(cell.value.strip())
-                        logging.debug(f"Collecting reference text: '{cell.value.strip()}'")
+                        current_reference.append(value.strip())
+                        logging.debug(f"Collecting reference text: '{value.strip()}'")
 
-
-                    if contains_end_marker(cell.value) or matches_time_pattern(cell.value) or cell.value.strip() == "":
+                    has_end_marker = contains_end_marker(value)
+                    if has_end_marker or matches_time_pattern(value) or value.strip() == "":
 
                         if current_reference:
-                            save_reference(current_reference, current_ref_num, references, sheet_name)
+                            yield make_reference(current_reference, current_ref_num, sheet_name)
                             current_reference = []
                             current_ref_num += 1
                         threshold_found = False
-                        if contains_end_marker(cell.value):
+                        if has_end_marker:
                             break
+    finally:
+        workbook.close()
 
-    workbook.close()
-    logging.info(f"Extracted {len(references)} references from {xlsx_path}")
-    return references
-
-def save_reference(current_reference: List[str], current_ref_num: int, references: List[Tuple[int, str, str]], sheet_name: str):
-    """Saves the current reference and appends it to the references list."""
+def make_reference(current_reference: List[str], current_ref_num: int, sheet_name: str) -> Tuple[int, str, str]:
+    """Joins the collected lines of a reference into (number, text, sheet name)."""
     full_reference = " ".join(current_reference).strip()
     # Удаляем маркер end_marker из текста, если он присутствует
     if END_MARKER_TEXT in full_reference:
         full_reference = full_reference.split(END_MARKER_TEXT)[0].strip()
-    references.append((current_ref_num, full_reference, sheet_name))
+    return current_ref_num, full_reference, sheet_name
+
+def save_reference(current_reference: List[str], current_ref_num: int, references: List[Tuple[int, str, str]], sheet_name: str):
+    """Saves the current reference and appends it to the references list."""
+    references.append(make_reference(current_reference, current_ref_num, sheet_name))
     logging.info(f"Saved reference #{current_ref_num} from sheet {sheet_name}")
 
 def save_references_to_xml(references: List[Tuple[int, str, str]], output_xml_path: str):
@@ -1,16 +1,17 @@
 import openpyxl
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Sequence, Tuple
 import xml.etree.ElementTree as ET
 import pandas as pd
 import numpy as np
 import logging
-import regex as re
 import glob
 import os
 import json
 from dataclasses import dataclass
 import csv
 from pathlib import Path
+from text_patterns import (HEBREW_LETTER, LATIN_LETTER, ASCENDER, DESCENDER, NOT_YOD, BIDI_CONTROL,
+                           DIGITS)
 #from difflib import SequenceMatcher
 
 # Unicode direction marks
@@ -32,12 +33,92 @@ BIDI_CHARS = [
     '\u2069',  # POP DIRECTIONAL ISOLATE
 ]
 
+# Word direction flags (bidi_dir / bidi_mark columns, see add_bidi_flags)
+DIR_NEUTRAL = 0
+DIR_RTL = 1
+DIR_LTR = 2
 
 
-@dataclass
+
+def classify_word(text: str) -> Tuple[int, int]:
+    """
+    Direction flags of a word
+
+    Returns:
+        (direction: RTL if it has a Hebrew letter, else LTR if it has a Latin letter, else neutral,
+         direction set by a trailing bidi mark or neutral)
+    """
+    if HEBREW_LETTER.search(text):
+        direction = DIR_RTL
+    elif LATIN_LETTER.search(text):
+        direction = DIR_LTR
+    else:
+        direction = DIR_NEUTRAL
+
+    if text.endswith(uni_ltr):
+        mark = DIR_LTR
+    elif text.endswith(uni_rtl):
+        mark = DIR_RTL
+    else:
+        mark = DIR_NEUTRAL
+    return direction, mark
+
+
+def add_bidi_flags(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the bidi_dir and bidi_mark columns (classify_word of every word) to a sheet, in place"""
+    text = df["text"]
+    text = text.where(text.notna(), "").astype(str)
+    df["bidi_dir"] = np.select([text.str.contains(HEBREW_LETTER.pattern), text.str.contains(LATIN_LETTER.pattern)],
+                               [DIR_RTL, DIR_LTR], DIR_NEUTRAL).astype(np.int8)
+    df["bidi_mark"] = np.select([text.str.endswith(uni_ltr), text.str.endswith(uni_rtl)],
+                                [DIR_LTR, DIR_RTL], DIR_NEUTRAL).astype(np.int8)
+    return df
+
+
+LINE_TOLERANCE = 10  # pixels tolerance for considering words as same line
+
+
+def cluster_line_ids(tops, tolerance: float = LINE_TOLERANCE) -> np.ndarray:
+    """
+    Line number of every word, for words sorted by top
+
+    A word starts a new line when its top differs by more than tolerance from the top
+    of the word before it; a missing top continues the line. Works on a paragraph
+    as well as on a whole page in one call.
+
+    Args:
+        tops: Top coordinates in sorted order
+        tolerance: Maximal top difference of consecutive words on one line
+
+    Returns:
+        Array of line numbers (0, 0, 1, ...) aligned with tops
+    """
+    tops = np.asarray(tops, dtype=float)
+    if len(tops) == 0:
+        return np.zeros(0, dtype=np.intp)
+    # NaN differences compare False, so they never break a line
+    breaks = np.abs(np.diff(tops)) > tolerance
+    return np.concatenate(([0], np.cumsum(breaks)))
+
+
+class TypesetWord:
+    """Word of a line for typeset_words"""
+    __slots__ = ("text", "left", "dir", "mark")
+
+    def __init__(self, text: str, left, direction: int = None, mark: int = None):
+        self.text = text
+        self.left = left
+        if direction is None or mark is None:
+            direction, mark = classify_word(text)
+        self.dir = direction
+        self.mark = mark
+
+
+
+@dataclass(frozen=True)
 class footnoteConfig:
-    """Configuration settings for footnote extraction"""
-    exclusion_phrases: List[str]
+    """Configuration settings for footnote extraction (per-journal values: journal_profiles.json)"""
+    exclusion_phrases: Sequence[str]
     start_row: int
     bottom_margin_min: float = 1605
     # for tarbitz 1680(1605better) for lecohotenu 1655 meghillot 1667 shenmishivri 1663 sibra 1703 zion 1689
@@ -67,11 +148,15 @@ class footnoteProcessor:
     def __init__(self, config: footnoteConfig):
         self.config = config
         self.continuing_footnote = ""
+        self.continuing_footnote_rows = []  # worksheet rows of continuing_footnote
         self.continuing_footnote_page = None
         self.all_pages_data = []
         self.current_page_index = 0
         self.check_current_page_index = 0
         self.main_texts = {}  # Dictionary to store main text for each page
+        self._page_analysis = {}  # page name -> (source DataFrame, validated DataFrame, paragraphs)
+        # the heights are font sizes (pdf_span_source), not glyph heights of Tesseract
+        self.exact_font_sizes = False
 
     def _validate_and_prepare_dataframe(self, df: pd.DataFrame, page_name: str) -> Optional[pd.DataFrame]:
         # Проверка на None или пустой DataFrame
@@ -107,10 +192,13 @@ class footnoteProcessor:
 
         return df
 
-    def typeset_words(self, words: list):
+    def typeset_words(self, words: List[TypesetWord]):
         """
         Reorder the word list according to bidi marks
         (switch to RTL when the words begins with a Hebrew letter)
+
+        The direction flags of the words are precomputed (TypesetWord), so a line
+        costs one sort and one pass.
         """
         reordered_words = []
         reverse_span = []
@@ -119,35 +207,15 @@ class footnoteProcessor:
         if word_num <= 1:
             return words
 
-        # DEBUGGING: Let's add logging for verification
-        # print(f"DEBUG: typeset_words called with {word_num} words")
-        # print(f"DEBUG: First word: '{words[0].text}', left: {words[0].left}")
-
-        # sort the words from right to left
-        words_sorted_rl = sorted(words, key=lambda w: -w.left)
-        words_sorted_lr = sorted(words, key=lambda w: w.left)
-
-        # FIX 3: Improved sort order selection logic
-        if len(words) >= 2:
-            # Check if there is Hebrew text in the first words
-            has_hebrew_in_first_words = any(re.search(r'[א-ת]', w.text) for w in words[:3])
-
-            if has_hebrew_in_first_words:
-                # For Hebrew text we use right to left sorting
-                words = words_sorted_rl
-            else:
-                # For English/Latin - left to right
-                words = words_sorted_lr
+        # Hebrew text in the first words: right to left order, else left to right
+        if any(w.dir == DIR_RTL for w in words[:3]):
+            words = sorted(words, key=lambda w: -w.left)
         else:
-            words = words_sorted_rl
+            words = sorted(words, key=lambda w: w.left)
 
         # We define the main direction
-        if len(words) >= 2 and words[1].left < words[0].left:
-            dir = 'rtl'
-        else:
-            dir = 'ltr'
-
-        main_dir = dir
+        main_dir = DIR_RTL if words[1].left < words[0].left else DIR_LTR
+        dir = main_dir
 
         for (i_w, w) in enumerate(words):
             if w.text == '':
@@ -160,29 +228,22 @@ class footnoteProcessor:
             else:
                 reverse_span.append(w)
 
-            # Improved direction switching logic
-            if w.text.endswith(uni_ltr):
-                dir = 'ltr'
-            elif w.text.endswith(uni_rtl):
-                dir = 'rtl'
-            elif i_w + 1 < word_num:
-                next_word = words[i_w + 1]
-                # Checking Hebrew letters to determine direction
-                if re.search(r'[א-ת]', next_word.text):
-                    dir = 'rtl'
-                elif re.search(r'[a-zA-Z]', next_word.text):
-                    dir = 'ltr'
+            # a trailing bidi mark sets the direction, else the letters of the next word
+            if w.mark != DIR_NEUTRAL:
+                dir = w.mark
+            elif i_w + 1 < word_num and words[i_w + 1].dir != DIR_NEUTRAL:
+                dir = words[i_w + 1].dir
 
             if dir != prev_dir and prev_dir != main_dir:
-                if main_dir == 'rtl':
-                    reordered_words = reordered_words + reverse_span[::-1]
+                if main_dir == DIR_RTL:
+                    reordered_words.extend(reverse_span[::-1])
                 else:
                     reordered_words = reverse_span[::-1] + reordered_words
                 reverse_span = []
 
         if len(reverse_span) > 0:
-            if main_dir == 'rtl':
-                reordered_words = reordered_words + reverse_span[::-1]
+            if main_dir == DIR_RTL:
+                reordered_words.extend(reverse_span[::-1])
             else:
                 reordered_words = reverse_span[::-1] + reordered_words
 
@@ -200,23 +261,15 @@ class footnoteProcessor:
         """
         height = word_span.height
         text = word_span.text
+        if self.exact_font_sizes:
+            return height
 
 
-        # Symbols with UPPER ascenders
-        upper_chars_hebrew = 'ל'  # lamed
-        upper_chars_latin = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'  # Все заглавные латинские
-        upper_chars_latin_ascenders = 'bdfhklt'  # Строчные с верхними выносными
+        # Check for the presence of upper extensions (lamed, Latin capitals, bdfhklt)
+        has_upper = ASCENDER.search(text) is not None
 
-        # Symbols with DECLINERS
-        lower_chars_hebrew = 'ךןףץק'  # final forms + qof
-        lower_chars_latin = 'gjpqy'  # Строчные с нижними выносными
-
-        # Check for the presence of upper extensions
-        has_upper = (re.search(f'[{upper_chars_hebrew}{upper_chars_latin}{upper_chars_latin_ascenders}]',
-                               text) is not None)
-
-        # Check for the presence of lower extensions
-        has_lower = (re.search(f'[{lower_chars_hebrew}{lower_chars_latin}]', text) is not None)
+        # Check for the presence of lower extensions (final forms + qof, gjpqy)
+        has_lower = DESCENDER.search(text) is not None
 
         # Font size calculation logic
         if not has_upper and not has_lower:
@@ -250,21 +303,12 @@ class footnoteProcessor:
             Boolean indicating if the word only has standard-height characters
         """
 
-        # Symbols with UPPER ascenders
-        upper_chars_hebrew = 'ל'  # lamed
-        upper_chars_latin = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'  # Все заглавные
-        upper_chars_latin_ascenders = 'bdfhklt'  # Строчные с верхними выносными
-
-        # Symbols with DECLINERS
-        lower_chars_hebrew = 'ךןףץק'  # final forms + qof
-        lower_chars_latin = 'gjpqy'  # Строчные с нижними выносными
-
-        has_upper = (re.search(f'[{upper_chars_hebrew}{upper_chars_latin}{upper_chars_latin_ascenders}]',
-                               word) is not None)
-        has_lower = (re.search(f'[{lower_chars_hebrew}{lower_chars_latin}]', word) is not None)
+        # Symbols with UPPER ascenders and with DECLINERS (see calc_font_size)
+        has_upper = ASCENDER.search(word) is not None
+        has_lower = DESCENDER.search(word) is not None
 
         # Check that the word does not consist only of 'י' (yod)
-        has_not_yod = (re.search(r'[^י]', word) is not None)
+        has_not_yod = NOT_YOD.search(word) is not None
 
         # A word has only a base height if:
         # - No ascenders AND
@@ -288,6 +332,8 @@ class footnoteProcessor:
                 columns = next(data)
                 df = pd.DataFrame(data, columns=columns)
                 df["Page"] = sheet_name
+                if "text" in df.columns:
+                    add_bidi_flags(df)
                 sheet_data.append(df)
 
             workbook.close()
@@ -297,6 +343,23 @@ class footnoteProcessor:
             logging.error(f"Error opening XLSX file: {e}")
             return []
 
+    def _analyze_page(self, df: pd.DataFrame, page_name: str) -> Tuple[Optional[pd.DataFrame], List[dict]]:
+        """Validate a page and split it into paragraphs once per workbook
+
+        The next-page lookahead and the processing of that page itself share the result.
+
+        Returns:
+            Tuple of the validated DataFrame (None if the page is not usable) and its paragraphs
+        """
+        cached = self._page_analysis.get(page_name)
+        if cached is not None and cached[0] is df:
+            return cached[1], cached[2]
+
+        validated = self._validate_and_prepare_dataframe(df, page_name)
+        paragraph_data = self._split_into_paragraphs(validated, page_name) if validated is not None else []
+        self._page_analysis[page_name] = (df, validated, paragraph_data)
+        return validated, paragraph_data
+
     def _split_into_paragraphs(self, df: pd.DataFrame, page_name: str) -> List[dict]:
         """Split DataFrame into paragraphs based on confidence values and font sizes"""
         current_paragraph = []
@@ -471,33 +534,19 @@ class footnoteProcessor:
         if "top" in paragraph_df.columns:
             # Sort by top coordinate to maintain line order
             sorted_df = paragraph_df.sort_values('top')
+            text = sorted_df["text"]
+            sorted_df = sorted_df[text.notna() & (text.astype(str).str.strip() != "")]
+            if sorted_df.empty:
+                return ""
 
-            # Group consecutive rows with similar 'top' values (same line)
-            lines = []
-            current_line_rows = []
-            previous_top = None
-            line_tolerance = 10  # pixels tolerance for considering rows as same line
+            # Words with similar 'top' values are on the same line
+            line_ids = cluster_line_ids(sorted_df["top"].to_numpy())
+            line_starts = np.flatnonzero(np.diff(line_ids)) + 1
+            rows = sorted_df.to_dict('records')
 
-            for _, row in sorted_df.iterrows():
-                if pd.notna(row["text"]) and str(row["text"]).strip():
-                    current_top = row["top"]
-
-                    # If this is a new line (different top coordinate)
-                    if (previous_top is not None and
-                            abs(current_top - previous_top) > line_tolerance):
-                        # Process the previous line
-                        if current_line_rows:
-                            line_text = self._process_line_text(current_line_rows)
-                            if line_text:
-                                lines.append(line_text)
-                            current_line_rows = []
-
-                    current_line_rows.append(row)
-                    previous_top = current_top
-
-            # Process the last line
-            if current_line_rows:
-                line_text = self._process_line_text(current_line_rows)
+            lines = []
+            for start, end in zip([0, *line_starts], [*line_starts, len(rows)]):
+                line_text = self._process_line_text(rows[start:end])
                 if line_text:
                     lines.append(line_text)
 
@@ -513,50 +562,27 @@ class footnoteProcessor:
         if not line_rows:
             return ""
 
-        # Convert to DataFrame if it's a list of dictionaries
-        if isinstance(line_rows, list):
-            line_df = pd.DataFrame(line_rows)
-        else:
-            line_df = line_rows
-
-        text_parts = []
-
-        #Improved checking for Hebrew/RTL text
-        has_rtl = False
-        for _, row in line_df.iterrows():
-            if pd.notna(row["text"]):
-                text = str(row["text"])
-                # Check for Hebrew letters (more reliable than \p{bc=R})
-                if re.search(r'[א-ת]', text):
-                    has_rtl = True
-                    break
-                # Additional check for RTL symbols
-                if re.search(r'\p{bc=R}', text):
-                    has_rtl = True
-                    break
+        # rows (Series or dicts) of the line
+        if isinstance(line_rows, pd.DataFrame):
+            line_rows = line_rows.to_dict('records')
+        rows = [row for row in line_rows if pd.notna(row["text"])]
 
         # FIX 2: ALWAYS use typeset_words if left coordinates are present
         # (in older versions this could always work)
-        if "left" in line_df.columns and len(line_df) > 1:
-            # Convert DataFrame rows to word objects
-            class WordObj:
-                def __init__(self, text, left):
-                    self.text = text
-                    self.left = left
-
-            word_objs = []
-            for _, row in line_df.iterrows():
-                if pd.notna(row["text"]):
-                    word_objs.append(WordObj(str(row["text"]), row["left"]))
+        if "left" in line_rows[0] and len(line_rows) > 1:
+            # the direction flags come from the sheet (add_bidi_flags) when it has them
+            has_flags = "bidi_dir" in line_rows[0]
+            word_objs = [TypesetWord(str(row["text"]), row["left"],
+                                     row["bidi_dir"] if has_flags else None,
+                                     row["bidi_mark"] if has_flags else None)
+                         for row in rows]
 
             # ALWAYS apply bidi reordering if there are coordinates
             reordered_words = self.typeset_words(word_objs)
             text_parts = [w.text for w in reordered_words]
         else:
             # Fallback: Regular processing без координат
-            for _, row in line_df.iterrows():
-                if pd.notna(row["text"]):
-                    text_parts.append(str(row["text"]))
+            text_parts = [str(row["text"]) for row in rows]
 
         return " ".join(text_parts).strip()
 
@@ -616,6 +642,10 @@ class footnoteProcessor:
 
     def _extract_footnotes(self, paragraph_df: pd.DataFrame, page_name: str = None) -> List[str]:
         """Extract individual footnotes from a paragraph, with line separation using |"""
+        return [self._get_paragraph_text(seg) for seg in self._extract_footnote_segments(paragraph_df, page_name)]
+
+    def _extract_footnote_segments(self, paragraph_df: pd.DataFrame, page_name: str = None) -> List[pd.DataFrame]:
+        """Split a footnote paragraph into the word rows of its individual footnotes"""
         # Stage 1: basic segmentation by double -1 confidence
         footnote_segments = []
         current_rows = []
@@ -651,14 +681,12 @@ class footnoteProcessor:
         for segment in split_once:
             parts = self._split_by_left_threshold(segment, page_name)
             split_twice.extend(parts)
+        return split_twice
 
-        # Reconstruct texts from final segments with line separation
-        footnotes = []
-        for i, seg in enumerate(split_twice, 1):
-            # Use the new line-aware text extraction
-            text = self._get_paragraph_text(seg)
-            footnotes.append(text)
-        return footnotes
+    @staticmethod
+    def _source_rows(segment: pd.DataFrame, page_name: str) -> List[Tuple[str, int]]:
+        """(sheet, worksheet row) of the words of a segment; row 1 of a sheet is the header"""
+        return [(page_name, int(idx) + 2) for idx in segment.index]
 
     #this function created to spliat combine footnotes
     def _split_by_left_threshold(self, segment: pd.DataFrame, page_name: str = None) -> List[pd.DataFrame]:
@@ -784,12 +812,8 @@ class footnoteProcessor:
         next_df = self.all_pages_data[self.current_page_index + 1]
         next_page_name = next_df["Page"].iloc[0] if "Page" in next_df.columns else "Unknown"
 
-        next_df = self._validate_and_prepare_dataframe(next_df, next_page_name)
-        if next_df is None:
-            return None
-
-        paragraph_data = self._split_into_paragraphs(next_df, next_page_name)
-        if not paragraph_data:
+        next_df, paragraph_data = self._analyze_page(next_df, next_page_name)
+        if next_df is None or not paragraph_data:
             return None
 
         all_footnotes = self.process_paragraphs_with_numerical_data(next_df, next_page_name)
@@ -869,7 +893,7 @@ class footnoteProcessor:
         if not current_ref_lines.empty and "top" in current_ref_lines.columns and "left" in current_ref_lines.columns:
             last_line = current_ref_lines["top"].max()
             min_left_value = current_ref_lines["left"].min()
-            matches = re.findall(r"\d+", page_name)
+            matches = DIGITS.findall(page_name)
             page_num = int(matches[0]) if matches else None
             if page_num%2 == 0:
                 left_margin_threshold = self.config.left_margin_threshold_even
@@ -905,11 +929,10 @@ class footnoteProcessor:
     def process_paragraphs_with_numerical_data(self, df: pd.DataFrame, page_name: str) -> List[dict]:
         """Process paragraphs in a sheet to extract footnotes with numerical data and proper validation"""
         all_paragraphs_data = []
-        df = self._validate_and_prepare_dataframe(df, page_name)
+        df, paragraph_data = self._analyze_page(df, page_name)
         if df is None:
             return []
         # print(f"{page_name} process_paragraphs_with_numerical_data")
-        paragraph_data = self._split_into_paragraphs(df, page_name)
 
         # ADD: Calculate statistics for the main text (excluding the last paragraph)
         # Collect words from the main text for statistics
@@ -1064,12 +1087,10 @@ class footnoteProcessor:
 
     def _process_paragraphs(self, df: pd.DataFrame, page_name: str, collected_footnotes: List[dict]):
         """Process paragraphs in a sheet to extract footnotes and main text using word-level font size calculation"""
-        df = self._validate_and_prepare_dataframe(df, page_name)
+        df, paragraph_data = self._analyze_page(df, page_name)
         if df is None:
             return
 
-        paragraph_data = self._split_into_paragraphs(df, page_name)
-
         # Extract main text before processing footnotes (предварительно)
         main_text = self._extract_main_text(paragraph_data)
 
@@ -1206,31 +1227,44 @@ class footnoteProcessor:
                 if font_size_check_passed and size_check_passed:
                     # print("Processing last paragraph as FOOTNOTES")
 
-                    footnotes = self._extract_footnotes(last_paragraph["data"])
+                    # split with the odd page threshold, as _extract_footnotes(data) always did
+                    segments = self._extract_footnote_segments(last_paragraph["data"])
+                    footnotes = [self._get_paragraph_text(seg) for seg in segments]
+                    # worksheet rows of every footnote, kept in step with the texts
+                    sources = [self._source_rows(seg, page_name) for seg in segments]
 
                     if page_name == "p01" and footnotes and '*' in footnotes[0]:
                         footnotes.pop(0)
+                        sources.pop(0)
 
                     # Check for first footnote split using only_full_line
                     first_split_footnote = self.split_combined_first_footnote(last_paragraph["data"], page_name)
                     if first_split_footnote:
+                        split_words = len(first_split_footnote)
                         collected_footnotes.append({
                             "page": page_name,
-                            "text": " ".join(first_split_footnote)
+                            "text": " ".join(first_split_footnote),
+                            "continued": False,
+                            "source_rows": self._source_rows(last_paragraph["data"].iloc[1:1 + split_words], page_name)
                         })
                         if footnotes:
-                            footnotes[0] = " ".join(footnotes[0].split()[len(first_split_footnote):])
+                            footnotes[0] = " ".join(footnotes[0].split()[split_words:])
+                            sources[0] = sources[0][split_words:]
                             if not footnotes[0].strip():
                                 footnotes.pop(0)
+                                sources.pop(0)
 
                     if self.continuing_footnote:
                         if footnotes:
                             footnotes[0] = self.continuing_footnote + footnotes[0]
+                            sources[0] = self.continuing_footnote_rows + sources[0]
                             initial_page = self.continuing_footnote_page
                         else:
                             footnotes = [self.continuing_footnote]
+                            sources = [self.continuing_footnote_rows]
                             initial_page = self.continuing_footnote_page
                         self.continuing_footnote = ""
+                        self.continuing_footnote_rows = []
                         self.continuing_footnote_page = None
                     else:
                         initial_page = None
@@ -1239,6 +1273,9 @@ class footnoteProcessor:
                         last_ref = footnotes[-1]
                         ref_lines = self._get_footnote_lines(last_paragraph["data"], last_ref)
                         self._check_footnote_continuation(ref_lines, footnotes, initial_page, page_name)
+                        if len(sources) > len(footnotes):
+                            # the last footnote goes on on the next page
+                            self.continuing_footnote_rows = sources.pop(-1)
 
                         # print(f" page_name: {page_name},")
                         # f"\t footnotes: {footnotes}")
@@ -1247,11 +1284,13 @@ class footnoteProcessor:
                             if i == 0 and initial_page:
                                 # print(f" i: {i},\t initial_page: {initial_page}")
                                 collected_footnotes.append(
-                                    {"page": initial_page, "text": ref}
+                                    {"page": initial_page, "text": ref, "continued": True,
+                                     "source_rows": sources[i]}
                                 )
                             else:
                                 collected_footnotes.append(
-                                    {"page": page_name, "text": ref}
+                                    {"page": page_name, "text": ref, "continued": False,
+                                     "source_rows": sources[i]}
                                 )
 
                         last_paragraph_processed_as_footnote = True
@@ -1272,15 +1311,65 @@ class footnoteProcessor:
         self.main_texts[page_name] = main_text if main_text else ""
         # print(f"Final main text length for {page_name}: {len(self.main_texts[page_name])} characters")
 
-    def process_workbook(self, xlsx_path: str) -> Tuple[List[Dict[str, str]], Dict[str, str]]:
+    def process_workbook(self, xlsx_path: str, on_page: Callable[[str, str], None] = None
+                         ) -> Tuple[List[Dict[str, str]], Dict[str, str]]:
         """Process the entire workbook for footnotes and main text
 
+        Args:
+            xlsx_path: Tesseract workbook
+            on_page: Called with (page name, main text) as soon as a page is processed
+
         Returns:
             Tuple containing:
             - List of footnote dictionaries
             - Dictionary of main text by page
         """
-        self.all_pages_data = self._extract_data_from_xlsx(xlsx_path)
+        return self.process_pages(self._extract_data_from_xlsx(xlsx_path), on_page)
+
+    def process_pdf(self, pdf_path: str, on_page: Callable[[str, str], None] = None, dpi: float = None
+                    ) -> Tuple[List[Dict[str, str]], Dict[str, str]]:
+        """Process a born-digital PDF from its text layer, without OCR (see pdf_span_source)
+
+        The word heights are the font sizes of the PDF, so calc_font_size uses them as they are.
+
+        Args:
+            pdf_path: PDF file
+            on_page: As for process_workbook
+            dpi: Resolution of the pixel coordinates, default pdf_span_source.DEFAULT_DPI
+
+        Returns:
+            Same as process_workbook
+        """
+        from pdf_span_source import DEFAULT_DPI, read_pdf_pages
+
+        pages = read_pdf_pages(pdf_path, dpi or DEFAULT_DPI)
+        for df in pages:
+            add_bidi_flags(df)
+        self.exact_font_sizes = True
+        try:
+            return self.process_pages(pages, on_page)
+        finally:
+            self.exact_font_sizes = False
+
+    def process_pages(self, pages: List[pd.DataFrame], on_page: Callable[[str, str], None] = None
+                      ) -> Tuple[List[Dict[str, str]], Dict[str, str]]:
+        """Process already loaded page DataFrames (as returned by _extract_data_from_xlsx)
+
+        The pages are only converted to numeric columns in place, so the same
+        list can be processed again with another configuration. on_page is called
+        with (page name, main text) after every page that has a main text; pages
+        without text (blank sheets, missing columns) are left out, as in main_texts.
+
+        Returns:
+            Tuple containing:
+            - List of footnote dictionaries
+            - Dictionary of main text by page
+        """
+        self.all_pages_data = pages
+        self._page_analysis = {}
+        self.continuing_footnote = ""
+        self.continuing_footnote_rows = []  # worksheet rows of continuing_footnote
+        self.continuing_footnote_page = None
         all_footnotes = []
         self.main_texts = {}  # Reset main texts
 
@@ -1288,6 +1377,9 @@ class footnoteProcessor:
             self.current_page_index = i
             page_name = df["Page"].iloc[0] if "Page" in df.columns else "Unknown"
             self._process_paragraphs(df, page_name, all_footnotes)
+            main_text = self.main_texts.get(page_name)
+            if on_page is not None and main_text is not None:
+                on_page(page_name, main_text)
 
         return all_footnotes, self.main_texts
 
@@ -1353,43 +1445,77 @@ def clean_bidi_marks_regex(text: str) -> str:
     if not text:
         return text
 
-    import regex as re
     # Удаляем все Unicode bidi control characters
-    cleaned_text = re.sub(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]', '', text)
+    cleaned_text = BIDI_CONTROL.sub('', text)
     return cleaned_text
 
+def csv_output_path(output_path: str, suffix: str = "") -> str:
+    """CSV file written next to an XML output (name.xml -> name<suffix>.csv)"""
+    return os.path.splitext(output_path)[0] + suffix + ".csv"
+
+
+class StreamingCsvWriter:
+    """
+    CSV file written row by row, in the same format as DataFrame.to_csv(index=False,
+    encoding="utf-8-sig"). Used as a context manager, the file is removed again
+    if the block fails, so a half written CSV is never left behind.
+    """
+
+    def __init__(self, csv_path: str, headers: Sequence[str]):
+        self.path = csv_path
+        self.rows = 0
+        self._file = open(csv_path, 'w', newline='', encoding='utf-8-sig')
+        self._writer = csv.writer(self._file, lineterminator=os.linesep)
+        self._writer.writerow(headers)
+
+    def writerow(self, values: Sequence):
+        self._writer.writerow(values)
+        self.rows += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if exc_type is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class FootnoteCsvWriter(StreamingCsvWriter):
+    """
+    Footnotes CSV of an issue: the main text rows can be written while the pages are
+    processed (pass write_main_text as on_page), the footnote rows follow at the end
+    because a footnote may still be continued on the next page
+    """
+    HEADERS = ["Type", "Page", "Number", "Content"]
+
+    def __init__(self, csv_path: str):
+        super().__init__(csv_path, self.HEADERS)
+
+    def write_main_text(self, page_name: str, text: str):
+        self.writerow(("MainText", page_name, "", text))
+
+    def write_footnotes(self, footnotes: List[dict]):
+        for ref_number, ref in enumerate(footnotes, 1):
+            self.writerow(("footnote", ref["page"], ref_number, ref["text"]))
+
+
 def save_footnotes_to_csv(footnotes: List[dict], main_texts: Dict[str, str], output_path: str):
-    """Save footnotes and main texts to a CSV file."""
-    rows = []
-
-    # First, let's add the main text for each page
-    for page_name, text in main_texts.items():
-        rows.append({
-            "Type": "MainText",
-            "Page": page_name,
-            "Number": "",
-            "Content": text
-        })
-
-    # Now let's add all the links
-    ref_number = 1
-    for ref in footnotes:
-        rows.append({
-            "Type": "footnote",
-            "Page": ref["page"],
-            "Number": ref_number,
-            "Content": ref["text"]
-        })
-        ref_number += 1
-
-    df = pd.DataFrame(rows)
-    csv_path = output_path.replace(".xml", ".csv")
-    df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    """Save footnotes and main texts to a CSV file next to output_path."""
+    csv_path = csv_output_path(output_path)
+    with FootnoteCsvWriter(csv_path) as writer:
+        for page_name, text in main_texts.items():
+            writer.write_main_text(page_name, text)
+        writer.write_footnotes(footnotes)
     logging.info(f"footnotes and main text saved to {csv_path}")
 
 
-def save_footnotes_to_xml(footnotes: List[dict], main_texts: Dict[str, str], output_path: str):
-    """Save footnotes and main text to XML file with global sequential numbering"""
+def build_footnotes_xml(footnotes: List[dict], main_texts: Dict[str, str]) -> ET.ElementTree:
+    """XML tree of footnotes and main text with global sequential numbering"""
     root = ET.Element("footnotes")
 
     # Add main text for each page
@@ -1439,8 +1565,12 @@ def save_footnotes_to_xml(footnotes: List[dict], main_texts: Dict[str, str], out
             ref_element.text = cleaned_footnote_text
             ref_number += 1
 
-    tree = ET.ElementTree(root)
-    tree.write(output_path, encoding="utf-8", xml_declaration=True)
+    return ET.ElementTree(root)
+
+
+def save_footnotes_to_xml(footnotes: List[dict], main_texts: Dict[str, str], output_path: str):
+    """Save footnotes and main text to XML file with global sequential numbering"""
+    build_footnotes_xml(footnotes, main_texts).write(output_path, encoding="utf-8", xml_declaration=True)
     logging.info(f"footnotes and main text saved to {output_path}")
 
 
@@ -1460,7 +1590,7 @@ def extract_issue_number_from_filename(filename: str) -> str:
     base_name = base_name.replace("_footnotes", "").replace("_references", "")
 
     # Extract numbers from filename
-    numbers = re.findall(r'\d+', base_name)
+    numbers = DIGITS.findall(base_name)
     if numbers:
         return numbers[-1]  # Return the last number found
 
@@ -1495,55 +1625,47 @@ def extract_journal_name_from_path(file_path: str) -> str:
     return "Unknown"
 
 
-def create_csv_report(report_data: list, output_folder: str, journal_name: str):
-    """
-    Create CSV report with processing results
-
-    Args:
-        report_data: List of dictionaries with processing results
-        output_folder: Folder to save the report
-        journal_name: Name of the journal
-    """
-    if not report_data:
-        #print("No data to create report")
-        return
-
-    csv_filename = f"{journal_name}_processing_report.csv"
-    csv_path = os.path.join(output_folder, csv_filename)
-
-    # Define CSV headers
-    headers = [
-        "Issue_Number",
-        "Filename",
-        "Meta_References_Count",
-        "Meta_biggest_label_number",
-        "Collected_Footnotes_Count",
-        "Has_Meta_File",
-        "Processing_Status"
-    ]
-
-    try:
-        with open(csv_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=headers)
-            writer.writeheader()
-
-            for row in report_data:
-                writer.writerow(row)
+# Columns of the per-journal processing report
+REPORT_HEADERS = [
+    "Issue_Number",
+    "Filename",
+    "Meta_References_Count",
+    "Meta_biggest_label_number",
+    "Collected_Footnotes_Count",
+    "Has_Meta_File",
+    "Processing_Status"
+]
 
-        print(f"CSV report saved to: {csv_path}")
 
-    except Exception as e:
-        print(f"Error creating CSV report: {e}")
+def report_csv_path(output_folder: str, journal_name: str) -> str:
+    return os.path.join(output_folder, f"{journal_name}_processing_report.csv")
 
 
 def main():
-    global bottom_margin_max, footnotes_spleat_threshold_odd, merge_footnotes_threshold_odd, \
-        footnotes_spleat_threshold_even, merge_footnotes_threshold_even, width_threshold_even, width_threshold_odd, \
-        bottom_margin_min, left_margin_threshold_even, left_margin_threshold_odd, total_left
-
-    # Ask user for processing mode
+    import argparse
+    import time
     import tkinter as tk
     from tkinter import messagebox, filedialog
+    from journal_profiles import footnote_config_for_path
+    from columnar_export import EXPORT_FORMATS, check_export_format, export_issue
+    from run_checkpoint import (RunCheckpoint, IncrementalReportWriter, checkpoint_path,
+                                STATUS_DONE, STATUS_ERROR, STATUS_SKIPPED)
+
+    parser = argparse.ArgumentParser(description='Extract footnotes and main text from Tesseract workbooks')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip the files finished by an interrupted run of the same output folder')
+    parser.add_argument('--export', choices=EXPORT_FORMATS,
+                        help='Also write a partitioned columnar dataset of footnotes and main text')
+    parser.add_argument('--export-dir', dest='export_dir',
+                        help='Dataset folder, default: <output folder>/dataset')
+    args = parser.parse_args()
+    if args.export:
+        try:
+            check_export_format(args.export)
+        except ValueError as e:
+            parser.error(str(e))
+
+    # Ask user for processing mode
 
     root = tk.Tk()
     root.withdraw()  # Hide the main window
@@ -1606,134 +1728,33 @@ def main():
     # Extract journal name for the report
     journal_name = extract_journal_name_from_path(input_folder_path)
 
-    # List to store report data
-    report_data = []
+    # Thresholds of the journal and mode (printed/scanned) from journal_profiles.json
+    config = footnote_config_for_path(input_folder_path)
+
+    # Per-file results are journaled as they finish; the report is written row by row.
+    # A single file is appended to the journal, so the resume history of the folder is kept
+    checkpoint = RunCheckpoint(checkpoint_path(output_folder_path, journal_name), resume=args.resume,
+                               append=not choice)
+    previous_rows = checkpoint.finished_rows()
+    report = IncrementalReportWriter(report_csv_path(output_folder_path, journal_name), REPORT_HEADERS,
+                                     previous_rows)
+
+    for row in previous_rows:
+        if row["Processing_Status"] == "Processed":
+            total_processed_files += 1
+            total_footnotes_found += row["Collected_Footnotes_Count"]
+            total_meta_references += row["Meta_References_Count"]
+    if args.resume:
+        print(f"Resuming: {len(checkpoint.entries)} files already in the checkpoint")
 
     for xlsx_file in xlsx_files:
         filename = os.path.basename(xlsx_file)
         base_name = os.path.splitext(filename)[0]
         issue_number = extract_issue_number_from_filename(filename)
 
-        mode = 'printed' if 'ocr-tess-printed' in input_folder_path.lower() else 'scanned'
-        path = input_folder_path.lower()
-
-        # Set parameters based on journal and mode (existing logic)
-        if 'tarbiz' in path:
-            if mode == 'printed':
-                bottom_margin_min, bottom_margin_max = 1605, 1670
-                left_margin_threshold_even, left_margin_threshold_odd = 195, 295
-                width_threshold_even, width_threshold_odd = 1070, 1160
-                merge_footnotes_threshold_even, merge_footnotes_threshold_odd = 1050, 1080
-                footnotes_spleat_threshold_even, footnotes_spleat_threshold_odd = 1070, 1170
-                total_left = 7200 #?
-            else:  # scanned
-                bottom_margin_min, bottom_margin_max = 1605, 1695
-                left_margin_threshold_even = left_margin_threshold_odd = 195
-                width_threshold_even = width_threshold_odd = 1095
-                merge_footnotes_threshold_even = merge_footnotes_threshold_odd = 1070
-                footnotes_spleat_threshold_even = footnotes_spleat_threshold_odd = 1085
-                total_left = 7200
-
-
-        elif 'meghillot' in path:
-            if mode == 'printed':
-                bottom_margin_min, bottom_margin_max = 1660, 1670
-                left_margin_threshold_even = left_margin_threshold_odd = 220
-                width_threshold_even = width_threshold_odd = 1025
-                merge_footnotes_threshold_even, merge_footnotes_threshold_odd = 1050, 1140
-                footnotes_spleat_threshold_even, footnotes_spleat_threshold_odd = 1080, 1150
-                total_left = 6700  # ?
-            else:
-                bottom_margin_min, bottom_margin_max = 1670, 1680
-                left_margin_threshold_even = left_margin_threshold_odd = 220
-                width_threshold_even = width_threshold_odd = 1030
-                merge_footnotes_threshold_even = merge_footnotes_threshold_odd = 1027
-                footnotes_spleat_threshold_even = footnotes_spleat_threshold_odd = 1050
-                total_left = 6700
-
-
-        elif 'shenmishivri' in path:
-
-            if mode == 'printed':
-                bottom_margin_min, bottom_margin_max = 1645, 1720  # Slightly adjusted for scanned variance
-                left_margin_threshold_even = left_margin_threshold_odd = 208  # Slightly reduced for scanned
-                width_threshold_even = width_threshold_odd = 1075  # Slightly reduced for scanned
-                merge_footnotes_threshold_even = merge_footnotes_threshold_odd = 1045  # More conservative merging
-                footnotes_spleat_threshold_even = footnotes_spleat_threshold_odd = 1055  # More conservative splitting
-                total_left = 7000  # Reduced for scanned documents
-
-            else:  # scanned - TUNED PARAMETERS
-                bottom_margin_min, bottom_margin_max = 1645, 1720  # Slightly adjusted for scanned variance
-                left_margin_threshold_even = left_margin_threshold_odd = 208  # Slightly reduced for scanned
-                width_threshold_even = width_threshold_odd = 1075  # Slightly reduced for scanned
-                merge_footnotes_threshold_even = merge_footnotes_threshold_odd = 1045  # More conservative merging
-                footnotes_spleat_threshold_even = footnotes_spleat_threshold_odd = 1055  # More conservative splitting
-                total_left = 7000  # Reduced for scanned documents
-
-        elif 'sibra' in path:
-            if mode == 'printed':
-                bottom_margin_min, bottom_margin_max = 1680, 1712
-                left_margin_threshold_even, left_margin_threshold_odd = 195, 295
-                width_threshold_even = width_threshold_odd = 1090
-                merge_footnotes_threshold_even, merge_footnotes_threshold_odd = 1050, 1140
-                footnotes_spleat_threshold_even, footnotes_spleat_threshold_odd = 1080, 1150
-                total_left = 7200  # ?
-            else:
-                bottom_margin_min, bottom_margin_max = 1680, 1712
-                left_margin_threshold_even = left_margin_threshold_odd = 195
-                width_threshold_even = width_threshold_odd = 1090
-                merge_footnotes_threshold_even = merge_footnotes_threshold_odd = 1070
-                footnotes_spleat_threshold_even = footnotes_spleat_threshold_odd = 1080
-                total_left = 7200  # ?
-
-        elif 'lecohotenu' in path:
-            if mode == 'printed':
-                bottom_margin_min, bottom_margin_max = 1655, 1675
-                left_margin_threshold_even = left_margin_threshold_odd = 220
-                width_threshold_even = width_threshold_odd = 1080
-                merge_footnotes_threshold_even, merge_footnotes_threshold_odd = 1050, 1140
-                footnotes_spleat_threshold_even, footnotes_spleat_threshold_odd = 1070, 1140
-                total_left = 6700  # ?
-            else:
-                bottom_margin_min, bottom_margin_max = 1655, 1675
-                left_margin_threshold_even = left_margin_threshold_odd = 220
-                width_threshold_even = width_threshold_odd = 1060
-                merge_footnotes_threshold_even = merge_footnotes_threshold_odd = 950
-                footnotes_spleat_threshold_even = footnotes_spleat_threshold_odd = 1050
-                total_left = 7200  # ?
-
-        elif 'zion' in path:
-            if mode == 'printed':
-                bottom_margin_min, bottom_margin_max = 1680, 1698
-                left_margin_threshold_even = left_margin_threshold_odd = 225
-                width_threshold_even = width_threshold_odd = 1080
-                merge_footnotes_threshold_even, merge_footnotes_threshold_odd = 1050, 1140
-                footnotes_spleat_threshold_even, footnotes_spleat_threshold_odd = 1080, 1150
-                total_left = 7200  # ?
-            else:
-                bottom_margin_min, bottom_margin_max = 1680, 1698
-                left_margin_threshold_even = left_margin_threshold_odd = 225
-                width_threshold_even = width_threshold_odd = 1080
-                merge_footnotes_threshold_even = merge_footnotes_threshold_odd = 1070
-                footnotes_spleat_threshold_even = footnotes_spleat_threshold_odd = 1080
-                total_left = 7200  # ?
-
-        else:
-            # Default settings
-            if mode == 'printed':
-                bottom_margin_min, bottom_margin_max = 1671, 1680
-                left_margin_threshold_even = left_margin_threshold_odd = 220
-                width_threshold_even = width_threshold_odd = 1077
-                merge_footnotes_threshold_even, merge_footnotes_threshold_odd = 1050, 1140
-                footnotes_spleat_threshold_even, footnotes_spleat_threshold_odd = 1080, 1150
-                total_left = 7200
-            else:
-                bottom_margin_min, bottom_margin_max = 1671, 1680
-                left_margin_threshold_even = left_margin_threshold_odd = 220
-                width_threshold_even = width_threshold_odd = 1077
-                merge_footnotes_threshold_even = merge_footnotes_threshold_odd = 1070
-                footnotes_spleat_threshold_even = footnotes_spleat_threshold_odd = 1080
-                total_left = 7200
+        if checkpoint.is_finished(filename):
+            continue
+        started = time.perf_counter()
 
         # Check for JSON with metadata (only for folder processing)
         meta_info = {"number_of_references": 0, "biggest_label_number": 0, "has_meta_file": False}
@@ -1745,28 +1766,14 @@ def main():
                     meta_data = json.load(jf)
                 if meta_data.get("skipped", False) is True:
                     logging.info(f"File {filename} skipped according to meta file {base_name}.json")
+                    checkpoint.record(filename, STATUS_SKIPPED, seconds=time.perf_counter() - started)
                     continue
 
                 # Extract meta information
-                processor = footnoteProcessor(footnoteConfig(exclusion_phrases=[]))
+                processor = footnoteProcessor(config)
                 meta_info = processor.extract_meta_info(json_file)
 
-        processor = footnoteProcessor(footnoteConfig(
-            exclusion_phrases=["https://about,jstor.org/terms", "[תרביץ", "(תרביץ", "https://about.jstor.org/terms",
-                               "https://aboutjstor.org/terms"],
-            start_row=1,
-            bottom_margin_min=bottom_margin_min,
-            bottom_margin_max=bottom_margin_max,
-            left_margin_threshold_even=left_margin_threshold_even,
-            left_margin_threshold_odd=left_margin_threshold_odd,
-            width_threshold_even=width_threshold_even,
-            width_threshold_odd=width_threshold_odd,
-            merge_footnotes_threshold_even=merge_footnotes_threshold_even,
-            merge_footnotes_threshold_odd=merge_footnotes_threshold_odd,
-            footnotes_spleat_threshold_even=footnotes_spleat_threshold_even,
-            footnotes_spleat_threshold_odd=footnotes_spleat_threshold_odd,
-            total_left=total_left
-        ))
+        processor = footnoteProcessor(config)
 
         # Initialize row data for CSV report
         row_data = {
@@ -1780,13 +1787,15 @@ def main():
         }
 
         try:
-            # Process the workbook
-            all_footnotes, main_texts = processor.process_workbook(xlsx_file)
-
-            # Save in xml and csv
+            # Process the workbook, the csv is written while the pages are processed
             output_xml = os.path.join(output_folder_path, base_name + "_footnotes.xml")
+            with FootnoteCsvWriter(csv_output_path(output_xml)) as csv_writer:
+                all_footnotes, main_texts = processor.process_workbook(xlsx_file, csv_writer.write_main_text)
+                csv_writer.write_footnotes(all_footnotes)
             save_footnotes_to_xml(all_footnotes, main_texts, output_xml)
-            save_footnotes_to_csv(all_footnotes, main_texts, output_xml)
+            if args.export:
+                export_issue(all_footnotes, main_texts, args.export_dir or os.path.join(output_folder_path, "dataset"),
+                             journal_name, issue_number, args.export)
 
             ref_count = len(all_footnotes)
             total_footnotes_found += ref_count
@@ -1809,14 +1818,18 @@ def main():
             print(f"Error processing {filename}: {e}")
             row_data["Processing_Status"] = f"Error: {str(e)}"
 
-        report_data.append(row_data)
+        status = STATUS_DONE if row_data["Processing_Status"] == "Processed" else STATUS_ERROR
+        checkpoint.record(filename, status, row_data, time.perf_counter() - started)
+        report.write(row_data)
 
-    create_csv_report(report_data, output_folder_path, journal_name)
+    checkpoint.close()
+    report.close()
 
     # general statistics
     print("\n====================================")
     print("TOTAL SUMMARY:")
     print(f"Journal: {journal_name}")
+    print(f"Report: {report.path}")
     print(f"Processed files: {total_processed_files}")
     print(f"Total footnotes found: {total_footnotes_found}")
     print(f"Total meta references: {total_meta_references}")
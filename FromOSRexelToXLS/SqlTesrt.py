@@ -1,23 +1,23 @@
 import mysql.connector
 from tabulate import tabulate
 
-# Database connection parameters
-db_config = {
-    "host": "localhost",
-    "user": "nikita",
-    "password": "nikita!##123",
-    "database": "academic_journals",
-    "charset": "utf8mb4",
-    "collation": "utf8mb4_unicode_ci"
-}
+from db_pool import get_connection
+from db_schema import check_schema
+from issue_keys import issue_key
+from issue_stats import refresh_all
+from reconcile_issues import diff_with_database
 
 
 def connect_to_db():
-    """Establish connection to the database"""
+    """Get a connection from the pool (settings: see db_pool), None if the schema is not up to date"""
     try:
-        conn = mysql.connector.connect(**db_config)
+        conn = get_connection()
+        # the reports read issue_stats (migration 4)
+        if not check_schema(conn):
+            conn.close()
+            return None
         return conn
-    except mysql.connector.Error as err:
+    except (mysql.connector.Error, ValueError) as err:
         print(f"Connection error: {err}")
         return None
 
@@ -29,20 +29,18 @@ def check_all_files(conn):
     print("📁 ВСЕ ФАЙЛЫ В БАЗЕ ДАННЫХ")
     print("=" * 80)
 
+    # counts from issue_stats (kept up to date by the importer, see issue_stats.py)
     query = """
     SELECT 
         j.journal_name AS 'Журнал',
         i.issue_number AS 'Выпуск',
-        COUNT(DISTINCT mt.page_name) AS 'Страниц',
-        COUNT(DISTINCT dr.reference_id) AS 'Ссылок',
-        COUNT(DISTINCT ft.footnote_id) AS 'Сносок',
+        COALESCE(s.page_count, 0) AS 'Страниц',
+        COALESCE(s.reference_count, 0) AS 'Ссылок',
+        COALESCE(s.footnote_count, 0) AS 'Сносок',
         i.created_at AS 'Дата импорта'
     FROM journals j
     JOIN issues i ON j.journal_id = i.journal_id
-    LEFT JOIN main_texts mt ON i.issue_id = mt.issue_id
-    LEFT JOIN document_references dr ON i.issue_id = dr.issue_id
-    LEFT JOIN footnotes_table ft ON i.issue_id = ft.issue_id
-    GROUP BY j.journal_name, i.issue_number, i.created_at
+    LEFT JOIN issue_stats s ON i.issue_id = s.issue_id
     ORDER BY j.journal_name, CAST(i.issue_number AS UNSIGNED)
     """
 
@@ -69,17 +67,14 @@ def check_journal_files(conn, journal_name):
     query = """
     SELECT 
         i.issue_number AS 'Выпуск',
-        COUNT(DISTINCT mt.page_name) AS 'Страниц',
-        COUNT(DISTINCT dr.reference_id) AS 'Ссылок',
-        COUNT(DISTINCT ft.footnote_id) AS 'Сносок',
+        COALESCE(s.page_count, 0) AS 'Страниц',
+        COALESCE(s.reference_count, 0) AS 'Ссылок',
+        COALESCE(s.footnote_count, 0) AS 'Сносок',
         i.created_at AS 'Дата импорта'
     FROM issues i
     JOIN journals j ON i.journal_id = j.journal_id
-    LEFT JOIN main_texts mt ON i.issue_id = mt.issue_id
-    LEFT JOIN document_references dr ON i.issue_id = dr.issue_id
-    LEFT JOIN footnotes_table ft ON i.issue_id = ft.issue_id
+    LEFT JOIN issue_stats s ON i.issue_id = s.issue_id
     WHERE j.journal_name = %s
-    GROUP BY i.issue_number, i.created_at
     ORDER BY CAST(i.issue_number AS UNSIGNED)
     """
 
@@ -98,32 +93,22 @@ def check_journal_files(conn, journal_name):
 
 def check_missing_files(conn, expected_files):
     """Проверить какие файлы отсутствуют в базе данных"""
-    cursor = conn.cursor()
-
     print("🔍 ПРОВЕРКА ОТСУТСТВУЮЩИХ ФАЙЛОВ")
     print("=" * 50)
 
-    # Получить все существующие файлы
-    query = """
-    SELECT CONCAT(LOWER(j.journal_name), i.issue_number) as file_pattern
-    FROM journals j
-    JOIN issues i ON j.journal_id = i.journal_id
-    """
-
-    cursor.execute(query)
-    existing_files = {row[0] for row in cursor.fetchall()}
-
+    # the issue of a file as the importer derives it, one join for all files (see reconcile_issues)
+    files_by_key = {}
     missing_files = []
     for expected_file in expected_files:
-        # Преобразуем имя файла в паттерн (убираем расширения и префиксы)
-        file_pattern = expected_file.lower()
-        file_pattern = file_pattern.replace('_footnotes.xml', '')
-        file_pattern = file_pattern.replace('_footnotes.csv', '')
-        file_pattern = file_pattern.replace('.xml', '')
-        file_pattern = file_pattern.replace('.csv', '')
-
-        if file_pattern not in existing_files:
+        key = issue_key(expected_file)
+        if key is None:
             missing_files.append(expected_file)
+        else:
+            files_by_key.setdefault(key, []).append(expected_file)
+
+    missing, _ = diff_with_database(conn, files_by_key)
+    for key in missing:
+        missing_files.extend(files_by_key[key])
 
     if missing_files:
         print("❌ Отсутствующие файлы:")
@@ -132,7 +117,6 @@ def check_missing_files(conn, expected_files):
     else:
         print("✅ Все ожидаемые файлы найдены в базе данных")
 
-    cursor.close()
     return missing_files
 
 
@@ -143,19 +127,21 @@ def get_database_stats(conn):
     print("📊 СТАТИСТИКА БАЗЫ ДАННЫХ")
     print("=" * 40)
 
-    stats_queries = [
-        ("Журналов", "SELECT COUNT(*) FROM journals"),
-        ("Выпусков", "SELECT COUNT(*) FROM issues"),
-        ("Страниц с текстом", "SELECT COUNT(*) FROM main_texts"),
-        ("Ссылок", "SELECT COUNT(*) FROM document_references"),
-        ("Сносок", "SELECT COUNT(*) FROM footnotes_table")
-    ]
+    # the large tables are summed from issue_stats instead of counting their rows
+    query = """
+    SELECT
+        (SELECT COUNT(*) FROM journals),
+        (SELECT COUNT(*) FROM issues),
+        COALESCE(SUM(page_count), 0),
+        COALESCE(SUM(reference_count), 0),
+        COALESCE(SUM(footnote_count), 0)
+    FROM issue_stats
+    """
+    cursor.execute(query)
+    counts = cursor.fetchone()
 
-    stats = []
-    for name, query in stats_queries:
-        cursor.execute(query)
-        count = cursor.fetchone()[0]
-        stats.append([name, count])
+    names = ["Журналов", "Выпусков", "Страниц с текстом", "Ссылок", "Сносок"]
+    stats = [[name, int(count)] for name, count in zip(names, counts)]
 
     print(tabulate(stats, headers=['Параметр', 'Количество'], tablefmt='grid'))
     cursor.close()
@@ -172,16 +158,13 @@ def search_file(conn, search_term):
     SELECT 
         j.journal_name AS 'Журнал',
         i.issue_number AS 'Выпуск',
-        COUNT(DISTINCT mt.page_name) AS 'Страниц',
-        COUNT(DISTINCT dr.reference_id) AS 'Ссылок',
-        COUNT(DISTINCT ft.footnote_id) AS 'Сносок'
+        COALESCE(s.page_count, 0) AS 'Страниц',
+        COALESCE(s.reference_count, 0) AS 'Ссылок',
+        COALESCE(s.footnote_count, 0) AS 'Сносок'
     FROM journals j
     JOIN issues i ON j.journal_id = i.journal_id
-    LEFT JOIN main_texts mt ON i.issue_id = mt.issue_id
-    LEFT JOIN document_references dr ON i.issue_id = dr.issue_id
-    LEFT JOIN footnotes_table ft ON i.issue_id = ft.issue_id
+    LEFT JOIN issue_stats s ON i.issue_id = s.issue_id
     WHERE LOWER(CONCAT(j.journal_name, i.issue_number)) LIKE %s
-    GROUP BY j.journal_name, i.issue_number
     ORDER BY j.journal_name, CAST(i.issue_number AS UNSIGNED)
     """
 
@@ -213,10 +196,11 @@ def main():
         print("3. Общая статистика")
         print("4. Поиск файла")
         print("5. Проверить отсутствующие файлы")
+        print("6. Пересчитать статистику выпусков")
         print("0. Выход")
         print("=" * 60)
 
-        choice = input("Выберите действие (0-5): ").strip()
+        choice = input("Выберите действие (0-6): ").strip()
 
         if choice == '1':
             check_all_files(conn)
@@ -246,6 +230,13 @@ def main():
             else:
                 print("Список файлов пуст")
 
+        elif choice == '6':
+            cursor = conn.cursor()
+            count = refresh_all(cursor)
+            conn.commit()
+            cursor.close()
+            print(f"✅ Статистика пересчитана для {count} выпусков")
+
         elif choice == '0':
             break
 
@@ -0,0 +1,266 @@
+"""
+Bibliographic abbreviation matcher
+
+All abbreviation labels of a paper are compiled into one Aho-Corasick automaton,
+so a footnote is scanned once, in time linear in its length, no matter how many
+labels the metadata lists. Labels and texts are compared after the same
+normalization (bidi marks and punctuation other than quotes removed, quote
+forms unified, whitespace collapsed, lower case), so ב"ר and ב״ר match the
+label ב"ר but not the word בר; offsets of the matches refer to the original
+text.
+"""
+
+import json
+import logging
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import regex as re
+
+from OSTtessToPDF import BIDI_CHARS
+
+# same quote forms as abbreviations.uniQuotes, plus the geresh forms
+UNI_QUOTES = "«»“”„‟❝❞❠〞〟＂🙶🙷🙸״"
+UNI_SINGLE_QUOTES = "׳‘’‚‛`´"
+
+_CHAR_MAP = {ord(c): '"' for c in UNI_QUOTES}
+_CHAR_MAP.update({ord(c): "'" for c in UNI_SINGLE_QUOTES})
+_BIDI = frozenset(BIDI_CHARS)
+
+# Titles of the metadata reference blocks that hold bibliographic abbreviations
+ABBREVIATION_TITLE_PATTERN = re.compile(r'^([א-ת]+ )?ה?(קיצורים|ציונים|קיצורים וציונים)( ה?ביבי?ליו?גרא?פי+ים)?$')
+ABBREVIATION_TITLES = ('קיצורים', 'רשימת קיצורים', 'רשימת הקיצורים', 'קיצורים ביבליוגרפים')
+_TRAILING_NON_LETTERS = re.compile(r'\P{L}+$')
+
+# Label of an abbreviation entry: text before a separator, else the first word, else text before a comma
+LABEL_PATTERNS = (
+    re.compile(r'^([^=:—\-]+)[=:—\-]'),
+    re.compile(r'^(\S+)'),
+    re.compile(r'^([^,]+)'),
+)
+# Punctuation that is not part of a label; quotes are kept, they mark Hebrew abbreviations (ב"ר, ש"ס)
+_LABEL_CLEANUP = re.compile(r'[^\w\s֐-׿' + re.escape('"\'' + UNI_QUOTES + UNI_SINGLE_QUOTES) + ']')
+
+
+def normalize_with_offsets(text: str) -> Tuple[str, List[int]]:
+    """
+    Normalize text for matching and keep the position of every normalized character
+
+    Returns:
+        (normalized text, offsets) - offsets[i] is the index in text of normalized character i
+    """
+    chars = []
+    offsets = []
+    previous_space = True  # drops leading whitespace
+    for i, c in enumerate(text):
+        if c in _BIDI or _LABEL_CLEANUP.match(c):
+            continue
+        if c.isspace():
+            if previous_space:
+                continue
+            c = ' '
+            previous_space = True
+        else:
+            previous_space = False
+            c = c.translate(_CHAR_MAP)
+            lower = c.lower()
+            if len(lower) == 1:
+                c = lower
+        chars.append(c)
+        offsets.append(i)
+
+    if chars and chars[-1] == ' ':
+        chars.pop()
+        offsets.pop()
+    return ''.join(chars), offsets
+
+
+def normalize_label(label: str) -> str:
+    return normalize_with_offsets(label)[0]
+
+
+def is_bibliographic_abbreviations(ref_type: str) -> bool:
+    """Check if the title of a metadata reference block is a bibliographic abbreviations list"""
+    if ABBREVIATION_TITLE_PATTERN.search(ref_type):
+        return True
+    if 'קיצור' in ref_type and 'מקורות' in ref_type:
+        return True
+    return _TRAILING_NON_LETTERS.sub('', ref_type) in ABBREVIATION_TITLES
+
+
+def extract_abbreviation_label(abbrev_text: str) -> str:
+    """Extract the abbreviation label from the text of an abbreviation entry"""
+    abbrev_text = abbrev_text.strip()
+    for pattern in LABEL_PATTERNS:
+        match = pattern.search(abbrev_text)
+        if match:
+            label = _LABEL_CLEANUP.sub('', match.group(1).strip())
+            if len(label) > 1:
+                return label
+    return ""
+
+
+def load_metadata_content(metadata_file_path: str) -> Optional[dict]:
+    """
+    Read a JSTOR metadata file
+
+    Returns:
+        The 'content' section, or None if the paper was skipped
+    """
+    with open(metadata_file_path, "r", encoding="utf-8") as f:
+        metadata_str = f.read()
+
+    # If a PDF file was skipped, the metadata file starts with 'skipped:'
+    if metadata_str.startswith('skipped'):
+        return None
+
+    metadata = json.loads(metadata_str)
+    if metadata.get("skipped", False) is True:
+        return None
+    return metadata.get("content", metadata)
+
+
+def abbreviations_from_metadata(metadata: dict) -> List[dict]:
+    """
+    Collect the bibliographic abbreviations listed in the metadata reference blocks
+
+    Returns:
+        List of {"label", "info", "source": "metadata"}
+    """
+    abbreviations = []
+    blocks = (metadata or {}).get("references", {}).get("reference_blocks", [])
+    for block in blocks:
+        ref_type = block.get("title", "")
+        if not ref_type or not is_bibliographic_abbreviations(ref_type):
+            continue
+        for ref in block.get("reference_content", []):
+            if "text" not in ref:
+                continue
+            label = extract_abbreviation_label(ref["text"])
+            if label:
+                abbreviations.append({"label": label, "info": ref["text"], "source": "metadata"})
+    return abbreviations
+
+
+class AbbreviationMatcher:
+    """Aho-Corasick automaton over the abbreviation labels of a paper"""
+
+    def __init__(self, labels: Iterable[str]):
+        # state 0 is the root; goto[state] maps a character to the next state
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # labels ending in a state, including those reached by the failure links
+        self._output: List[List[Tuple[str, int]]] = [[]]
+        self.labels = []
+
+        seen = set()
+        for label in labels:
+            key = normalize_label(label or "")
+            if key and key not in seen:
+                seen.add(key)
+                self.labels.append(label)
+                self._add(key, label)
+        self._build_failure_links()
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _add(self, key: str, label: str):
+        state = 0
+        for c in key:
+            next_state = self._goto[state].get(c)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][c] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((label, len(key)))
+
+    def _build_failure_links(self):
+        # breadth first; the children of the root fail back to the root
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and c not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(c, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def _scan(self, normalized: str):
+        """Yield (label, start, end) in normalized coordinates for every label occurrence"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for i, c in enumerate(normalized):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            for label, length in output[state]:
+                yield label, i - length + 1, i + 1
+
+    def find_matches(self, text: str) -> List[Tuple[str, int, int]]:
+        """
+        Find all labels occurring in text as whole words
+
+        Returns:
+            List of (label, start, end) with offsets into text, ordered by start (longest first)
+        """
+        if not text or not self.labels:
+            return []
+
+        normalized, offsets = normalize_with_offsets(text)
+        matches = []
+        for label, start, end in self._scan(normalized):
+            if start > 0 and normalized[start - 1].isalnum():
+                continue
+            if end < len(normalized) and normalized[end].isalnum():
+                continue
+            matches.append((label, offsets[start], offsets[end - 1] + 1))
+
+        matches.sort(key=lambda m: (m[1], m[1] - m[2]))
+        return matches
+
+    def is_abbreviation_reference(self, text: str) -> Tuple[bool, Optional[str]]:
+        """
+        Check if a footnote is an abbreviation entry, i.e. starts with a label
+        (leading numbers and punctuation are ignored)
+
+        Returns:
+            (True, label) or (False, None)
+        """
+        if not text:
+            return False, None
+
+        first_letter = next((i for i, c in enumerate(text) if c.isalpha()), None)
+        if first_letter is None:
+            return False, None
+
+        for label, start, _ in self.find_matches(text):
+            if start > first_letter:
+                break
+            if start == first_letter:
+                return True, label
+        return False, None
+
+    def filter_footnotes(self, footnotes: List[dict]) -> Tuple[List[dict], List[dict]]:
+        """
+        Split footnotes into regular footnotes and abbreviation entries
+
+        Returns:
+            (regular footnotes, abbreviation footnotes with an added "matched_label")
+        """
+        regular = []
+        abbreviations = []
+        for footnote in footnotes:
+            is_abbrev, label = self.is_abbreviation_reference(footnote.get("text", ""))
+            if is_abbrev:
+                abbreviations.append(dict(footnote, matched_label=label))
+            else:
+                regular.append(footnote)
+
+        logging.info(f"Abbreviation filter: {len(abbreviations)} of {len(footnotes)} footnotes matched")
+        return regular, abbreviations
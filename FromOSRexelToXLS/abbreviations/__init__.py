@@ -17,6 +17,15 @@ from re import Match
 import regex as re
 
 import math
+import bisect
+
+from .label_match import text_letters, LabelMatcher, match_labels
+from text_patterns import heb_full_height, heb_months, heb_month_regex, ref_subtypes_regex
+from text_patterns import asterik_start, asterik_start_regex
+from text_patterns import (ASTERIK_START, LEADING_NON_LETTERS, CLOSING_PUNCT, OPENING_PUNCT, DIRECTION_MARK,
+                           LEADING_WHITESPACE, TRAILING_WHITESPACE, NUMBER_WITH_PUNCT, RTL_RUN, LAMED,
+                           SCAN_DESCENDER, SCAN_EXTENDER, NOT_YOD, LETTER_OR_DIGIT, HEBREW_LETTER,
+                           FULL_HEIGHT, HEBREW_DESCENDER, RTL_LETTER, ONLY_NON_LETTERS)
 import time
 import random
 import httpx
@@ -25,7 +34,6 @@ import httpx
 
 # static
 
-heb_full_height = 'אבגדהוזחטכםמנסעפצרשת'
 uni_ltr = '\u200e'
 uni_rtl = '\u200f'
 
@@ -41,56 +49,26 @@ LineType = Enum('LineType', ['HEADER', 'TEXT', 'FOOTNOTE', 'ABBREV'])
 Fields = Enum('Fields', ['TITLE', 'AUTHOR', 'SOURCE', 'PUBLISHER', 'URL'])
 reverse_paren = dict( [ (ord(x), ord(y)) for x,y in {'[': ']', ']':'[', '(': ')', ')':'('}.items()])
 
-heb_months = [ 'תשרי', 'חשוו?ן', 'כסלי?ו', 'טבת', 'שבט', r"אדר(?:\s[אב]'?)?", 'ניסן', 'אייר', 'סיוו?ן', 'תמוז', 'אב', 'אלול' ]
-heb_month_regex = '(?P<month>(?:'+'|'.join(heb_months)+r')(?:\s*\p{Pd}\s*'+'(?:'+'|'.join(heb_months)+'))?)'
-ref_subtypes_regex = r'^([א-ת]\p{P}?)?\s*(מקורות|מחקרים|טקסטים|עדי נוסח|כתבי יד|מאמרים|ספרות|ספרי |ספרים|עי?תונות|לשון הדיבור|מדרשים?|משנה|תלמוד|מילונים|מקרא.{,15}עדי נוסח|מקרא.{,15}כתבי יד)\s*.{,10}$'
-
 par_indent = 31
 quote_indent = par_indent*2
 
-asterik_start = {
-    'ה?(הרצאה|מחקר|מאמר|חיבור) ',
-    'הער[הת] ה?[המ]ערכת',
-    'מתוך (הרצאה|מחקר|מאמר|חיבור) ',
-    '(ראשיתו|עיקרו) של (מחקר|מאמר|חיבור)',
-    'מוקדש',
-    'להלן רשימת',
-    '(תודה|תודתי)',
-    'אנו מודים ',
-    '(הריני|הרינו|הנני|הננו|אני|אנו|אנחנו|המחבר|המחברים|המחברות) מבקש(ת|ים|ות) להודות ',
-    '(הריני|הרינו|הנני|הננו|אני|אנו|אנחנו|המחבר|המחברים|המחברות) (מודה|מודים|מודות) ',
-    'ברצוני ',
-    'דברים ש',
-    'ה?דברים ',
-    'חלק(ים)? (מה?|מן ה)(דברים|מאמר|עבודה)',
-    'מוקדש ל',
-    'מתוך ',
-    'עיבוד של ',
-    'עיקרי ה?דברים ',
-    'פרק(ים)? מתוך'
-}
-
 dom_impl = getDOMImplementation()
 
-asterik_start_regex = '|'.join(asterik_start)
-
 def clearAllChildren(element:Element):
     children = element.childNodes
     while len(children) > 0:
         element.removeChild(children[0])
 
 def is_asterik_comment(fn_text:str)->bool:
-    fn_text = re.sub(r'^\P{L}*', '', fn_text)
-    return (re.search(asterik_start_regex, fn_text) is not None)
+    fn_text = LEADING_NON_LETTERS.sub('', fn_text)
+    return (ASTERIK_START.search(fn_text) is not None)
 
 def get_text_letters(text:str)->str:
-    letters_all = ''.join(re.findall(r'\p{L}', text))
-    letters_heb = ''.join(re.findall(r'[א-ת]', letters_all))
-    letters_lat = ''.join(re.findall(r'[^א-ת]', letters_all))
-    return {'heb':letters_heb, 'lat':letters_lat, 'combined-20':letters_heb[:10]+letters_lat[:10]}
+    return text_letters(text)
 
 """
 Compare two outputs of get_text_letters
+(to match many labels at once use label_match.LabelMatcher / match_labels)
 """
 def compare_letters(l1, l2, pref_len=10):
 
@@ -110,22 +88,22 @@ def adjust_punct(reverse_span):
     if len(reverse_span) <= 1:
         return
     last_rtl = reverse_span[-1]
-    punct_match_last = re.search(r'[\p{P}\p{S}]*\)'+f'[{uni_rtl}{uni_ltr}]?$', last_rtl.text)
+    punct_match_last = CLOSING_PUNCT.search(last_rtl.text)
 
     first_rtl = reverse_span[0]
-    punct_match_first = re.search(r'^\([\p{P}\p{S}]*', first_rtl.text)
+    punct_match_first = OPENING_PUNCT.search(first_rtl.text)
 
     if punct_match_last is not None:
         punct = punct_match_last.group(0).translate(reverse_paren)[::-1]
-        punct = re.sub(f'[{uni_rtl}{uni_ltr}]', '', punct)
-        last_word = re.sub(r'[\p{P}\p{S}]*\)'+f'[{uni_rtl}{uni_ltr}]?$', '', last_rtl.text)
+        punct = DIRECTION_MARK.sub('', punct)
+        last_word = CLOSING_PUNCT.sub('', last_rtl.text)
         rep_last = replace_ocr_word_text(last_rtl, last_word)
         reverse_span[-1] = rep_last
         reverse_span[0] = replace_ocr_word_text(reverse_span[0], punct+reverse_span[0].text)
 
     if punct_match_first is not None:
         punct = punct_match_first.group(0).translate(reverse_paren)[::-1]
-        first_word = re.sub('^\([\p{P}\p{S}]*', '', first_rtl.text)
+        first_word = OPENING_PUNCT.sub('', first_rtl.text)
         rep_first = replace_ocr_word_text(first_rtl, first_word)
         reverse_span[0] = rep_first
         reverse_span[-1] = replace_ocr_word_text(reverse_span[-1], reverse_span[-1].text+punct)
@@ -137,7 +115,7 @@ def replace_ocr_word_text(w, new_text):
 def revert_no_blanks(text:str):
     if len(text) <= 1:
         return text
-    m_blank_start = re.search(r'^\s+', text)
+    m_blank_start = LEADING_WHITESPACE.search(text)
 
     if m_blank_start is not None:
         l = m_blank_start.end()
@@ -146,7 +124,7 @@ def revert_no_blanks(text:str):
     else:
         b_start = ''
 
-    m_blank_end = re.search(r'\s+$', text)
+    m_blank_end = TRAILING_WHITESPACE.search(text)
     if m_blank_end is not None:
         l = m_blank_end.end()-m_blank_end.start()
         b_end = text[-l:]
@@ -161,7 +139,7 @@ def revert_digits(text:str):
     text_rev_dig = ''
     cur_pos = 0
 
-    digit_matches = list(re.finditer(r'[0-9]+(\p{P}+[0-9]+)?', text))
+    digit_matches = list(NUMBER_WITH_PUNCT.finditer(text))
     if len(digit_matches) == 0:
         return text
 
@@ -185,7 +163,7 @@ def revert_text(text:str, debug=False):
     # rtl_matches = list(re.finditer(r'[\p{Mn}\p{P}\p{Bidi_Class=R}][\p{Zs}\p{P}\p{Mn}\p{Bidi_Class=R}]*[\p{Bidi_Class=R}\p{Mn}\p{P}]+', text))
     # rtl_matches = list(re.finditer(r'[\p{Mn}\p{P}]*\p{Bidi_Class=R}[\p{Zs}\p{P}\p{Mn}\p{Bidi_Class=R}]*[\p{Bidi_Class=R}\p{Mn}\p{P}]+', text))
     # rtl_matches = list(re.finditer(r'(?:[0-9]+[\p{P}\p{Zs}]*)*[\p{Mn}\p{P}]*\p{Bidi_Class=R}[\p{Zs}\p{P}\p{Mn}\p{Bidi_Class=R}]*[\p{Bidi_Class=R}\p{Mn}\p{P}]+', text))
-    rtl_matches = list(re.finditer(r'\p{Mn}?\p{Bidi_Class=R}[\p{Zs}\p{P}\p{Mn}\p{Bidi_Class=R}]*[\p{Bidi_Class=R}\p{Mn}\p{P}]+', text))
+    rtl_matches = list(RTL_RUN.finditer(text))
 
     text_rev = ''
     cur_pos = 0
@@ -224,9 +202,9 @@ def print_to_string(*args, **kwargs):
     return contents
 
 def only_full_line(word:str):
-    has_upper = (re.search('ל', word) is not None)
-    has_lower = (re.search(r'[ךןףץקygqQ]', word) is not None)
-    has_not_yod = (re.search(r'[^י]', word) is not None)
+    has_upper = (LAMED.search(word) is not None)
+    has_lower = (SCAN_DESCENDER.search(word) is not None)
+    has_not_yod = (NOT_YOD.search(word) is not None)
 
     return (not has_upper) and (not has_lower) and has_not_yod
 
@@ -235,14 +213,14 @@ def calc_font_size(word_span):
     height = word_span.height
     text = word_span.text
 
-    if re.search(r'[ךןףץקלygqQ]', text) is None:
+    if SCAN_EXTENDER.search(text) is None:
         if ',' in text:
             font_size = height-3
         else:
             font_size = height
     else:
-        has_upper = (re.search('ל', text) is not None)
-        has_lower = (re.search(r'[ךןףץקygqQ]', text) is not None)
+        has_upper = (LAMED.search(text) is not None)
+        has_lower = (SCAN_DESCENDER.search(text) is not None)
 
         # one of them is True! because of the previous 'if' condition
 
@@ -303,7 +281,56 @@ def load_metadata_url(metadata_url):
     
     return (dict(text=resp))
 
-def add_span_to_blocks(blocks, span):
+class SpanLineIndex:
+    """
+    Word tops and bottoms of the lines built by add_span_to_blocks, kept sorted
+
+    Finds the line of a span with two binary searches per word instead of
+    comparing it with every word of the page. The first line in block and line
+    order wins, like the scan over the blocks.
+    """
+
+    def __init__(self, tolerance=3):
+        self.tolerance = tolerance
+        self._tops = []
+        self._top_keys = []
+        self._bottoms = []
+        self._bottom_keys = []
+        self._keys = dict()
+        self._lines = dict()
+        self._block_keys = dict()
+
+    def find(self, tops_bottoms):
+        """(block, line) of the first line with a word within tolerance, or (None, None)"""
+        best = None
+        for top, bottom in tops_bottoms:
+            for values, keys, value in ((self._tops, self._top_keys, top), (self._bottoms, self._bottom_keys, bottom)):
+                lo = bisect.bisect_left(values, value - self.tolerance)
+                hi = bisect.bisect_right(values, value + self.tolerance)
+                if lo < hi:
+                    key = min(keys[lo:hi])
+                    if best is None or key < best:
+                        best = key
+        if best is None:
+            return None, None
+        return self._lines[best]
+
+    def add(self, block, line, words):
+        """Register the words of a span appended to line of block"""
+        key = self._keys.get(id(line))
+        if key is None:
+            # blocks and lines are only appended, so creation order is list order
+            block_key = self._block_keys.setdefault(id(block), len(self._block_keys))
+            key = (block_key, len(self._keys))
+            self._keys[id(line)] = key
+            self._lines[key] = (block, line)
+        for w in words:
+            for values, keys, value in ((self._tops, self._top_keys, w.top), (self._bottoms, self._bottom_keys, w.top+w.height)):
+                pos = bisect.bisect_right(values, value)
+                values.insert(pos, value)
+                keys.insert(pos, key)
+
+def add_span_to_blocks(blocks, span, line_index=None):
 
     # dbg_word = 'ביתרביץי'
     # dbg_word = 'יצורה'
@@ -315,7 +342,7 @@ def add_span_to_blocks(blocks, span):
 
     line_toler = 6
 
-    words_letter_digit = [w for w in span["words"] if re.search(r'[\p{L}\p{Nd}]', w.text)]
+    words_letter_digit = [w for w in span["words"] if LETTER_OR_DIGIT.search(w.text)]
     if len(words_letter_digit) == 0:
         span["size"] = max([w.height for w in span["words"]])
         right_margin = max([w.left+w.width for w in span["words"]])
@@ -323,7 +350,7 @@ def add_span_to_blocks(blocks, span):
         letter_top = max([w.top for w in span["words"]])
         letter_bottom = min([w.top+w.height for w in span["words"]])
     else:
-        words_letter_heb = [w for w in span["words"] if re.search(r'[א-ת]', w.text)]
+        words_letter_heb = [w for w in span["words"] if HEBREW_LETTER.search(w.text)]
         if len(words_letter_heb) > 0:
             words_letters = words_letter_heb
         else:
@@ -337,12 +364,12 @@ def add_span_to_blocks(blocks, span):
         # then use them to get the font height
         # search for text that does not contain letters that go above or below the line.
 
-        span_containing_full_height = [ sp for sp in spans_for_bbox if re.search(f'[{heb_full_height}0-9a-zA-Z]', sp.text)]
+        span_containing_full_height = [ sp for sp in spans_for_bbox if FULL_HEIGHT.search(sp.text)]
         if len(span_containing_full_height) > 0:
-            span_no_above_letters = [ sp for sp in span_containing_full_height if re.search('ל', sp.text) is None]
+            span_no_above_letters = [ sp for sp in span_containing_full_height if LAMED.search(sp.text) is None]
             if len(span_no_above_letters) > 0:
                 letter_top = min([sp.top for sp in span_no_above_letters])
-            span_no_below_letters = [ sp for sp in span_containing_full_height if re.search(r'[ךןףץק]', sp.text) is None]
+            span_no_below_letters = [ sp for sp in span_containing_full_height if HEBREW_DESCENDER.search(sp.text) is None]
             if len(span_no_below_letters) > 0:
                 letter_bottom = min([w.top+w.height for w in span_no_below_letters])
 
@@ -375,21 +402,24 @@ def add_span_to_blocks(blocks, span):
 
     # check if the line already appeared in another block.
 
-    for block in blocks:
-        for cur_line in block["lines"]:
-            for cur_span in cur_line["spans"]:
-                for cur_word in cur_span["words"]:
-                    for span_word_top_bottom in span_tops_bottoms:
-                        if math.fabs(cur_word.top-span_word_top_bottom[0]) <= 3 or math.fabs(cur_word.top+cur_word.height-span_word_top_bottom[1]) <= 3:
-                            span_line = cur_line
-                            break
+    if line_index is not None:
+        span_block, span_line = line_index.find(span_tops_bottoms)
+    else:
+        for block in blocks:
+            for cur_line in block["lines"]:
+                for cur_span in cur_line["spans"]:
+                    for cur_word in cur_span["words"]:
+                        for span_word_top_bottom in span_tops_bottoms:
+                            if math.fabs(cur_word.top-span_word_top_bottom[0]) <= 3 or math.fabs(cur_word.top+cur_word.height-span_word_top_bottom[1]) <= 3:
+                                span_line = cur_line
+                                break
+                    if span_line is not None:
+                        break
                 if span_line is not None:
                     break
             if span_line is not None:
+                span_block = block
                 break
-        if span_line is not None:
-            span_block = block
-            break
 
     # if it is a new line, check if it is in an existing block
 
@@ -409,6 +439,8 @@ def add_span_to_blocks(blocks, span):
 
     span_line["spans"].append(span)
     span_line["size"] = max([sp["size"] for sp in span_line["spans"]])
+    if line_index is not None:
+        line_index.add(span_block, span_line, span["words"])
 
     # span_line["spans"].sort(key=lambda span: (span["bbox"][1], span["bbox"][2]))
     update_line_bbox(span_line, span["bbox"])
@@ -446,7 +478,7 @@ def typeset_words(words:list, had_rtl=False):
 
     # sort the words from right to left
     words = sorted(words, key=lambda w: -w.left)
-    if re.search('(?=\p{Bidi_Class=Right_to_Left})\p{General_Category=Letter}', words[0].text):
+    if RTL_LETTER.search(words[0].text):
         dir = 'rtl'
     else:
         dir = 'ltr'
@@ -455,9 +487,9 @@ def typeset_words(words:list, had_rtl=False):
         if w.text == '':
             continue
         prev_dir = dir
-        if re.search('(?=\p{Bidi_Class=Right_to_Left})\p{General_Category=Letter}', w.text):
+        if RTL_LETTER.search(w.text):
             dir = 'rtl'
-        elif re.search(r'^\P{L}+$', w.text):
+        elif ONLY_NON_LETTERS.search(w.text):
             pass
         else:
             dir = 'ltr'
@@ -572,7 +604,7 @@ def typeset_words_prev(words:list):
         elif w.text[-1] == uni_rtl and i_w > 0:
             dir = 'rtl'
         elif i_w+1 < word_num and main_dir == 'rtl':
-            if re.search('(?=\p{Bidi_Class=Right_to_Left})\p{General_Category=Letter}', words[i_w+1].text):
+            if RTL_LETTER.search(words[i_w+1].text):
                 dir = 'rtl'
         # elif i_w+1 < word_num and main_dir == 'ltr':
         #     if re.search('(?=\p{Bidi_Class=Left_to_Right})\p{General_Category=Letter}', words[i_w+1].text):
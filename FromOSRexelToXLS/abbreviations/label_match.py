@@ -0,0 +1,151 @@
+"""
+Batch fuzzy matching of labels
+
+Same rule as compare_letters: two labels match when, for one of the letter groups
+('heb', 'lat', 'combined-20') that is longest in either label, the edit distance of
+the first pref_len letters is at most max_distance.
+
+The letter signature of every label is computed once. The distinct prefixes of every
+letter group are indexed by their deletion variants, so a query only measures the few
+prefixes that share a variant with it, and labels sharing a prefix cost a single edit
+distance.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from editdistance import distance
+
+LETTER_KEYS = ('heb', 'lat', 'combined-20')
+
+
+def text_letters(text: str) -> Dict[str, str]:
+    """Single pass version of get_text_letters"""
+    heb = []
+    lat = []
+    for c in text:
+        if c.isalpha():
+            (heb if 'א' <= c <= 'ת' else lat).append(c)
+    letters_heb = ''.join(heb)
+    letters_lat = ''.join(lat)
+    return {'heb': letters_heb, 'lat': letters_lat, 'combined-20': letters_heb[:10] + letters_lat[:10]}
+
+
+class LetterSignature:
+    """Prefixes of the letter groups of a label and the groups of maximal length"""
+    __slots__ = ('prefixes', 'max_keys')
+
+    def __init__(self, letters: Dict[str, str], pref_len: int = 10):
+        max_len = max(len(v) for v in letters.values())
+        self.max_keys = frozenset(k for k in LETTER_KEYS if len(letters[k]) == max_len)
+        self.prefixes = {k: letters[k][:pref_len] for k in LETTER_KEYS}
+
+    @classmethod
+    def from_text(cls, text: str, pref_len: int = 10) -> "LetterSignature":
+        return cls(text_letters(text), pref_len)
+
+
+def deletion_variants(word: str, max_deletions: int) -> set:
+    """All strings obtained from word by deleting up to max_deletions characters"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_deletions):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+class DeletionIndex:
+    """
+    Symmetric deletion index: two strings are within edit distance k only if they share
+    a variant with up to k deletions, so a lookup yields a small candidate set which is
+    then verified with the real edit distance
+    """
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        self._variants: Dict[str, List[str]] = {}
+        self._first_index: Dict[str, int] = {}
+
+    def add(self, word: str, index: int):
+        if word in self._first_index:
+            return
+        self._first_index[word] = index
+        for variant in deletion_variants(word, self.max_distance):
+            self._variants.setdefault(variant, []).append(word)
+
+    def search(self, word: str) -> List[Tuple[int, int]]:
+        """(first label index, distance) of all indexed strings within max_distance of word"""
+        candidates = set()
+        for variant in deletion_variants(word, self.max_distance):
+            candidates.update(self._variants.get(variant, ()))
+
+        found = []
+        for candidate in candidates:
+            d = distance(word, candidate)
+            if d <= self.max_distance:
+                found.append((self._first_index[candidate], d))
+        return found
+
+
+class LabelMatcher:
+    """Index of candidate labels (e.g. the metadata labels of a paper)"""
+
+    def __init__(self, labels: Sequence[str], pref_len: int = 10, max_distance: int = 2):
+        self.labels = list(labels)
+        self.pref_len = pref_len
+        self.max_distance = max_distance
+        self.signatures = [LetterSignature.from_text(label, pref_len) for label in self.labels]
+
+        # per letter group: 'any' holds every label, 'max' only labels for which
+        # the group is one of their longest
+        self._any = {k: DeletionIndex(max_distance) for k in LETTER_KEYS}
+        self._max = {k: DeletionIndex(max_distance) for k in LETTER_KEYS}
+        for i, signature in enumerate(self.signatures):
+            for k in LETTER_KEYS:
+                self._any[k].add(signature.prefixes[k], i)
+                if k in signature.max_keys:
+                    self._max[k].add(signature.prefixes[k], i)
+
+    def match_signature(self, query: LetterSignature) -> Optional[Tuple[int, int]]:
+        """
+        Best matching label for a precomputed signature
+
+        Returns:
+            (label index, edit distance) or None; ties go to the first label
+        """
+        best = None
+        for k in LETTER_KEYS:
+            index = self._any[k] if k in query.max_keys else self._max[k]
+            for i, d in index.search(query.prefixes[k]):
+                if best is None or (d, i) < (best[1], best[0]):
+                    best = (i, d)
+        return best
+
+    def match(self, text: str) -> Optional[Tuple[int, int]]:
+        """Best matching label for a text, see match_signature"""
+        return self.match_signature(LetterSignature.from_text(text, self.pref_len))
+
+    def is_match(self, text: str, label_index: int) -> bool:
+        """compare_letters for a text and one indexed label"""
+        query = LetterSignature.from_text(text, self.pref_len)
+        candidate = self.signatures[label_index]
+        return any(distance(query.prefixes[k], candidate.prefixes[k]) <= self.max_distance
+                   for k in query.max_keys | candidate.max_keys)
+
+
+def match_labels(queries: Sequence[str], labels: Sequence[str],
+                 pref_len: int = 10, max_distance: int = 2) -> List[Optional[Tuple[int, int]]]:
+    """
+    Best match in labels for every query (e.g. OCR labels against the metadata labels of a paper)
+
+    Returns:
+        For every query (label index, edit distance), or None if nothing matches
+    """
+    matcher = LabelMatcher(labels, pref_len, max_distance)
+    cache: Dict[str, Optional[Tuple[int, int]]] = {}
+    results = []
+    for query in queries:
+        if query not in cache:
+            cache[query] = matcher.match(query)
+        results.append(cache[query])
+    return results
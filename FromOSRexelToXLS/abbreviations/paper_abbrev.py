@@ -32,12 +32,16 @@ from xml.dom import getDOMImplementation
 from traitlets import Bool
 
 from . import LineType
-from . import load_metadata_url, print_to_string, add_span_to_blocks
+from . import load_metadata_url, print_to_string, add_span_to_blocks, SpanLineIndex
 from . import split_words_by_col, split_words_by_regex,is_centered
-from . import uni_ltr, uni_rtl, ref_subtypes_regex, quoteTranslate
+from . import uni_ltr, uni_rtl, quoteTranslate
 from . import is_asterik_comment, get_text_letters, typeset_words
 from . import abbrev_indentation, abbrev_single_line_indentation, column_tolerance
 from . import dom_impl
+from text_patterns import (HEBREW_LETTER, TRAILING_NON_LETTERS, WHITESPACE, REF_SUBTYPES, DIRECTION_MARK,
+                           EQUALS_SEPARATOR, COLON_SEPARATOR, DASH_SEPARATOR, AMUD_AS_LATIN, AMUD_AS_LATIN_QUOTED,
+                           MARK_BEFORE_LETTER_AND_MARK, MARK_BEFORE_LETTER, PAGE_NUMBER_LINE, ABBREV_LIST_TITLE,
+                           SOURCES_TITLE, LIST_OF_SOURCES_TITLE, LIST_OF_SOURCES_TITLE_NO_BLANKS)
 
 class paper_abbrev:
 
@@ -447,27 +451,27 @@ class paper_abbrev:
             space_i = lines_y_top[i]-lines_y_bottom[i-1]
             # if space_i-space_prev >= 10:
             if space_i-space_prev-av > 10*vert_sd:
-                text_test_ref_label = re.sub(r'\P{L}+$', '', lines[i]["text"])
+                text_test_ref_label = TRAILING_NON_LETTERS.sub('', lines[i]["text"])
                 if text_test_ref_label in self.reference_labels:
                     return -1
-                if re.search(ref_subtypes_regex, text_test_ref_label):
+                if REF_SUBTYPES.search(text_test_ref_label):
                     return -1
-                text_test_ref_label_m1 = re.sub(r'\P{L}+$', '', lines[i-1]["text"])
+                text_test_ref_label_m1 = TRAILING_NON_LETTERS.sub('', lines[i-1]["text"])
                 if text_test_ref_label_m1 in self.reference_labels:
                     return -1
-                if re.search(ref_subtypes_regex, text_test_ref_label_m1):
+                if REF_SUBTYPES.search(text_test_ref_label_m1):
                     return -1
                 if i+1 < len(lines):
-                    text_test_ref_label_1 = re.sub(r'\P{L}+$', '', lines[i+1]["text"])
+                    text_test_ref_label_1 = TRAILING_NON_LETTERS.sub('', lines[i+1]["text"])
                     if text_test_ref_label_1 in self.reference_labels:
                         return -1
-                    if re.search(ref_subtypes_regex, text_test_ref_label_1):
+                    if REF_SUBTYPES.search(text_test_ref_label_1):
                         return -1
                 if i+2 < len(lines):
-                    text_test_ref_label_2 = re.sub(r'\P{L}+$', '', lines[i+2]["text"])
+                    text_test_ref_label_2 = TRAILING_NON_LETTERS.sub('', lines[i+2]["text"])
                     if text_test_ref_label_2 in self.reference_labels:
                         return -1
-                    if re.search(ref_subtypes_regex, text_test_ref_label_2):
+                    if REF_SUBTYPES.search(text_test_ref_label_2):
                         return -1
                 if is_centered(lines[i], self.page_width):
                     return -1
@@ -496,7 +500,7 @@ class paper_abbrev:
         for abbrev_line in self.abbrev_lines:
             spans = abbrev_line["spans"]
             right_margins.update([spw.left+spw.width for sp in spans for spw in sp["words"]])
-            if re.search(r'[א-ת]', abbrev_line["text"]):
+            if HEBREW_LETTER.search(abbrev_line["text"]):
                 abbrev_text_dir = 'rtl'
         
         print(f'{len(self.abbrev_lines)} abbrev. lines', right_margins.most_common(4))
@@ -604,7 +608,7 @@ class paper_abbrev:
                     if 'info' not in abbrev:
                         continue
                     abbrev["info"] += ' '+' '.join([w.text for w in words])
-                elif re.search(r'24352704', self.pdf_file.name) and not re.search(r' = ', abbrev_line['text']):
+                elif re.search(r'24352704', self.pdf_file.name) and not EQUALS_SEPARATOR.search(abbrev_line['text']):
                     # file specific: in this file the continutations are not indented
                     # continuation of abbrev information
                     words = typeset_words(words, had_rtl)
@@ -617,7 +621,7 @@ class paper_abbrev:
                     if "label" in abbrev:
                         self.trace += print_to_string(f'Abbrev: "{abbrev["label"]}" Info: {abbrev["info"]}')
                         self.abbrev.append(abbrev)
-                    if re.search(r' = ', abbrev_line['text']):
+                    if EQUALS_SEPARATOR.search(abbrev_line['text']):
                         if abbrev_text_dir == 'rtl':
                             (label_text, info_text, self.trace) = split_words_by_regex(words, had_rtl, r'=', self.trace)
                         else:
@@ -632,18 +636,18 @@ class paper_abbrev:
                         if info_text == '':
                             label_text = 'unknown'
                             info_text = abbrev_line['text']
-                    elif re.search(r'\p{L}: ', abbrev_line['text']):
+                    elif COLON_SEPARATOR.search(abbrev_line['text']):
                         if abbrev_text_dir == 'rtl':
                             (label_text, info_text, self.trace) = split_words_by_regex(words, had_rtl, r'.*\p{L}:', self.trace, include_matching=True)
                         else:
                             (info_text, label_text, self.trace) = split_words_by_regex(words, had_rtl, r'.*\p{L}:', self.trace, include_matching=True)
-                    elif re.search(r'\s(\p{Pd}{2,3}|—)\s', abbrev_line['text']):
+                    elif DASH_SEPARATOR.search(abbrev_line['text']):
                         if abbrev_text_dir == 'rtl':
                             (label_text, info_text, self.trace) = split_words_by_regex(words, had_rtl, r'\p{Pd}{2,3}|—', self.trace)
                         else:
                             (info_text, label_text, self.trace) = split_words_by_regex(words, had_rtl, r'\p{Pd}{2,3}|—', self.trace)
                     else:
-                        if re.search(ref_subtypes_regex, abbrev_line["text"]):
+                        if REF_SUBTYPES.search(abbrev_line["text"]):
                             self.trace += print_to_string(f'Ignoring line "{abbrev_line["text"]}"')
                             label_text = None
                         else:
@@ -655,7 +659,7 @@ class paper_abbrev:
                         abbrev["label"] = label_text
                         abbrev["info"] = info_text
 
-            if "info" in abbrev and re.search(r'[א-ת]', abbrev["info"]):
+            if "info" in abbrev and HEBREW_LETTER.search(abbrev["info"]):
                 had_rtl = True
 
         if "label" in abbrev:
@@ -673,8 +677,8 @@ class paper_abbrev:
             abbrev["label"] = abbrev["label"].replace('50 במדבר', 'ספרי במדבר')
 
             # Remove bidi characters
-            abbrev["label"] = re.sub(fr'[{uni_rtl}{uni_ltr}]', '', abbrev["label"])
-            abbrev["info"] = re.sub(fr'[{uni_rtl}{uni_ltr}]', '', abbrev["info"])
+            abbrev["label"] = DIRECTION_MARK.sub('', abbrev["label"])
+            abbrev["info"] = DIRECTION_MARK.sub('', abbrev["info"])
 
             # replace all forms of double quotes with '"'
             abbrev["label"] = abbrev["label"].translate(quoteTranslate)
@@ -698,8 +702,8 @@ class paper_abbrev:
             abbrev_list_element:Element = paper_abbrev_doc.createElement("abbreviations")
             paper_abbrev_element.appendChild(abbrev_list_element)
             for abbrev in self.abbrev:
-                abbrev["label"] = re.sub(fr'[{uni_rtl}{uni_ltr}]', '', abbrev["label"])
-                abbrev["info"] = re.sub(fr'[{uni_rtl}{uni_ltr}]', '', abbrev["info"])
+                abbrev["label"] = DIRECTION_MARK.sub('', abbrev["label"])
+                abbrev["info"] = DIRECTION_MARK.sub('', abbrev["info"])
 
                 abbrev["label"] = abbrev["label"].translate(quoteTranslate)
                 abbrev["info"] = abbrev["info"].translate(quoteTranslate)
@@ -778,10 +782,10 @@ class paper_abbrev:
             if t == '‘ay'+uni_rtl:
                 page_ocr_sheet.loc[i_t, 'text'] = "עמ'"
 
-            if re.match(rf'[nmBhdD]y{uni_rtl}$', t):
+            if AMUD_AS_LATIN.match(t):
                 page_ocr_sheet.loc[i_t, 'text'] = "עמ'"
 
-            if re.match(rf'[‘⸂⸄‛⸌][nmBhdD]y{uni_rtl}?$', t):
+            if AMUD_AS_LATIN_QUOTED.match(t):
                 page_ocr_sheet.loc[i_t, 'text'] = "עמ'"
 
         page_ocr_data = list(page_ocr_sheet.itertuples())
@@ -871,13 +875,13 @@ class paper_abbrev:
                             span["text"] = f' <fn-{span["text"]}> '
 
                 line["text"] = ' '.join([span["text"] for span in line_spans if "text" in span])
-                line["text"] = re.sub(r'\s+', ' ', line["text"]).strip()
+                line["text"] = WHITESPACE.sub(' ', line["text"]).strip()
                 # lines[-1] += revert_text(text, debug=False)
                 
                 # Nikkud that has to be reversed
 
-                line["text"] = re.sub(r'(\p{Mn})(\p{L})\p{Zs}(\p{Mn})', r'\2\1\3 ', line["text"])
-                line["text"] = re.sub(r'(\p{Mn})(\p{L})', r'\2\1', line["text"])
+                line["text"] = MARK_BEFORE_LETTER_AND_MARK.sub(r'\2\1\3 ', line["text"])
+                line["text"] = MARK_BEFORE_LETTER.sub(r'\2\1', line["text"])
 
                 if line["text"].startswith("פסוקים אלה"):
                     pass
@@ -929,7 +933,7 @@ class paper_abbrev:
         # digits, optionally between brackets, centered
 
 
-        if re.search(r'^\p{P}*\d+\p{P}*$', last_line["text"]):
+        if PAGE_NUMBER_LINE.search(last_line["text"]):
             if is_centered(last_line, page_width):
                 lines.pop()
 
@@ -1085,8 +1089,8 @@ class paper_abbrev:
         return (len(self.abbrev_lines) > 0)
         
     def test_abbrev_label(self, line):
-        line_text_nonletter_end_removed = re.sub(r'\P{L}+$', '', line["text"])
-        line_text_blank_nonletter_end_removed = re.sub(r'\s+', '', line_text_nonletter_end_removed)
+        line_text_nonletter_end_removed = TRAILING_NON_LETTERS.sub('', line["text"])
+        line_text_blank_nonletter_end_removed = WHITESPACE.sub('', line_text_nonletter_end_removed)
 
         found_abbrev_label = False
 
@@ -1106,27 +1110,27 @@ class paper_abbrev:
             if line_text_nonletter_end_removed in ('קיצורים', 'רשימת קיצורים', 'רשימת הקיצורים', 'מקורות מודפסים ומחקרים'):
                 found_abbrev_label = True
             # allow a few characters as in file 23438303.pdf
-            if re.search(r'^רשימת ה?קיצורים.{,5}', line["text"]):
+            if ABBREV_LIST_TITLE.search(line["text"]):
                 found_abbrev_label = True
         if self.journal_name == 'מגילות' or True:
             if line_text_blank_nonletter_end_removed in ('קיצורים', 'רשימת קיצורים', 'רשימת הקיצורים', 'מקורות מודפסים ומחקרים'):
                 found_abbrev_label = True
             # allow a few characters as in file 23438303.pdf
-            if re.search(r'^רשימת ה?קיצורים.{,5}', line["text"]):
+            if ABBREV_LIST_TITLE.search(line["text"]):
                 found_abbrev_label = True
         if self.journal_name == 'לשוננו' or True:
             if line_text_nonletter_end_removed in ('מחקרים', 'קיצורים'):
                 found_abbrev_label = True
-            if len(line_text_nonletter_end_removed) < 25 and re.search(r'^(ה?מקורות|ביבליוגרא?פיה)', line_text_nonletter_end_removed):
+            if len(line_text_nonletter_end_removed) < 25 and SOURCES_TITLE.search(line_text_nonletter_end_removed):
                 found_abbrev_label = True
-            if re.search(r'^רשימת.{,10}(ה?מקורות|ביבליוגרא?פי|ה?קיצור|מאמרים|ספרים|מחקרים)', line_text_nonletter_end_removed):
+            if LIST_OF_SOURCES_TITLE.search(line_text_nonletter_end_removed):
                 found_abbrev_label = True
         if self.journal_name == 'לשוננו' or True:
             if line_text_blank_nonletter_end_removed in ('מחקרים', 'קיצורים'):
                 found_abbrev_label = True
-            if len(line_text_blank_nonletter_end_removed) < 25 and re.search(r'^(ה?מקורות|ביבליוגרא?פיה)', line_text_blank_nonletter_end_removed):
+            if len(line_text_blank_nonletter_end_removed) < 25 and SOURCES_TITLE.search(line_text_blank_nonletter_end_removed):
                 found_abbrev_label = True
-            if re.search(r'^רשימת.{,10}(ה?מקורות|ביבליוגרא?פי|ה?קיצור)', line_text_blank_nonletter_end_removed):
+            if LIST_OF_SOURCES_TITLE_NO_BLANKS.search(line_text_blank_nonletter_end_removed):
                 found_abbrev_label = True
 
         return found_abbrev_label    
@@ -1142,6 +1146,8 @@ def get_scanned_page(page_ocr_data:List)->List:
     prev_block = -1
     prev_line = -1
 
+    line_index = SpanLineIndex()
+
     # Add dummy data so that the last block will be processed
      
     last_data = namedtuple('ld', ['block_num', 'line_num', 'par_num', 'conf'])
@@ -1157,12 +1163,12 @@ def get_scanned_page(page_ocr_data:List)->List:
 
         if (ocr_word_data.block_num, ocr_word_data.par_num) != (prev_block, prev_paragraph):
             if span is not None:
-                add_span_to_blocks(blocks, span)
+                add_span_to_blocks(blocks, span, line_index)
             span = dict(words=[], block_num=ocr_word_data.block_num, par_num=ocr_word_data.par_num)
             prev_line = -1
         elif (ocr_word_data.line_num != prev_line):
             if span is not None:
-                add_span_to_blocks(blocks, span)
+                add_span_to_blocks(blocks, span, line_index)
             span = dict(words=[], block_num=ocr_word_data.block_num, par_num=ocr_word_data.par_num)
         
         span["words"].append(ocr_word_data)
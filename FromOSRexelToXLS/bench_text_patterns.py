@@ -0,0 +1,79 @@
+"""
+Micro-benchmark of the per-word text patterns
+
+Compares a pattern string passed to regex.search/sub (the regex cache lookup
+on every call) with the precompiled pattern of text_patterns, over the words
+of a Tesseract workbook or a built-in sample of Hebrew/English words.
+
+Usage:
+    python bench_text_patterns.py [workbook.xlsx] [-n repeats]
+"""
+
+import argparse
+import timeit
+
+import regex as re
+
+import text_patterns
+
+SAMPLE_WORDS = ['שלום', 'ספרים,', 'abc', 'Jerusalem', '(1950)', '12', 'עמ\'', 'ל', 'קיצורים', '־',
+                'ישראל\u200f', 'pp.', 'וכו\'', 'ת"ק', 'Qumran', 'הנ"ל']
+
+# (name, pattern string as written at the call sites, operation)
+CASES = [
+    ("HEBREW_LETTER", r'[א-ת]', "search"),
+    ("ASCENDER", '[לABCDEFGHIJKLMNOPQRSTUVWXYZbdfhklt]', "search"),
+    ("DESCENDER", '[ךןףץקgjpqy]', "search"),
+    ("RTL_LETTER", r'(?=\p{Bidi_Class=Right_to_Left})\p{General_Category=Letter}', "search"),
+    ("ONLY_NON_LETTERS", r'^\P{L}+$', "search"),
+    ("TRAILING_NON_LETTERS", r'\P{L}+$', "sub"),
+    ("BIDI_CONTROL", r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]', "sub"),
+    ("REF_SUBTYPES", text_patterns.ref_subtypes_regex, "search"),
+    ("ASTERIK_START", text_patterns.asterik_start_regex, "search"),
+]
+
+
+def load_words(xlsx_path: str) -> list:
+    import pandas as pd
+    sheets = pd.read_excel(xlsx_path, sheet_name=None)
+    return [str(t) for df in sheets.values() if "text" in df.columns for t in df["text"].dropna()]
+
+
+def time_case(words: list, pattern: str, compiled, operation: str, repeats: int):
+    if operation == "search":
+        by_string = lambda: [re.search(pattern, w) for w in words]
+        precompiled = lambda: [compiled.search(w) for w in words]
+    else:
+        by_string = lambda: [re.sub(pattern, '', w) for w in words]
+        precompiled = lambda: [compiled.sub('', w) for w in words]
+    assert [str(r) for r in by_string()] == [str(r) for r in precompiled()]
+    string_seconds = min(timeit.repeat(by_string, number=1, repeat=repeats))
+    compiled_seconds = min(timeit.repeat(precompiled, number=1, repeat=repeats))
+    return string_seconds, compiled_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench-text-patterns',
+                                     description='Per-word cost of pattern strings and precompiled patterns')
+    parser.add_argument('xlsx', nargs='?', help='Tesseract workbook whose words are used, default: built-in sample')
+    parser.add_argument('-n', help='Repeats, the best is reported, default: %(default)s', dest='repeats',
+                        type=int, default=5)
+    args = parser.parse_args()
+
+    words = load_words(args.xlsx) if args.xlsx else SAMPLE_WORDS * 1000
+    print(f"{len(words)} words, best of {args.repeats}")
+    print(f"{'pattern':<22}{'string ns/word':>16}{'compiled ns/word':>18}{'saved':>8}")
+    total_string = total_compiled = 0.0
+    for name, pattern, operation in CASES:
+        string_seconds, compiled_seconds = time_case(words, pattern, getattr(text_patterns, name), operation,
+                                                     args.repeats)
+        total_string += string_seconds
+        total_compiled += compiled_seconds
+        print(f"{name:<22}{string_seconds / len(words) * 1e9:>16.0f}{compiled_seconds / len(words) * 1e9:>18.0f}"
+              f"{1 - compiled_seconds / string_seconds:>8.0%}")
+    print(f"{'total':<22}{total_string / len(words) * 1e9:>16.0f}{total_compiled / len(words) * 1e9:>18.0f}"
+          f"{1 - total_compiled / total_string:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
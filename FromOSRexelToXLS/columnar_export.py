@@ -0,0 +1,153 @@
+"""
+Columnar export of footnotes and main text
+
+Writes the results of an issue as a dataset that analytics tools can scan
+directly (pyarrow.dataset, DuckDB, Spark, pandas) instead of parsing the XML:
+
+    <root>/footnotes/journal=Tarbiz/issue=12/part-0.parquet
+    <root>/main_text/journal=Tarbiz/issue=12/part-0.parquet
+
+The journal and issue are hive partition directories, so a filter on them never
+opens the other issues. Rows are ordered by page, so the row group statistics
+of page_number let Parquet readers skip pages as well. JSONL files (one object per
+line) have the same columns plus journal and issue, for tools without partition
+discovery. Parquet needs pyarrow; JSONL has no extra dependency.
+
+Footnote columns: page, page_number, footnote_number, text, continued (the footnote
+runs over a page break), source_pages and source_rows (worksheet rows of its words
+in the Tesseract workbook, pairwise with source_pages).
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+
+from OSTtessToPDF import clean_bidi_marks_regex
+from text_patterns import DIGITS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+EXPORT_FORMATS = ("jsonl", "parquet")
+FOOTNOTES_TABLE = "footnotes"
+MAIN_TEXT_TABLE = "main_text"
+
+
+def check_export_format(fmt: str):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == "parquet" and pa is None:
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow), or use the jsonl format")
+
+
+def page_number(page_name: str) -> Optional[int]:
+    """Number of a sheet name like 'p07'"""
+    match = DIGITS.search(page_name or "")
+    return int(match.group()) if match else None
+
+
+def footnote_records(footnotes: List[dict]) -> List[dict]:
+    """One row per footnote, numbered in collection order like the CSV output"""
+    records = []
+    for number, footnote in enumerate(footnotes, 1):
+        sources = footnote.get("source_rows", [])
+        records.append({
+            "page": footnote["page"],
+            "page_number": page_number(footnote["page"]),
+            "footnote_number": number,
+            "text": clean_bidi_marks_regex(footnote["text"]),
+            "continued": bool(footnote.get("continued", False)),
+            "source_pages": [page for page, _ in sources],
+            "source_rows": [row for _, row in sources],
+        })
+    # stable, so footnotes of a page keep their numbering order
+    records.sort(key=lambda r: (r["page_number"] is None, r["page_number"] or 0))
+    return records
+
+
+def main_text_records(main_texts: Dict[str, str]) -> List[dict]:
+    """One row per page"""
+    records = [{"page": page_name, "page_number": page_number(page_name), "text": clean_bidi_marks_regex(text)}
+               for page_name, text in main_texts.items()]
+    records.sort(key=lambda r: (r["page_number"] is None, r["page_number"] or 0))
+    return records
+
+
+def _schemas() -> dict:
+    return {
+        FOOTNOTES_TABLE: pa.schema([
+            ("page", pa.string()),
+            ("page_number", pa.int32()),
+            ("footnote_number", pa.int32()),
+            ("text", pa.string()),
+            ("continued", pa.bool_()),
+            ("source_pages", pa.list_(pa.string())),
+            ("source_rows", pa.list_(pa.int32())),
+        ]),
+        MAIN_TEXT_TABLE: pa.schema([
+            ("page", pa.string()),
+            ("page_number", pa.int32()),
+            ("text", pa.string()),
+        ]),
+    }
+
+
+def partition_dir(root: str, table: str, journal: str, issue: str) -> str:
+    return os.path.join(root, table, f"journal={journal}", f"issue={issue}")
+
+
+def _write_jsonl(records: List[dict], path: str, journal: str, issue: str):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps({"journal": journal, "issue": issue, **record}, ensure_ascii=False) + "\n")
+
+
+def _write_parquet(records: List[dict], path: str, schema):
+    table = pa.Table.from_pylist(records, schema=schema)
+    pq.write_table(table, path, compression="zstd")
+
+
+def export_issue(footnotes: List[dict], main_texts: Dict[str, str], root: str,
+                 journal: str, issue: str, fmt: str = "jsonl") -> List[str]:
+    """
+    Write the footnotes and main texts of one issue into the dataset under root
+
+    Args:
+        footnotes: Footnotes from footnoteProcessor.process_workbook
+        main_texts: Main text by page from footnoteProcessor.process_workbook
+        root: Dataset folder
+        journal: Journal name (partition value)
+        issue: Issue number (partition value)
+        fmt: 'jsonl' or 'parquet'
+
+    Returns:
+        Paths of the written files; an earlier export of the issue is replaced
+    """
+    check_export_format(fmt)
+    tables = {
+        FOOTNOTES_TABLE: footnote_records(footnotes),
+        MAIN_TEXT_TABLE: main_text_records(main_texts),
+    }
+    schemas = _schemas() if fmt == "parquet" else {}
+
+    paths = []
+    for table, records in tables.items():
+        folder = partition_dir(root, table, journal, issue)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"part-0.{fmt}")
+        # written under a temporary name, so a reader never sees half a file
+        temp_path = os.path.join(folder, f".part-0.{os.getpid()}.tmp")
+        try:
+            if fmt == "parquet":
+                _write_parquet(records, temp_path, schemas[table])
+            else:
+                _write_jsonl(records, temp_path, journal, issue)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        paths.append(path)
+    return paths
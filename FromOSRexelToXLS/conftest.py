@@ -0,0 +1,2 @@
+# test_abbrev_package.py is a command line script (it parses sys.argv on import), not a test module
+collect_ignore = ["test_abbrev_package.py"]
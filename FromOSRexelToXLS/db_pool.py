@@ -0,0 +1,216 @@
+"""
+Pooled connections and prepared statements for the academic_journals database
+
+The connection settings come from the environment or from a JSON file, never
+from the source:
+
+    ACADEMIC_DB_HOST, ACADEMIC_DB_PORT, ACADEMIC_DB_USER, ACADEMIC_DB_PASSWORD,
+    ACADEMIC_DB_NAME, ACADEMIC_DB_POOL_SIZE
+
+    ACADEMIC_DB_CONFIG: path of a JSON file with the same keys in lower case
+    (host, port, user, password, database, pool_size); default db_config.json
+    next to this module, which is ignored by git (see db_config.example.json).
+
+Environment variables override the file. Other mysql.connector arguments can be
+given in the file too. The client sends no local files: only the connections
+of pooled_connection(local_infile_path=folder), which the importer takes for
+the LOAD DATA LOCAL import of the CSV files of a folder, may send the files of
+that folder (allow_local_infile_in_path).
+
+To run against a local server, e.g.
+    docker run -d -p 3306:3306 -e MARIADB_ROOT_PASSWORD=... -e MARIADB_DATABASE=academic_journals mariadb
+set ACADEMIC_DB_USER=root and ACADEMIC_DB_PASSWORD accordingly.
+
+A process has one pool (mysql.connector pooling, thread-safe), plus one per
+local infile folder; worker threads take a connection each with
+pooled_connection(). A forked worker process gets pools of its own on first
+use, connections are never shared across processes.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import mysql.connector
+from mysql.connector import pooling
+from mysql.connector.constants import ClientFlag
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_config.json")
+ENV_PREFIX = "ACADEMIC_DB_"
+POOL_NAME = "academic_journals"
+MAX_POOL_SIZE = pooling.CNX_POOL_MAXSIZE
+
+DEFAULT_CONFIG = {
+    "host": "localhost",
+    "port": 3306,
+    "database": "academic_journals",
+    "charset": "utf8mb4",
+    "collation": "utf8mb4_unicode_ci",
+    "pool_size": 5,
+}
+
+# environment variable suffix -> config key
+ENV_KEYS = {
+    "HOST": "host",
+    "PORT": "port",
+    "USER": "user",
+    "PASSWORD": "password",
+    "NAME": "database",
+    "POOL_SIZE": "pool_size",
+}
+
+_pools = {}  # local infile folder (None for none) -> pool
+_pool_config = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def load_db_config(path: Optional[str] = None) -> Dict:
+    """
+    Connection settings from the config file and the environment
+
+    Args:
+        path: JSON config file, default ACADEMIC_DB_CONFIG or db_config.json
+
+    Returns:
+        Keyword arguments for mysql.connector plus pool_size
+    """
+    config = dict(DEFAULT_CONFIG)
+
+    path = path or os.environ.get(ENV_PREFIX + "CONFIG") or CONFIG_PATH
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            file_config = json.load(f)
+        if not isinstance(file_config, dict):
+            raise ValueError(f"{path}: expected a JSON object")
+        config.update(file_config)
+
+    for suffix, key in ENV_KEYS.items():
+        value = os.environ.get(ENV_PREFIX + suffix)
+        if value is not None:
+            config[key] = value
+
+    if not config.get("user"):
+        raise ValueError(f"No database user: set {ENV_PREFIX}USER or 'user' in {path}")
+    for key in ("port", "pool_size"):
+        try:
+            config[key] = int(config[key])
+        except (TypeError, ValueError):
+            raise ValueError(f"Database {key} must be a number, got {config[key]!r}")
+    if not 1 <= config["pool_size"] <= MAX_POOL_SIZE:
+        raise ValueError(f"Database pool_size must be between 1 and {MAX_POOL_SIZE}, got {config['pool_size']}")
+    return config
+
+
+def get_pool(config: Optional[Dict] = None, local_infile_path: Optional[str] = None
+             ) -> pooling.MySQLConnectionPool:
+    """
+    A connection pool of this process, created on first use
+
+    Args:
+        config: Connection settings of the pools of this process, default load_db_config();
+            only the first call of a process uses it
+        local_infile_path: Folder whose files the connections may send with LOAD DATA
+            LOCAL INFILE; every folder has a pool of its own
+    """
+    global _pool_config, _pool_pid
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            _pools.clear()
+            _pool_config = None
+            _pool_pid = os.getpid()
+        # the connector compares the real path of a file with the folder
+        key = os.path.realpath(local_infile_path) if local_infile_path else None
+        pool = _pools.get(key)
+        if pool is None:
+            if _pool_config is None:
+                _pool_config = dict(config or load_db_config())
+            pool_config = dict(_pool_config)
+            pool_size = pool_config.pop("pool_size")
+            # affected rows count changed rows only, so an upsert that skips an existing row reports 0
+            pool_config.setdefault("client_flags", [-ClientFlag.FOUND_ROWS])
+            if key is not None:
+                pool_config["allow_local_infile_in_path"] = key
+            pool = pooling.MySQLConnectionPool(pool_name=f"{POOL_NAME}_{os.getpid()}_{len(_pools)}",
+                                               pool_size=pool_size, pool_reset_session=True, **pool_config)
+            _pools[key] = pool
+            logging.info(f"Created database pool of {pool_size} connections to {pool_config['host']}"
+                         + (f" with local files of {key}" if key else ""))
+        return pool
+
+
+def get_connection(timeout: float = 30.0, local_infile_path: Optional[str] = None):
+    """
+    A connection from the pool; close() returns it to the pool
+
+    Waits up to timeout seconds when all connections are in use. With
+    local_infile_path the connection may send the files of that folder
+    (see get_pool).
+    """
+    pool = get_pool(local_infile_path=local_infile_path)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return pool.get_connection()
+        except pooling.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+
+
+@contextmanager
+def pooled_connection(timeout: float = 30.0, local_infile_path: Optional[str] = None):
+    """Connection for a with block, rolled back on an exception and returned to the pool"""
+    conn = get_connection(timeout, local_infile_path)
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+class PreparedStatements:
+    """
+    Server-side prepared statements of one connection
+
+    Every SQL text gets its own prepared cursor on first use, so executing it
+    again only sends the parameters. The statements belong to the connection
+    checkout: close them before the connection goes back to the pool.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._cursors = {}
+
+    def execute(self, sql: str, params=()):
+        cursor = self._cursors.get(sql)
+        if cursor is None:
+            cursor = self.conn.cursor(prepared=True)
+            self._cursors[sql] = cursor
+        cursor.execute(sql, params)
+        return cursor
+
+    def fetchone(self, sql: str, params=()):
+        """First row of a query (the rest is read, so the connection stays usable)"""
+        rows = self.execute(sql, params).fetchall()
+        return rows[0] if rows else None
+
+    def close(self):
+        for cursor in self._cursors.values():
+            try:
+                cursor.close()
+            except mysql.connector.Error:
+                pass
+        self._cursors.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,271 @@
+"""
+Schema and migrations of the academic_journals database
+
+The migrations are applied in order and recorded in schema_migrations, so
+running the module again only applies the new ones:
+
+    python db_schema.py            # apply pending migrations
+    python db_schema.py --status   # list applied and pending migrations
+
+Besides the tables, the schema holds the keys the importer relies on:
+unique (issue_id, page_name) / (issue_id, reference_number) /
+(issue_id, footnote_number) keys, so an import is an insert-or-skip upsert
+instead of a SELECT per row, and a lower-cased journal_key column with a unique
+index for the journal lookup. Before a unique key is added, existing
+duplicates are merged into the oldest row: their child rows (issues of a
+journal; main texts, references and footnotes of an issue) move to it, and
+children it already has are merged in turn.
+"""
+
+import argparse
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import mysql.connector
+
+import issue_stats
+from db_pool import pooled_connection
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+
+@dataclass
+class Migration:
+    """One schema step; statements run in order, apply (if given) runs after them"""
+    version: int
+    description: str
+    statements: List[str] = field(default_factory=list)
+    apply: Optional[Callable] = None
+
+
+def column_exists(cursor, table: str, column: str) -> bool:
+    cursor.execute("SELECT COUNT(*) FROM information_schema.COLUMNS "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s", (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def index_exists(cursor, table: str, index: str) -> bool:
+    cursor.execute("SELECT COUNT(*) FROM information_schema.STATISTICS "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s", (table, index))
+    return cursor.fetchone()[0] > 0
+
+
+# primary key of every table, and the tables that reference a table:
+# (child table, foreign key column, the other columns of the child's unique key)
+ID_COLUMNS = {
+    "journals": "journal_id",
+    "issues": "issue_id",
+    "main_texts": "text_id",
+    "document_references": "reference_id",
+    "footnotes_table": "footnote_id",
+}
+CHILD_TABLES = {
+    "journals": [("issues", "journal_id", ["issue_number"])],
+    "issues": [("main_texts", "issue_id", ["page_name"]),
+               ("document_references", "issue_id", ["reference_number"]),
+               ("footnotes_table", "issue_id", ["footnote_number"])],
+}
+
+
+def _merge_row(cursor, table: str, old_id: int, new_id: int):
+    """
+    Merge row old_id of table into row new_id and delete it
+
+    The child rows move to new_id; a child that new_id already has (same
+    unique key) is merged into the existing one in turn, so no foreign key
+    is left pointing at a deleted row and no unique key is violated.
+    """
+    for child, foreign_key, unique_columns in CHILD_TABLES.get(table, ()):
+        child_id = ID_COLUMNS[child]
+        same_key = " AND ".join(f"kept.{column} = moved.{column}" for column in unique_columns)
+        cursor.execute(f"SELECT moved.{child_id}, kept.{child_id} FROM {child} moved "
+                       f"JOIN {child} kept ON {same_key} AND kept.{foreign_key} = %s "
+                       f"WHERE moved.{foreign_key} = %s", (new_id, old_id))
+        for old_child, new_child in cursor.fetchall():
+            _merge_row(cursor, child, old_child, new_child)
+        cursor.execute(f"UPDATE {child} SET {foreign_key} = %s WHERE {foreign_key} = %s", (new_id, old_id))
+    cursor.execute(f"DELETE FROM {table} WHERE {ID_COLUMNS[table]} = %s", (old_id,))
+
+
+def _merge_duplicates(cursor, table: str, key_columns: List[str]) -> int:
+    """
+    Merge the rows of table with the same key into the oldest (lowest id) one
+
+    Returns:
+        The number of rows merged away
+    """
+    id_column = ID_COLUMNS[table]
+    columns = ", ".join(key_columns)
+    same_key = " AND ".join(f"d.{column} = k.{column}" for column in key_columns)
+    cursor.execute(f"SELECT d.{id_column}, k.keep_id FROM {table} d "
+                   f"JOIN (SELECT {columns}, MIN({id_column}) AS keep_id FROM {table} "
+                   f"GROUP BY {columns} HAVING COUNT(*) > 1) k ON {same_key} "
+                   f"WHERE d.{id_column} <> k.keep_id ORDER BY d.{id_column}")
+    duplicates = cursor.fetchall()
+    for old_id, new_id in duplicates:
+        _merge_row(cursor, table, old_id, new_id)
+    if duplicates:
+        print(f"  Merged {len(duplicates)} duplicate rows of {table}")
+    return len(duplicates)
+
+
+def _add_unique_key(cursor, table: str, index: str, key_columns: List[str]):
+    """Merge duplicate rows (into the lowest id) and add a unique key, unless it exists"""
+    if index_exists(cursor, table, index):
+        return
+    _merge_duplicates(cursor, table, key_columns)
+    cursor.execute(f"ALTER TABLE {table} ADD UNIQUE KEY {index} ({', '.join(key_columns)})")
+
+
+def _add_unique_keys(cursor):
+    # issues first: merging an issue moves its rows, which may duplicate rows of the kept issue
+    _add_unique_key(cursor, "issues", "uq_issues_journal_issue", ["journal_id", "issue_number"])
+    _add_unique_key(cursor, "main_texts", "uq_main_texts_issue_page", ["issue_id", "page_name"])
+    _add_unique_key(cursor, "document_references", "uq_references_issue_number", ["issue_id", "reference_number"])
+    _add_unique_key(cursor, "footnotes_table", "uq_footnotes_issue_number", ["issue_id", "footnote_number"])
+
+
+def _create_issue_stats(cursor):
+    cursor.execute(issue_stats.CREATE_TABLE)
+    print(f"  Counted {issue_stats.refresh_all(cursor)} issues")
+
+
+def _add_journal_key(cursor):
+    if not column_exists(cursor, "journals", "journal_key"):
+        cursor.execute("ALTER TABLE journals ADD COLUMN journal_key VARCHAR(255) "
+                       "AS (LOWER(TRIM(journal_name))) STORED")
+    # journal names that differ only in case or surrounding spaces are one journal
+    _add_unique_key(cursor, "journals", "uq_journals_key", ["journal_key"])
+
+
+MIGRATIONS = [
+    Migration(1, "base tables", [
+        """CREATE TABLE IF NOT EXISTS journals (
+            journal_id INT AUTO_INCREMENT PRIMARY KEY,
+            journal_name VARCHAR(255) NOT NULL
+        ) DEFAULT CHARSET = utf8mb4 COLLATE = utf8mb4_unicode_ci""",
+        """CREATE TABLE IF NOT EXISTS issues (
+            issue_id INT AUTO_INCREMENT PRIMARY KEY,
+            journal_id INT NOT NULL,
+            issue_number VARCHAR(64) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (journal_id) REFERENCES journals (journal_id)
+        ) DEFAULT CHARSET = utf8mb4 COLLATE = utf8mb4_unicode_ci""",
+        """CREATE TABLE IF NOT EXISTS main_texts (
+            text_id INT AUTO_INCREMENT PRIMARY KEY,
+            issue_id INT NOT NULL,
+            page_name VARCHAR(64) NOT NULL,
+            content MEDIUMTEXT,
+            FOREIGN KEY (issue_id) REFERENCES issues (issue_id)
+        ) DEFAULT CHARSET = utf8mb4 COLLATE = utf8mb4_unicode_ci""",
+        """CREATE TABLE IF NOT EXISTS document_references (
+            reference_id INT AUTO_INCREMENT PRIMARY KEY,
+            issue_id INT NOT NULL,
+            page_name VARCHAR(64),
+            reference_number VARCHAR(32) NOT NULL,
+            content TEXT,
+            FOREIGN KEY (issue_id) REFERENCES issues (issue_id)
+        ) DEFAULT CHARSET = utf8mb4 COLLATE = utf8mb4_unicode_ci""",
+        """CREATE TABLE IF NOT EXISTS footnotes_table (
+            footnote_id INT AUTO_INCREMENT PRIMARY KEY,
+            issue_id INT NOT NULL,
+            page_name VARCHAR(64),
+            footnote_number VARCHAR(32) NOT NULL,
+            content TEXT,
+            FOREIGN KEY (issue_id) REFERENCES issues (issue_id)
+        ) DEFAULT CHARSET = utf8mb4 COLLATE = utf8mb4_unicode_ci""",
+    ]),
+    Migration(2, "unique keys of issues, main texts, references and footnotes", apply=_add_unique_keys),
+    Migration(3, "normalized journal_key column", apply=_add_journal_key),
+    Migration(4, "issue_stats table", apply=_create_issue_stats),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def _ensure_migrations_table(cursor):
+    cursor.execute(f"""CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""")
+
+
+def applied_versions(conn) -> List[int]:
+    cursor = conn.cursor()
+    try:
+        _ensure_migrations_table(cursor)
+        cursor.execute(f"SELECT version FROM {MIGRATIONS_TABLE} ORDER BY version")
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def pending_migrations(conn) -> List[Migration]:
+    applied = set(applied_versions(conn))
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+
+def migrate(conn) -> List[Migration]:
+    """
+    Apply the pending migrations in order
+
+    DDL commits implicitly in MySQL, so every step is written to be re-run
+    safely if a migration was interrupted before it was recorded.
+
+    Returns:
+        The applied migrations
+    """
+    done = []
+    for migration in pending_migrations(conn):
+        print(f"Applying migration {migration.version}: {migration.description}")
+        cursor = conn.cursor()
+        try:
+            for statement in migration.statements:
+                cursor.execute(statement)
+            if migration.apply is not None:
+                migration.apply(cursor)
+            cursor.execute(f"INSERT INTO {MIGRATIONS_TABLE} (version, description) VALUES (%s, %s)",
+                           (migration.version, migration.description))
+            conn.commit()
+        finally:
+            cursor.close()
+        done.append(migration)
+    return done
+
+
+def check_schema(conn) -> bool:
+    """True if all migrations are applied; prints the pending ones otherwise"""
+    pending = pending_migrations(conn)
+    if pending:
+        print(f"Database schema is not up to date, pending migrations: "
+              f"{', '.join(str(m.version) for m in pending)}. Run: python db_schema.py")
+    return not pending
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='db-schema', description='Apply the academic_journals schema migrations')
+    parser.add_argument('--status', help='Only list applied and pending migrations', action='store_true')
+    args = parser.parse_args()
+
+    try:
+        with pooled_connection() as conn:
+            if args.status:
+                applied = set(applied_versions(conn))
+                for migration in MIGRATIONS:
+                    state = "applied" if migration.version in applied else "pending"
+                    print(f"{migration.version:>3}  {state:<8} {migration.description}")
+                return
+            done = migrate(conn)
+    except (mysql.connector.Error, ValueError) as err:
+        print(f"Database error: {err}")
+        return
+
+    if done:
+        print(f"Applied {len(done)} migrations, schema version {LATEST_VERSION}")
+    else:
+        print(f"Schema is up to date (version {LATEST_VERSION})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Footnote reconciliation against the metadata references
+
+Aligns the footnotes collected from an issue with the reference_content entries
+of its metadata (label and text), so every difference is attributed to a page:
+
+- match:    one footnote is one reference
+- merge:    one footnote holds two consecutive references (a missed split)
+- split:    two consecutive footnotes are one reference (a wrong split)
+- missing:  a reference without a footnote
+- spurious: a footnote without a reference
+
+The alignment is a dynamic program over the two sequences, restricted to a band
+around the diagonal, so an issue costs O(length * band) comparisons. A comparison
+uses the footnote number (leading number of the text) against the reference label,
+and the edit distance of the letters of the texts; texts that differ in more
+than MAX_TEXT_DISTANCE of their letters are never paired, the alignment has to
+explain them with gaps.
+
+Usage:
+    python footnote_reconciliation.py <ocr-tess folder> -m <meta folder> [-o report folder]
+"""
+
+import argparse
+import contextlib
+import csv
+import glob
+import io
+import json
+import logging
+import math
+import os
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import regex as re
+from editdistance import distance
+
+from abbreviation_matcher import is_bibliographic_abbreviations, load_metadata_content
+
+MATCH = "match"
+MERGE = "merge"
+SPLIT = "split"
+MISSING = "missing"
+SPURIOUS = "spurious"
+STEP_KINDS = (MATCH, MERGE, SPLIT, MISSING, SPURIOUS)
+
+GAP_COST = 1.0  # a missing or spurious footnote
+JOIN_PENALTY = 0.5  # a merge or split must explain clearly more than a match and a gap
+TEXT_LETTERS = 200  # letters of a text that take part in the comparison
+# Unrelated texts differ in about 85% of their letters; without a floor a wrong
+# match (at most 0.5 + 1.0) would be cheaper than a missing and a spurious
+# footnote (2 * GAP_COST)
+MAX_TEXT_DISTANCE = 0.6
+DEFAULT_BAND = 10
+
+_LEADING_NUMBER = re.compile(r'^\W*(\d{1,3})(?!\d)')
+_NON_LETTERS = re.compile(r'[^\p{L}]+')
+
+
+@dataclass
+class AlignmentStep:
+    """One move of the alignment; extracted and expected hold sequence indices"""
+    kind: str
+    extracted: Tuple[int, ...]
+    expected: Tuple[int, ...]
+    page: Optional[str]
+    cost: float
+
+
+@dataclass
+class _Item:
+    label: Optional[str]
+    letters: str
+
+
+def footnote_label(text: str) -> Optional[str]:
+    """Footnote number at the start of a footnote text"""
+    match = _LEADING_NUMBER.search(text or "")
+    return str(int(match.group(1))) if match else None
+
+
+def _letters(text: str) -> str:
+    return _NON_LETTERS.sub('', text or "")[:TEXT_LETTERS].lower()
+
+
+def expected_references(metadata: dict) -> List[dict]:
+    """
+    Reference entries of the metadata in document order, without the abbreviation lists
+
+    Returns:
+        List of {"label", "text"}
+    """
+    references = []
+    blocks = (metadata or {}).get("references", {}).get("reference_blocks", [])
+    for block in blocks:
+        if is_bibliographic_abbreviations(block.get("title", "") or ""):
+            continue
+        for ref in block.get("reference_content", []):
+            label = ref.get("label")
+            references.append({"label": str(label).strip() if label not in (None, "") else None,
+                               "text": ref.get("text", "")})
+    return references
+
+
+def load_expected_references(meta_file_path: str) -> Optional[List[dict]]:
+    """References of a metadata file, None if the paper was skipped or lists none"""
+    metadata = load_metadata_content(meta_file_path)
+    if metadata is None:
+        return None
+    return expected_references(metadata) or None
+
+
+def _text_cost(a: str, b: str) -> float:
+    if not a or not b:
+        return 0.5  # nothing to compare
+    return distance(a, b) / max(len(a), len(b))
+
+
+def _label_cost(extracted: Optional[str], expected: Optional[str]) -> float:
+    if extracted is None or expected is None:
+        return 0.25
+    return 0.0 if extracted == expected else 0.5
+
+
+def _pair_cost(label_a: Optional[str], letters_a: str, label_b: Optional[str], letters_b: str) -> float:
+    text_cost = _text_cost(letters_a, letters_b)
+    if text_cost > MAX_TEXT_DISTANCE:
+        return float("inf")
+    return _label_cost(label_a, label_b) + text_cost
+
+
+def align(extracted_texts: Sequence[str], expected: Sequence[dict], band: int = DEFAULT_BAND,
+          pages: Sequence[str] = None) -> List[AlignmentStep]:
+    """
+    Align collected footnotes with the expected references
+
+    Args:
+        extracted_texts: Texts of the collected footnotes in order
+        expected: References from expected_references
+        band: Maximal distance from the diagonal (widened by the length difference)
+        pages: Page of every collected footnote, used to place the steps
+
+    Returns:
+        Steps in document order; missing references get the page of the preceding footnote
+    """
+    ext = [_Item(footnote_label(t), _letters(t)) for t in extracted_texts]
+    exp = [_Item(ref.get("label"), _letters(ref.get("text", ""))) for ref in expected]
+    n, m = len(ext), len(exp)
+    width = band + abs(n - m)
+
+    inf = float("inf")
+    cost = [[inf] * (m + 1) for _ in range(n + 1)]
+    back: List[List[Optional[str]]] = [[None] * (m + 1) for _ in range(n + 1)]
+    cost[0][0] = 0.0
+
+    for i in range(n + 1):
+        # cells outside the band stay at infinity
+        center = i * m / n if n else 0
+        for j in range(max(0, math.ceil(center - width)), min(m, math.floor(center + width)) + 1):
+            if i == 0 and j == 0:
+                continue
+            best, move = inf, None
+            if i and j:
+                c = cost[i - 1][j - 1] + _pair_cost(ext[i - 1].label, ext[i - 1].letters,
+                                                    exp[j - 1].label, exp[j - 1].letters)
+                if c < best:
+                    best, move = c, MATCH
+            if i and j >= 2:
+                c = (cost[i - 1][j - 2] + JOIN_PENALTY +
+                     _pair_cost(ext[i - 1].label, ext[i - 1].letters, exp[j - 2].label,
+                                (exp[j - 2].letters + exp[j - 1].letters)[:TEXT_LETTERS]))
+                if c < best:
+                    best, move = c, MERGE
+            if i >= 2 and j:
+                c = (cost[i - 2][j - 1] + JOIN_PENALTY +
+                     _pair_cost(ext[i - 2].label, (ext[i - 2].letters + ext[i - 1].letters)[:TEXT_LETTERS],
+                                exp[j - 1].label, exp[j - 1].letters))
+                if c < best:
+                    best, move = c, SPLIT
+            if j:
+                c = cost[i][j - 1] + GAP_COST
+                if c < best:
+                    best, move = c, MISSING
+            if i:
+                c = cost[i - 1][j] + GAP_COST
+                if c < best:
+                    best, move = c, SPURIOUS
+            cost[i][j] = best
+            back[i][j] = move
+
+    # trace back
+    steps = []
+    i, j = n, m
+    while i or j:
+        move = back[i][j]
+        used_i, used_j = {MATCH: (1, 1), MERGE: (1, 2), SPLIT: (2, 1), MISSING: (0, 1), SPURIOUS: (1, 0)}[move]
+        step_cost = cost[i][j] - cost[i - used_i][j - used_j]
+        steps.append(AlignmentStep(move, tuple(range(i - used_i, i)), tuple(range(j - used_j, j)),
+                                   None, round(step_cost, 3)))
+        i -= used_i
+        j -= used_j
+    steps.reverse()
+
+    if pages is not None:
+        page = pages[0] if pages else None
+        for step in steps:
+            if step.extracted:
+                page = pages[step.extracted[0]]
+            step.page = page
+    return steps
+
+
+def reconcile(footnotes: List[dict], expected: Sequence[dict], band: int = DEFAULT_BAND) -> List[AlignmentStep]:
+    """Align the footnotes of footnoteProcessor.process_workbook with the expected references"""
+    return align([f["text"] for f in footnotes], expected, band, [f["page"] for f in footnotes])
+
+
+def summarize(steps: List[AlignmentStep]) -> Dict[str, int]:
+    """Number of steps of every kind, plus the pages with at least one difference"""
+    counts = Counter(step.kind for step in steps)
+    summary = {kind: counts.get(kind, 0) for kind in STEP_KINDS}
+    summary["pages_with_errors"] = len({step.page for step in steps if step.kind != MATCH})
+    return summary
+
+
+def page_summary(steps: List[AlignmentStep]) -> Dict[str, Counter]:
+    """Step kinds per page"""
+    pages: Dict[str, Counter] = {}
+    for step in steps:
+        pages.setdefault(step.page, Counter())[step.kind] += 1
+    return pages
+
+
+REPORT_HEADERS = ["Filename", "Page", "Kind", "Footnote_Numbers", "Reference_Labels", "Cost",
+                  "Footnote_Text", "Reference_Text"]
+
+
+def step_rows(filename: str, steps: List[AlignmentStep], footnotes: List[dict],
+              expected: Sequence[dict], text_length: int = 80) -> List[dict]:
+    """Report rows of the differences (every step except a match)"""
+    rows = []
+    for step in steps:
+        if step.kind == MATCH:
+            continue
+        rows.append({
+            "Filename": filename,
+            "Page": step.page or "",
+            "Kind": step.kind,
+            # 1-based, like the numbering of the XML/CSV outputs
+            "Footnote_Numbers": " ".join(str(i + 1) for i in step.extracted),
+            "Reference_Labels": " ".join(str(expected[j]["label"] or "") for j in step.expected),
+            "Cost": step.cost,
+            "Footnote_Text": " / ".join(footnotes[i]["text"][:text_length] for i in step.extracted),
+            "Reference_Text": " / ".join((expected[j]["text"] or "")[:text_length] for j in step.expected),
+        })
+    return rows
+
+
+def main():
+    from OSTtessToPDF import extract_journal_name_from_path, footnoteProcessor
+    from journal_profiles import footnote_config_for_path
+
+    parser = argparse.ArgumentParser(prog='footnote-reconciliation',
+                                     description='Align collected footnotes with the metadata references')
+    parser.add_argument('input_dir', help='Folder with Tesseract .xlsx workbooks')
+    parser.add_argument('-m', help='Metadata folder with <issue>.json files', dest='meta_dir', required=True)
+    parser.add_argument('-o', help='Output folder for the report, default: current folder', dest='output',
+                        default='.')
+    parser.add_argument('-b', help='Alignment band, default: %(default)s', dest='band', type=int,
+                        default=DEFAULT_BAND)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    config = footnote_config_for_path(args.input_dir)
+    journal_name = extract_journal_name_from_path(args.input_dir)
+
+    rows = []
+    totals = Counter()
+    for xlsx_file in sorted(glob.glob(os.path.join(args.input_dir, "*.xlsx"))):
+        filename = os.path.basename(xlsx_file)
+        meta_file = os.path.join(args.meta_dir, os.path.splitext(filename)[0] + ".json")
+        if not os.path.exists(meta_file):
+            continue
+        try:
+            expected = load_expected_references(meta_file)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error reading meta file {meta_file}: {e}")
+            continue
+        if not expected:
+            continue
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            footnotes, _ = footnoteProcessor(config).process_workbook(xlsx_file)
+        steps = reconcile(footnotes, expected, args.band)
+        summary = summarize(steps)
+        totals.update(summary)
+        rows.extend(step_rows(filename, steps, footnotes, expected))
+        print(f"{filename}: " + ", ".join(f"{kind} {summary[kind]}" for kind in STEP_KINDS) +
+              f", pages with errors {summary['pages_with_errors']}")
+
+    os.makedirs(args.output, exist_ok=True)
+    csv_path = os.path.join(args.output, f"{journal_name}_reconciliation.csv")
+    with open(csv_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=REPORT_HEADERS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print("====================================")
+    print("TOTAL: " + ", ".join(f"{kind} {totals[kind]}" for kind in STEP_KINDS))
+    print(f"Report saved to: {csv_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Full-text search over footnotes and main text
+
+A SQLite FTS5 index built from the *_footnotes.xml outputs, next to the MySQL
+import (the same files, the same journal and issue keys):
+
+    python footnote_search.py build output/tarbiz output/zion
+    python footnote_search.py query "תלמוד ירושלמי" --journal Tarbiz -n 20
+
+The index uses the trigram tokenizer, which matches any substring of three or
+more characters, so Hebrew words are found with their prefixes (ו, ה, ב, ל ...)
+without a stemmer. Every term of a query must occur in a hit; hits are ranked
+by bm25. Building again only re-reads the files whose size or modification time
+changed, and drops the files that are no longer in the scanned folders.
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from typing import Iterator, List, Optional, Tuple
+
+from issue_keys import extract_journal_info
+
+DEFAULT_INDEX = "footnote_search.sqlite"
+FOOTNOTES_SUFFIX = "_footnotes.xml"
+MIN_TERM_LENGTH = 3  # shortest substring the trigram tokenizer can match
+KINDS = ("footnote", "main_text")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    source_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    journal TEXT NOT NULL,
+    issue TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    entry_id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources (source_id),
+    journal TEXT NOT NULL,
+    issue TEXT NOT NULL,
+    page TEXT,
+    kind TEXT NOT NULL,
+    number TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_entries_source ON entries (source_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS text_index USING fts5(text, tokenize = 'trigram');
+"""
+
+SEARCH = """SELECT e.journal, e.issue, e.page, e.kind, e.number,
+    snippet(text_index, 0, '[', ']', '...', 48) AS snippet
+FROM text_index
+JOIN entries e ON e.entry_id = text_index.rowid
+WHERE text_index MATCH ?{filters}
+ORDER BY bm25(text_index)
+LIMIT ?"""
+
+
+def open_index(path: str = DEFAULT_INDEX) -> sqlite3.Connection:
+    """Open (and create if needed) the search index"""
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def read_footnotes_xml(xml_path: str) -> Iterator[Tuple[str, str, Optional[str], str]]:
+    """
+    Texts of a footnotes XML file as written by OSTtessToPDF.save_footnotes_to_xml
+
+    Returns:
+        (page, kind, number, text) per main text and footnote
+    """
+    root = ET.parse(xml_path).getroot()
+    for page in root.findall('.//Page'):
+        page_name = page.get('name')
+        main_text = page.find('.//MainText')
+        if main_text is not None and main_text.text:
+            yield page_name, "main_text", None, main_text.text
+        for footnote in page.findall('.//footnote'):
+            if footnote.text:
+                yield page_name, "footnote", footnote.get('number'), footnote.text
+
+
+def find_footnote_files(folders: List[str]) -> List[str]:
+    paths = []
+    for folder in folders:
+        for dir_path, _, file_names in os.walk(folder):
+            paths.extend(os.path.abspath(os.path.join(dir_path, name))
+                         for name in file_names if name.endswith(FOOTNOTES_SUFFIX))
+    return sorted(paths)
+
+
+def _remove_source(conn: sqlite3.Connection, source_id: int):
+    conn.execute("DELETE FROM text_index WHERE rowid IN (SELECT entry_id FROM entries WHERE source_id = ?)",
+                 (source_id,))
+    conn.execute("DELETE FROM entries WHERE source_id = ?", (source_id,))
+    conn.execute("DELETE FROM sources WHERE source_id = ?", (source_id,))
+
+
+def _index_file(conn: sqlite3.Connection, path: str, journal: str, issue: str, stat: os.stat_result,
+                texts: List[Tuple[str, str, Optional[str], str]]) -> int:
+    cursor = conn.execute("INSERT INTO sources (path, journal, issue, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+                          (path, journal, issue, stat.st_size, stat.st_mtime_ns))
+    source_id = cursor.lastrowid
+    for page, kind, number, text in texts:
+        entry_id = conn.execute("INSERT INTO entries (source_id, journal, issue, page, kind, number) "
+                                "VALUES (?, ?, ?, ?, ?, ?)",
+                                (source_id, journal, issue, page, kind, number)).lastrowid
+        conn.execute("INSERT INTO text_index (rowid, text) VALUES (?, ?)", (entry_id, text))
+    return len(texts)
+
+
+def build_index(conn: sqlite3.Connection, folders: List[str]) -> Tuple[int, int, int]:
+    """
+    Bring the index up to date with the footnotes XML files under folders
+
+    Args:
+        conn: Index connection (open_index)
+        folders: Output folders, scanned recursively
+
+    Returns:
+        (indexed files, unchanged files, removed files)
+    """
+    known = {path: (source_id, size, mtime_ns)
+             for source_id, path, size, mtime_ns in conn.execute("SELECT source_id, path, size, mtime_ns FROM sources")}
+    roots = [os.path.join(os.path.abspath(folder), "") for folder in folders]
+    indexed = unchanged = removed = 0
+
+    with conn:
+        seen = set()
+        for path in find_footnote_files(folders):
+            seen.add(path)
+            stat = os.stat(path)
+            previous = known.get(path)
+            if previous is not None and previous[1:] == (stat.st_size, stat.st_mtime_ns):
+                unchanged += 1
+                continue
+
+            journal, issue = extract_journal_info(os.path.basename(path))
+            if not journal:
+                continue
+            # parsed before anything is written: a broken file keeps no source row and is read again next time
+            try:
+                texts = list(read_footnotes_xml(path))
+            except ET.ParseError as e:
+                logging.warning(f"Skipping {path}: {e}")
+                continue
+            if previous is not None:
+                _remove_source(conn, previous[0])
+            count = _index_file(conn, path, journal, issue, stat, texts)
+            indexed += 1
+            print(f"Indexed {os.path.basename(path)}: {count} texts")
+
+        # files deleted from a scanned folder
+        for path, (source_id, _, _) in known.items():
+            if path not in seen and any(path.startswith(root) for root in roots):
+                _remove_source(conn, source_id)
+                removed += 1
+
+    return indexed, unchanged, removed
+
+
+def build_match(query: str) -> Optional[str]:
+    """
+    FTS5 MATCH expression of a free-text query: every term as a quoted phrase
+
+    Terms shorter than MIN_TERM_LENGTH are dropped, the trigram index cannot
+    match them. Returns None if no term is left.
+    """
+    terms = []
+    for term in query.split():
+        if len(term) < MIN_TERM_LENGTH:
+            logging.warning(f"Ignoring '{term}': search terms need at least {MIN_TERM_LENGTH} characters")
+            continue
+        terms.append('"' + term.replace('"', '""') + '"')
+    return " AND ".join(terms) if terms else None
+
+
+def search(conn: sqlite3.Connection, query: str, journal: Optional[str] = None, kind: Optional[str] = None,
+           limit: int = 20) -> List[Tuple]:
+    """
+    Ranked hits of a query, best first
+
+    Args:
+        conn: Index connection
+        query: Search terms (all must occur)
+        journal: Only hits of this journal (case-insensitive)
+        kind: Only 'footnote' or 'main_text' hits
+        limit: Maximum number of hits
+
+    Returns:
+        (journal, issue, page, kind, number, snippet) per hit
+    """
+    match = build_match(query)
+    if match is None:
+        return []
+    filters, params = "", [match]
+    if journal:
+        filters += " AND e.journal = ? COLLATE NOCASE"
+        params.append(journal)
+    if kind:
+        filters += " AND e.kind = ?"
+        params.append(kind)
+    params.append(limit)
+    return conn.execute(SEARCH.format(filters=filters), params).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='footnote-search', description='Full-text search over footnotes and main text')
+    parser.add_argument('--index', help=f'Index file (default {DEFAULT_INDEX})', default=DEFAULT_INDEX)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help='Index the footnotes XML files of output folders')
+    build_parser.add_argument('folders', nargs='+', help='Output folders with *_footnotes.xml files')
+
+    query_parser = commands.add_parser('query', help='Search the index')
+    query_parser.add_argument('query', help='Search terms, all must occur')
+    query_parser.add_argument('--journal', help='Only this journal')
+    query_parser.add_argument('--kind', choices=KINDS, help='Only footnotes or main texts')
+    query_parser.add_argument('-n', '--limit', type=int, default=20, help='Maximum number of hits (default 20)')
+    args = parser.parse_args()
+
+    conn = open_index(args.index)
+    try:
+        started = time.time()
+        if args.command == 'build':
+            indexed, unchanged, removed = build_index(conn, args.folders)
+            print(f"Indexed {indexed} files, {unchanged} unchanged, {removed} removed "
+                  f"in {time.time() - started:.1f}s")
+            return
+
+        hits = search(conn, args.query, args.journal, args.kind, args.limit)
+        elapsed_ms = (time.time() - started) * 1000
+        for rank, (journal, issue, page, kind, number, snippet) in enumerate(hits, 1):
+            location = f"{journal} {issue}, page {page}"
+            if kind == "footnote":
+                location += f", footnote {number}"
+            print(f"{rank:>3}. {location}\n     {' '.join(snippet.split())}")
+        print(f"{len(hits)} hits in {elapsed_ms:.1f} ms")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,216 +1,75 @@
-import openpyxl
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Tuple
 import xml.etree.ElementTree as ET
-import pandas as pd
-import numpy as np
 import logging
-import regex as re
 import glob
 import os
-import json
-from dataclasses import dataclass
-import csv
-from pathlib import Path
-import math
-
-# Import from paper_abbrev functionality
-from xml.dom.minidom import Document, Element
-from xml.dom import getDOMImplementation
-
-
-
-
-@dataclass
-class IntegratedConfig:
-    """Configuration for integrated processing"""
-    exclusion_phrases: List[str]
-    start_row: int
-    bottom_margin_min: float = 1605
-    bottom_margin_max: float = 1695
-    total_left = 7400
-    left_margin_threshold_even: float = 195
-    left_margin_threshold_odd: float = 295
-    width_threshold_even: float = 1040
-    width_threshold_odd: float = 1140
-    footnotes_spleat_threshold_even: float = 1050
-    footnotes_spleat_threshold_odd: float = 1150
-    merge_footnotes_threshold_even: float = 1050
-    merge_footnotes_threshold_odd: float = 1120
-    min_words: int = 3
-    confidence_threshold: float = 60
-    size_tolerance: float = 2.0
+from dataclasses import dataclass, fields
+
+from OSTtessToPDF import StreamingCsvWriter, csv_output_path, footnoteConfig, footnoteProcessor
+from journal_profiles import detect_journal_key, footnote_config_for_path
+from abbreviation_matcher import AbbreviationMatcher, abbreviations_from_metadata, load_metadata_content
+
+
+@dataclass(frozen=True)
+class IntegratedConfig(footnoteConfig):
+    """Configuration for integrated processing: the footnote thresholds plus the journal"""
     # Paper abbrev specific settings
     journal_name: str = "tarbiz"
 
+    @classmethod
+    def from_footnote_config(cls, config: footnoteConfig, journal_name: str) -> "IntegratedConfig":
+        """Extend a journal profile configuration (see journal_profiles.py) with the journal name"""
+        return cls(journal_name=journal_name, **{f.name: getattr(config, f.name) for f in fields(footnoteConfig)})
+
 
 class IntegratedProcessor:
-    """Integrated processor for footnotes and bibliographic abbreviations"""
+    """Integrated processor for footnotes and bibliographic abbreviations
+
+    Page loading, paragraph analysis and footnote extraction are done by footnoteProcessor,
+    in one pass over the workbook; the abbreviation filter is applied to its footnotes.
+    """
 
     def __init__(self, config: IntegratedConfig):
         self.config = config
-        self.continuing_footnote = ""
-        self.continuing_footnote_page = None
-        self.all_pages_data = []
-        self.current_page_index = 0
+        self.footnote_processor = footnoteProcessor(config)
         self.main_texts = {}
 
         # Paper abbrev related attributes
         self.abbreviations = []
         self.abbrev_labels = set()
         self.metadata_jstor = None
-        self.dom_impl = getDOMImplementation()
+        self.abbreviation_matcher = None
 
     def load_metadata(self, metadata_file_path: str) -> bool:
         """Load JSTOR metadata for abbreviation processing"""
+        self.abbreviations = []
+        self.abbrev_labels = set()
+        self.abbreviation_matcher = None
         try:
-            from metadata_analyzer import MetadataAnalyzer, AbbreviationMatcher
-
-            analyzer = MetadataAnalyzer(self.config.journal_name)
-            metadata = analyzer.load_metadata(metadata_file_path)
+            metadata = load_metadata_content(metadata_file_path)
 
-            if not metadata or metadata.get('skipped'):
+            if not metadata:
                 logging.info(f"Metadata not available or skipped: {metadata_file_path}")
-                self.abbreviation_matcher = None
                 return False
 
             self.metadata_jstor = metadata
 
-            # Extract abbreviation labels and create matcher
-            abbreviation_labels = analyzer.get_abbreviation_labels(metadata)
-            self.abbreviation_matcher = AbbreviationMatcher(abbreviation_labels)
-
-            # Extract abbreviations for later use
-            abbreviations_info = analyzer.extract_abbreviations_info(metadata)
-            self.abbreviations = []
-
-            for abbrev_data in abbreviations_info.get("קיצורים ביבליוגרפים", []):
-                if abbrev_data.get('label'):
-                    self.abbreviations.append({
-                        "label": abbrev_data['label'],
-                        "info": abbrev_data['description'],
-                        "source": "metadata"
-                    })
+            # Extract abbreviations and compile their labels into the matcher
+            self._extract_abbreviations_from_metadata()
+            self.abbreviation_matcher = AbbreviationMatcher(self.abbrev_labels)
 
-            logging.info(f"Loaded {len(abbreviation_labels)} abbreviation labels from metadata")
+            logging.info(f"Loaded {len(self.abbreviation_matcher)} abbreviation labels from metadata")
             return True
 
         except Exception as e:
             logging.error(f"Error loading metadata: {e}")
-            self.abbreviation_matcher = None
             return False
 
     def _extract_abbreviations_from_metadata(self):
         """Extract bibliographic abbreviations from metadata"""
-        if not self.metadata_jstor or 'references' not in self.metadata_jstor:
-            return
-
-        refs = self.metadata_jstor.get("references", {}).get("reference_blocks", [])
-
-        for refList in refs:
-            refType = refList.get("title", "")
-            if not refType:
-                continue
-
-            # Check if this is bibliographic abbreviations section
-            if self._is_bibliographic_abbreviations(refType):
-                ref_content = refList.get("reference_content", [])
-                for ref in ref_content:
-                    if "text" in ref:
-                        abbrev_text = ref["text"]
-                        # Extract abbreviation label (first part before dash, colon, etc.)
-                        label = self._extract_abbreviation_label(abbrev_text)
-                        if label:
-                            self.abbrev_labels.add(label)
-                            self.abbreviations.append({
-                                "label": label,
-                                "info": abbrev_text,
-                                "source": "metadata"
-                            })
-
-    def _is_bibliographic_abbreviations(self, ref_type: str) -> bool:
-        """Check if reference type is bibliographic abbreviations"""
-        ref_type_clean = re.sub(r'\P{L}+$', '', ref_type)
-
-        # Hebrew patterns for bibliographic abbreviations
-        if re.search(r'^([א-ת]+ )?ה?(קיצורים|ציונים|קיצורים וציונים)( ה?ביבי?ליו?גרא?פי+ים)?$', ref_type):
-            return True
-        if 'קיצור' in ref_type and 'מקורות' in ref_type:
-            return True
-        if ref_type_clean in ('קיצורים', 'רשימת קיצורים', 'רשימת הקיצורים', 'קיצורים ביבליוגרפים'):
-            return True
-
-        return False
-
-    def _extract_abbreviation_label(self, abbrev_text: str) -> str:
-        """Extract abbreviation label from text"""
-        # Try different patterns to extract the abbreviation
-        patterns = [
-            r'^([^=:—\-]+)[=:—\-]',  # Text before separator
-            r'^(\S+)',  # First word
-            r'^([^,]+)',  # Text before comma
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, abbrev_text.strip())
-            if match:
-                label = match.group(1).strip()
-                # Clean up the label
-                label = re.sub(r'[^\w\s\u0590-\u05FF]', '', label)
-                if len(label) > 1:
-                    return label
-
-        return ""
-
-    def _should_skip_footnote(self, footnote_text: str) -> bool:
-        """Check if footnote should be skipped because it's a bibliographic abbreviation"""
-        if not hasattr(self, 'abbreviation_matcher') or self.abbreviation_matcher is None:
-            return False
-
-        is_abbrev, _ = self.abbreviation_matcher.is_abbreviation_reference(footnote_text)
-        return is_abbrev
-
-    def _validate_and_prepare_dataframe(self, df: pd.DataFrame, page_name: str) -> Optional[pd.DataFrame]:
-        """Validate and prepare DataFrame for processing"""
-        required_cols = ["conf", "height", "width", "text"]
-        if not all(col in df.columns for col in required_cols):
-            logging.warning(f"Required columns missing in {page_name}")
-            return None
-
-        # Convert numeric columns
-        numeric_cols = ["conf", "height", "width"]
-        for col in numeric_cols:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-
-        if "top" in df.columns:
-            df["top"] = pd.to_numeric(df["top"], errors="coerce")
-        if "left" in df.columns:
-            df["left"] = pd.to_numeric(df["left"], errors="coerce")
-
-        return df
-
-    def _extract_data_from_xlsx(self, xlsx_path: str) -> List[pd.DataFrame]:
-        """Extract data from Excel sheets, skipping the first sheet"""
-        try:
-            workbook = openpyxl.load_workbook(xlsx_path, data_only=True)
-            logging.info(f"Opened workbook: {xlsx_path}")
-
-            sheet_data = []
-            for sheet_name in workbook.sheetnames[1:]:  # Skip first sheet
-                if sheet_name == 'p00':
-                    continue
-                sheet = workbook[sheet_name]
-                data = sheet.values
-                columns = next(data)
-                df = pd.DataFrame(data, columns=columns)
-                df["Page"] = sheet_name
-                sheet_data.append(df)
-
-            workbook.close()
-            return sheet_data
-
-        except Exception as e:
-            logging.error(f"Error opening XLSX file: {e}")
-            return []
+        for abbrev in abbreviations_from_metadata(self.metadata_jstor):
+            self.abbrev_labels.add(abbrev["label"])
+            self.abbreviations.append(abbrev)
 
     def process_workbook_integrated(self, xlsx_path: str, metadata_path: str = None) -> Tuple[
         List[Dict[str, str]], Dict[str, str], List[Dict[str, str]]]:
@@ -227,22 +86,14 @@ class IntegratedProcessor:
         if metadata_path:
             self.load_metadata(metadata_path)
 
-        # Extract data from Excel file
-        self.all_pages_data = self._extract_data_from_xlsx(xlsx_path)
-        all_footnotes = []
-        self.main_texts = {}
-
-        # Process each page
-        for i, df in enumerate(self.all_pages_data):
-            self.current_page_index = i
-            page_name = df["Page"].iloc[0] if "Page" in df.columns else "Unknown"
-            self._process_paragraphs_integrated(df, page_name, all_footnotes)
+        # Load, analyze and extract footnotes/main text in a single pass
+        all_footnotes, self.main_texts = self.footnote_processor.process_workbook(xlsx_path)
 
-        # Filter footnotes to exclude bibliographic abbreviations
-        filtered_footnotes = []
+        # Filter footnotes to exclude bibliographic abbreviations (known only from the metadata)
+        filtered_footnotes = all_footnotes
         abbreviation_footnotes = []
 
-        if hasattr(self, 'abbreviation_matcher') and self.abbreviation_matcher:
+        if self.abbreviation_matcher:
             # Use the matcher to filter footnotes
             filtered_footnotes, matched_abbreviations = self.abbreviation_matcher.filter_footnotes(all_footnotes)
 
@@ -254,44 +105,14 @@ class IntegratedProcessor:
                     "page": abbrev_footnote["page"],
                     "source": "ocr"
                 })
-        else:
-            # Fallback to simple filtering if no matcher available
-            for footnote in all_footnotes:
-                if self._should_skip_footnote(footnote["text"]):
-                    # This is likely a bibliographic abbreviation
-                    abbreviation_footnotes.append({
-                        "label": self._extract_abbreviation_label(footnote["text"]),
-                        "info": footnote["text"],
-                        "page": footnote["page"],
-                        "source": "ocr"
-                    })
-                else:
-                    # This is a regular footnote
-                    filtered_footnotes.append(footnote)
 
         # Combine abbreviations from metadata and OCR
         all_abbreviations = self.abbreviations + abbreviation_footnotes
 
         return filtered_footnotes, self.main_texts, all_abbreviations
 
-    def _process_paragraphs_integrated(self, df: pd.DataFrame, page_name: str, collected_footnotes: List[dict]):
-        """Process paragraphs with integrated footnote and abbreviation handling"""
-        # This method would contain the main logic from OSTtessToPDF.py _process_paragraphs
-        # but with additional filtering for abbreviations
-        # For brevity, I'm showing the structure - you would copy the actual implementation
-        # from your existing _process_paragraphs method
-
-        df = self._validate_and_prepare_dataframe(df, page_name)
-        if df is None:
-            return
-
-        # Your existing paragraph processing logic here...
-        # (copying from OSTtessToPDF.py)
 
-        # The key difference is in the footnote collection part:
-        # After extracting footnotes, filter them through _should_skip_footnote
-
-        pass  # Placeholder - implement your existing logic here
+INTEGRATED_CSV_HEADERS = ["Type", "Page", "Number", "Label", "Content", "Source"]
 
 
 def save_integrated_results(footnotes: List[dict], main_texts: Dict[str, str],
@@ -331,63 +152,34 @@ def save_integrated_results(footnotes: List[dict], main_texts: Dict[str, str],
     tree.write(output_path, encoding="utf-8", xml_declaration=True)
 
     # Save to CSV
-    csv_path = output_path.replace(".xml", "_integrated.csv")
-    rows = []
+    csv_path = csv_output_path(output_path, "_integrated")
+    with StreamingCsvWriter(csv_path, INTEGRATED_CSV_HEADERS) as writer:
+        for page_name, text in main_texts.items():
+            writer.writerow(("MainText", page_name, "", "", text, "ocr"))
 
-    # Add main text rows
-    for page_name, text in main_texts.items():
-        rows.append({
-            "Type": "MainText",
-            "Page": page_name,
-            "Number": "",
-            "Label": "",
-            "Content": text,
-            "Source": "ocr"
-        })
-
-    # Add footnote rows
-    for i, footnote in enumerate(footnotes, 1):
-        rows.append({
-            "Type": "Footnote",
-            "Page": footnote["page"],
-            "Number": i,
-            "Label": "",
-            "Content": footnote["text"],
-            "Source": "ocr"
-        })
-
-    # Add abbreviation rows
-    for abbrev in abbreviations:
-        rows.append({
-            "Type": "Abbreviation",
-            "Page": abbrev.get("page", ""),
-            "Number": "",
-            "Label": abbrev.get("label", ""),
-            "Content": abbrev.get("info", ""),
-            "Source": abbrev.get("source", "")
-        })
-
-    df = pd.DataFrame(rows)
-    df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+        for i, footnote in enumerate(footnotes, 1):
+            writer.writerow(("Footnote", footnote["page"], i, "", footnote["text"], "ocr"))
+
+        for abbrev in abbreviations:
+            writer.writerow(("Abbreviation", abbrev.get("page", ""), "", abbrev.get("label", ""),
+                             abbrev.get("info", ""), abbrev.get("source", "")))
     logging.info(f"Integrated results saved to {output_path} and {csv_path}")
 
 
 def main_integrated():
     """Main function for integrated processing"""
 
-    # Configuration
-    config = IntegratedConfig(
-        exclusion_phrases=["https://about,jstor.org/terms", "[תרביץ",
-                           "https://about.jstor.org/terms", "https://aboutjstor.org/terms"],
-        start_row=1,
-        journal_name="tarbiz"  # This should be set based on your input
-    )
-
     # Paths (these should be configured based on your setup)
     input_folder_path = r'C:/NikWorckSpase/Corpus/tarbiz/ocr-tess-scanned/'
     output_folder_path = r'C:/NikWorckSpase/Corpus/tarbiz/outputXML/'
     meta_folder_path = r'C:/NikWorckSpase/Corpus/tarbiz/meta/'
 
+    # Configuration: thresholds of the journal profile (journal_profiles.json)
+    config = IntegratedConfig.from_footnote_config(
+        footnote_config_for_path(input_folder_path),
+        journal_name=detect_journal_key(input_folder_path)
+    )
+
     xlsx_files = glob.glob(os.path.join(input_folder_path, "*.xlsx"))
     xlsx_files.sort()
 
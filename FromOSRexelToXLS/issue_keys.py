@@ -0,0 +1,121 @@
+"""
+Journal and issue of an output file
+
+The (journal, issue) key of a file as the database importer derives it, shared
+by the importer, the search index and the reconciliation of files and database
+so they agree on which issue a file belongs to.
+
+The key of an issue is (journal_key, issue_number), journal_key being the lower
+case journal name as in the journal_key column of the journals table.
+
+An output folder can keep a manifest (issues_manifest.json) of the files it
+held and their keys, to compare the folder with a later state of itself or to
+check a folder that is not at hand against the database.
+"""
+
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+IMPORTED_EXTENSIONS = ('.xml', '.csv')
+# reports the pipeline writes next to the issue files ({journal}_processing_report.csv, ...)
+REPORT_SUFFIX = '_report.csv'
+MANIFEST_NAME = "issues_manifest.json"
+
+IssueKey = Tuple[str, str]
+
+
+def extract_journal_info(filename):
+    """Extract journal name and issue number from filename"""
+    file_base = os.path.splitext(filename)[0].replace("_references", "").replace("_footnotes", "")
+
+    # Dictionary mapping filename patterns to journal names
+    journal_mapping = {
+        "leshonenu": "Leshonenu",
+        "meghillot": "Meghillot",
+        "shenmishivri": "Shenmishivri",
+        "sidra": "Sidra",
+        "tarbiz": "Tarbiz",
+        "zion": "Zion"
+    }
+
+    journal_name = None
+    for pattern, name in journal_mapping.items():
+        if pattern in file_base.lower():
+            journal_name = name
+            break
+
+    if not journal_name:
+        print(f"Could not determine journal for file {filename}")
+        return None, None
+
+    # Extract issue number from filename
+    issue_match = re.search(r'(\d+)', file_base)
+    if issue_match:
+        issue_number = issue_match.group(1)
+    else:
+        # If no number found, use the whole base name
+        issue_number = file_base
+
+    return journal_name, issue_number
+
+
+def issue_key(filename) -> Optional[IssueKey]:
+    """(journal_key, issue_number) of a file as the importer files it, None if the journal is unknown"""
+    journal_name, issue_number = extract_journal_info(os.path.basename(filename))
+    if not journal_name:
+        return None
+    return journal_name.strip().lower(), issue_number
+
+
+def is_issue_file(file_name) -> bool:
+    """
+    Whether the importer reads a file: an XML or CSV file of an issue
+    (tarbiz_12_footnotes.xml, tarbiz_12.csv), not a report of the pipeline or a
+    hidden temporary file (.tarbiz_12_footnotes.1234.partial.xml)
+    """
+    if not file_name.endswith(IMPORTED_EXTENSIONS) or file_name.startswith(('.', '~$')):
+        return False
+    if file_name.endswith(REPORT_SUFFIX):
+        return False
+    # an issue file has an issue number
+    return any(c.isdigit() for c in file_name)
+
+
+def scan_folder(folder) -> Dict[IssueKey, List[str]]:
+    """
+    Issues of the files the importer would read from a folder
+
+    Returns:
+        Issue key -> file names of the issue
+    """
+    files_by_key = {}
+    for file_name in sorted(os.listdir(folder)):
+        if not is_issue_file(file_name):
+            continue
+        key = issue_key(file_name)
+        if key is not None:
+            files_by_key.setdefault(key, []).append(file_name)
+    return files_by_key
+
+
+def write_manifest(folder, files_by_key: Dict[IssueKey, List[str]]) -> str:
+    """Save the issues of a folder to its manifest, returns the manifest path"""
+    path = os.path.join(folder, MANIFEST_NAME)
+    issues = [{"journal": journal, "issue": issue, "files": files}
+              for (journal, issue), files in sorted(files_by_key.items())]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"folder": os.path.abspath(folder), "issues": issues}, f, ensure_ascii=False, indent=1)
+    return path
+
+
+def read_manifest(path) -> Dict[IssueKey, List[str]]:
+    """Issues of a manifest written by write_manifest"""
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    try:
+        return {(entry["journal"], str(entry["issue"])): list(entry.get("files", []))
+                for entry in manifest["issues"]}
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"{path}: not an issues manifest ({e})")
@@ -0,0 +1,83 @@
+"""
+Per-issue statistics table (issue_stats)
+
+One row per issue with its page, reference and footnote counts. The reports
+of SqlTesrt read it instead of joining main_texts, document_references and
+footnotes_table at once, a join that grows to pages x references x footnotes
+rows per issue.
+
+The importer refreshes the row of an issue in the transaction that imports
+it (a count over the issue_id prefix of the unique keys). A full refresh
+rebuilds the table with one grouped count per table, for rows changed outside
+the importer:
+
+    python issue_stats.py
+"""
+
+import argparse
+import time
+
+import mysql.connector
+
+from db_pool import pooled_connection
+
+CREATE_TABLE = """CREATE TABLE IF NOT EXISTS issue_stats (
+    issue_id INT PRIMARY KEY,
+    journal_id INT NOT NULL,
+    page_count INT NOT NULL DEFAULT 0,
+    reference_count INT NOT NULL DEFAULT 0,
+    footnote_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    KEY ix_issue_stats_journal (journal_id),
+    FOREIGN KEY (issue_id) REFERENCES issues (issue_id) ON DELETE CASCADE
+)"""
+
+REFRESH_ISSUE = """REPLACE INTO issue_stats (issue_id, journal_id, page_count, reference_count, footnote_count)
+SELECT i.issue_id, i.journal_id,
+    (SELECT COUNT(DISTINCT page_name) FROM main_texts WHERE issue_id = i.issue_id),
+    (SELECT COUNT(*) FROM document_references WHERE issue_id = i.issue_id),
+    (SELECT COUNT(*) FROM footnotes_table WHERE issue_id = i.issue_id)
+FROM issues i
+WHERE i.issue_id = %s"""
+
+REFRESH_ALL = """REPLACE INTO issue_stats (issue_id, journal_id, page_count, reference_count, footnote_count)
+SELECT i.issue_id, i.journal_id, COALESCE(mt.n, 0), COALESCE(dr.n, 0), COALESCE(ft.n, 0)
+FROM issues i
+LEFT JOIN (SELECT issue_id, COUNT(DISTINCT page_name) AS n FROM main_texts GROUP BY issue_id) mt
+    ON mt.issue_id = i.issue_id
+LEFT JOIN (SELECT issue_id, COUNT(*) AS n FROM document_references GROUP BY issue_id) dr
+    ON dr.issue_id = i.issue_id
+LEFT JOIN (SELECT issue_id, COUNT(*) AS n FROM footnotes_table GROUP BY issue_id) ft
+    ON ft.issue_id = i.issue_id"""
+
+
+def refresh_issue(statements, issue_id: int):
+    """Recount one issue (statements: db_pool.PreparedStatements of the import transaction)"""
+    statements.execute(REFRESH_ISSUE, (issue_id,))
+
+
+def refresh_all(cursor) -> int:
+    """Rebuild the rows of all issues, returns the number of issues"""
+    cursor.execute(REFRESH_ALL)
+    cursor.execute("SELECT COUNT(*) FROM issue_stats")
+    return cursor.fetchone()[0]
+
+
+def main():
+    argparse.ArgumentParser(prog='issue-stats', description='Rebuild the issue_stats table').parse_args()
+
+    started = time.time()
+    try:
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            count = refresh_all(cursor)
+            conn.commit()
+            cursor.close()
+    except (mysql.connector.Error, ValueError) as err:
+        print(f"Database error: {err}")
+        return
+    print(f"Refreshed statistics of {count} issues in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Journal profile registry
+
+The footnote thresholds of every journal live in journal_profiles.json.
+The file is read and validated once per process; footnoteConfig objects are
+built from it on demand and cached, so worker processes only need the journal
+key and the document type ('printed' / 'scanned') to get their configuration.
+"""
+
+import copy
+import json
+import os
+from dataclasses import fields
+from functools import lru_cache
+from typing import Dict, List
+
+from OSTtessToPDF import footnoteConfig
+
+PROFILES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "journal_profiles.json")
+
+DOC_TYPES = ("printed", "scanned")
+DEFAULT_PROFILE = "default"
+
+# footnoteConfig fields that every journal profile has to define
+THRESHOLD_FIELDS = (
+    "bottom_margin_min", "bottom_margin_max",
+    "left_margin_threshold_even", "left_margin_threshold_odd",
+    "width_threshold_even", "width_threshold_odd",
+    "merge_footnotes_threshold_even", "merge_footnotes_threshold_odd",
+    "footnotes_spleat_threshold_even", "footnotes_spleat_threshold_odd",
+    "total_left",
+)
+
+
+def validate_thresholds(name: str, params: dict) -> List[str]:
+    """Return a list of problems found in the thresholds of a single profile"""
+    errors = []
+
+    missing = [key for key in THRESHOLD_FIELDS if key not in params]
+    if missing:
+        errors.append(f"{name}: missing {', '.join(missing)}")
+
+    known = {f.name for f in fields(footnoteConfig)}
+    unknown = [key for key in params if key not in known]
+    if unknown:
+        errors.append(f"{name}: unknown parameters {', '.join(unknown)}")
+
+    for key, value in params.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors.append(f"{name}: {key} must be a number, got {value!r}")
+        elif value <= 0:
+            errors.append(f"{name}: {key} must be positive, got {value}")
+
+    bottom_min = params.get("bottom_margin_min")
+    bottom_max = params.get("bottom_margin_max")
+    if isinstance(bottom_min, (int, float)) and isinstance(bottom_max, (int, float)) and bottom_min > bottom_max:
+        errors.append(f"{name}: bottom_margin_min ({bottom_min}) is greater than bottom_margin_max ({bottom_max})")
+
+    return errors
+
+
+def validate_profiles(data: dict) -> None:
+    """Check the structure and the threshold values of a profiles file, raise ValueError on any problem"""
+    errors = []
+
+    if not isinstance(data.get("journals"), dict) or not data["journals"]:
+        errors.append("'journals' section is missing or empty")
+    if not isinstance(data.get(DEFAULT_PROFILE), dict):
+        errors.append(f"'{DEFAULT_PROFILE}' section is missing")
+    if not isinstance(data.get("exclusion_phrases", []), list):
+        errors.append("'exclusion_phrases' must be a list")
+
+    profiles = dict(data.get("journals") or {})
+    if isinstance(data.get(DEFAULT_PROFILE), dict):
+        profiles[DEFAULT_PROFILE] = data[DEFAULT_PROFILE]
+
+    for journal_key, profile in profiles.items():
+        for doc_type in DOC_TYPES:
+            if not isinstance(profile.get(doc_type), dict):
+                errors.append(f"{journal_key}: '{doc_type}' thresholds are missing")
+                continue
+            errors.extend(validate_thresholds(f"{journal_key}/{doc_type}", profile[doc_type]))
+
+    if errors:
+        raise ValueError("Invalid journal profiles:\n  " + "\n  ".join(errors))
+
+
+@lru_cache(maxsize=None)
+def _load_profiles(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    validate_profiles(data)
+    return data
+
+
+def load_journal_profiles(path: str = PROFILES_PATH) -> dict:
+    """Load the validated profiles file (read once per process, a copy is returned)"""
+    return copy.deepcopy(_load_profiles(os.path.abspath(path)))
+
+
+def get_journal_configs(path: str = PROFILES_PATH) -> Dict[str, Dict[str, dict]]:
+    """Return {journal_key: {doc_type: thresholds}} for all named journals"""
+    journals = _load_profiles(os.path.abspath(path))["journals"]
+    return {key: {doc_type: dict(profile[doc_type]) for doc_type in DOC_TYPES}
+            for key, profile in journals.items()}
+
+
+def detect_journal_key(input_path: str, path: str = PROFILES_PATH) -> str:
+    """Find the journal of an input folder/file by the aliases of the profiles"""
+    path_lower = input_path.lower()
+    for journal_key, profile in _load_profiles(os.path.abspath(path))["journals"].items():
+        if any(alias in path_lower for alias in profile.get("aliases", [journal_key])):
+            return journal_key
+    return DEFAULT_PROFILE
+
+
+def detect_doc_type(input_path: str) -> str:
+    """Tesseract output of printed PDFs is kept in 'ocr-tess-printed' folders"""
+    return "printed" if "ocr-tess-printed" in input_path.lower() else "scanned"
+
+
+@lru_cache(maxsize=None)
+def get_footnote_config(journal_key: str, doc_type: str, path: str = PROFILES_PATH) -> footnoteConfig:
+    """
+    Build the footnoteConfig of a journal profile
+
+    Args:
+        journal_key: Profile name, e.g. 'tarbiz' (or 'default')
+        doc_type: 'printed' or 'scanned'
+        path: Profiles file
+
+    Returns:
+        A frozen footnoteConfig, shared between callers asking for the same profile
+    """
+    data = _load_profiles(os.path.abspath(path))
+
+    if journal_key == DEFAULT_PROFILE:
+        profile = data[DEFAULT_PROFILE]
+    else:
+        profile = data["journals"].get(journal_key, {})
+
+    params = profile.get(doc_type)
+    if not params:
+        raise ValueError(f"No configuration found for journal '{journal_key}' type '{doc_type}'")
+
+    return footnoteConfig(
+        exclusion_phrases=tuple(data.get("exclusion_phrases", [])),
+        start_row=data.get("start_row", 1),
+        **params
+    )
+
+
+def footnote_config_for_path(input_path: str, doc_type: str = None, path: str = PROFILES_PATH) -> footnoteConfig:
+    """Pick the profile for an input folder/file; the document type is taken from the path when not given"""
+    if doc_type is None:
+        doc_type = detect_doc_type(input_path)
+    return get_footnote_config(detect_journal_key(input_path, path), doc_type, path)
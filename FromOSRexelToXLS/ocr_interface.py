@@ -2,16 +2,21 @@ import tkinter as tk
 from tkinter import filedialog, ttk, messagebox, scrolledtext
 import os
 import threading
+import time
 import csv
 from pathlib import Path
 from OSTtessToPDF import (
     footnoteConfig,
     footnoteProcessor,
     save_footnotes_to_xml,
-    save_footnotes_to_csv,
+    FootnoteCsvWriter,
+    csv_output_path,
     extract_issue_number_from_filename,
     extract_journal_name_from_path
 )
+import journal_profiles
+from run_checkpoint import (RunCheckpoint, IncrementalReportWriter, checkpoint_path,
+                            STATUS_DONE, STATUS_ERROR)
 
 # Import paper_abbrev functionality
 try:
@@ -24,123 +29,42 @@ except ImportError:
     print("Warning: abbreviations module not available. Paper abbreviation processing will be disabled.")
 
 
+# Columns of the footnotes report saved by the interface
+FOOTNOTE_REPORT_HEADERS = [
+    "Issue_Number",
+    "Filename",
+    "Meta_References_Count",
+    "Meta_Biggest_Label_Number",
+    "Collected_Footnotes_Count",
+    "Has_Meta_File",
+    "Processing_Status"
+]
+
+
+def footnote_report_row(result: dict) -> dict:
+    """Convert a footnotes result of the interface to a report row"""
+    return {
+        "Issue_Number": result.get("issue_number", ""),
+        "Filename": result.get("filename", ""),
+        "Meta_References_Count": result.get("meta_references", 0),
+        "Meta_Biggest_Label_Number": result.get("meta_labels", 0),
+        "Collected_Footnotes_Count": result.get("collected_footnotes", 0),
+        "Has_Meta_File": result.get("has_meta_file", False),
+        "Processing_Status": result.get("status", "")
+    }
+
+
+def report_file_path(output_dir: str, journal_name: str, proc_type: str) -> str:
+    return os.path.join(output_dir, f"{journal_name}_{proc_type}_processing_report.csv")
+
+
 class JournalConfigManager:
-    """Manages journal configurations to avoid duplication"""
+    """Manages journal configurations to avoid duplication (backed by journal_profiles.json)"""
 
     @staticmethod
     def get_journal_configs():
         """Returns the complete journal configuration dictionary"""
-        return {
-            "tarbiz": {
-                "printed": {
-                    "bottom_margin_min": 1605, "bottom_margin_max": 1670,
-                    "left_margin_threshold_even": 195, "left_margin_threshold_odd": 295,
-                    "width_threshold_even": 1070, "width_threshold_odd": 1160,
-                    "merge_footnotes_threshold_even": 1050, "merge_footnotes_threshold_odd": 1080,
-                    "footnotes_spleat_threshold_even": 1070, "footnotes_spleat_threshold_odd": 1180,
-                    "total_left": 7200
-                },
-                "scanned": {
-                    "bottom_margin_min": 1605, "bottom_margin_max": 1695,
-                    "left_margin_threshold_even": 195, "left_margin_threshold_odd": 195,
-                    "width_threshold_even": 1095, "width_threshold_odd": 1095,
-                    "merge_footnotes_threshold_even": 1070, "merge_footnotes_threshold_odd": 1070,
-                    "footnotes_spleat_threshold_even": 1085, "footnotes_spleat_threshold_odd": 1085,
-                    "total_left": 7200
-                }
-            },
-            "meghillot": {
-                "printed": {
-                    "bottom_margin_min": 1670, "bottom_margin_max": 1680,
-                    "left_margin_threshold_even": 220, "left_margin_threshold_odd": 220,
-                    "width_threshold_even": 1027, "width_threshold_odd": 1027,
-                    "merge_footnotes_threshold_even": 1027, "merge_footnotes_threshold_odd": 1140,
-                    "footnotes_spleat_threshold_even": 1080, "footnotes_spleat_threshold_odd": 1150,
-                    "total_left": 6700
-                },
-                "scanned": {
-                    "bottom_margin_min": 1670, "bottom_margin_max": 1680,
-                    "left_margin_threshold_even": 220, "left_margin_threshold_odd": 220,
-                    "width_threshold_even": 1027, "width_threshold_odd": 1027,
-                    "merge_footnotes_threshold_even": 1027, "merge_footnotes_threshold_odd": 1027,
-                    "footnotes_spleat_threshold_even": 1050, "footnotes_spleat_threshold_odd": 1050,
-                    "total_left": 6700
-                }
-            },
-            "shenmishivri": {
-
-                "printed": {
-                    "bottom_margin_min": 1645, "bottom_margin_max": 1685,
-                    "left_margin_threshold_even": 205, "left_margin_threshold_odd": 205,
-                    "width_threshold_even": 1075, "width_threshold_odd": 1075,
-                    "merge_footnotes_threshold_even":1045, "merge_footnotes_threshold_odd": 1045,
-                    "footnotes_spleat_threshold_even": 1055, "footnotes_spleat_threshold_odd": 1055,
-                    "total_left": 7000
-                },
-                "scanned": {
-                    "bottom_margin_min": 1645, "bottom_margin_max": 1685,
-                    "left_margin_threshold_even": 205, "left_margin_threshold_odd": 205,
-                    "width_threshold_even": 1075, "width_threshold_odd": 1075,
-                    "merge_footnotes_threshold_even": 1045, "merge_footnotes_threshold_odd": 1045,
-                    "footnotes_spleat_threshold_even": 1055, "footnotes_spleat_threshold_odd": 1055,
-                    "total_left": 7000
-                }
-            },
-            "sibra": {
-                "printed": {
-                    "bottom_margin_min": 1680, "bottom_margin_max": 1712,
-                    "left_margin_threshold_even": 195, "left_margin_threshold_odd": 295,
-                    "width_threshold_even": 1090, "width_threshold_odd": 1090,
-                    "merge_footnotes_threshold_even": 1050, "merge_footnotes_threshold_odd": 1140,
-                    "footnotes_spleat_threshold_even": 1080, "footnotes_spleat_threshold_odd": 1150,
-                    "total_left": 7200
-                },
-                "scanned": {
-                    "bottom_margin_min": 1680, "bottom_margin_max": 1712,
-                    "left_margin_threshold_even": 195, "left_margin_threshold_odd": 195,
-                    "width_threshold_even": 1090, "width_threshold_odd": 1090,
-                    "merge_footnotes_threshold_even": 1070, "merge_footnotes_threshold_odd": 1070,
-                    "footnotes_spleat_threshold_even": 1080, "footnotes_spleat_threshold_odd": 1080,
-                    "total_left": 7200
-                }
-            },
-            "zion": {
-                "printed": {
-                    "bottom_margin_min": 1680, "bottom_margin_max": 1698,
-                    "left_margin_threshold_even": 225, "left_margin_threshold_odd": 225,
-                    "width_threshold_even": 1080, "width_threshold_odd": 1080,
-                    "merge_footnotes_threshold_even": 1050, "merge_footnotes_threshold_odd": 1140,
-                    "footnotes_spleat_threshold_even": 1080, "footnotes_spleat_threshold_odd": 1150,
-                    "total_left": 7200
-                },
-                "scanned": {
-                    "bottom_margin_min": 1680, "bottom_margin_max": 1698,
-                    "left_margin_threshold_even": 225, "left_margin_threshold_odd": 225,
-                    "width_threshold_even": 1080, "width_threshold_odd": 1080,
-                    "merge_footnotes_threshold_even": 1070, "merge_footnotes_threshold_odd": 1070,
-                    "footnotes_spleat_threshold_even": 1080, "footnotes_spleat_threshold_odd": 1080,
-                    "total_left": 7200
-                }
-            },
-            "leshonenu": {
-                "printed": {
-                    "bottom_margin_min": 1680, "bottom_margin_max": 1665,
-                    "left_margin_threshold_even": 220, "left_margin_threshold_odd": 220,
-                    "width_threshold_even": 1077, "width_threshold_odd": 1077,
-                    "merge_footnotes_threshold_even": 1050, "merge_footnotes_threshold_odd": 1140,
-                    "footnotes_spleat_threshold_even": 1080, "footnotes_spleat_threshold_odd": 1150,
-                    "total_left": 7200
-                },
-                "scanned": {
-                    "bottom_margin_min": 1680, "bottom_margin_max": 1665,
-                    "left_margin_threshold_even": 220, "left_margin_threshold_odd": 220,
-                    "width_threshold_even": 1077, "width_threshold_odd": 1077,
-                    "merge_footnotes_threshold_even": 1070, "merge_footnotes_threshold_odd": 1070,
-                    "footnotes_spleat_threshold_even": 1080, "footnotes_spleat_threshold_odd": 1080,
-                    "total_left": 7200
-                }
-            }
-        }
+        return journal_profiles.get_journal_configs()
 
     @staticmethod
     def get_config_for_journal(journal_key: str, doc_type: str) -> dict:
@@ -151,21 +75,7 @@ class JournalConfigManager:
     @staticmethod
     def create_footnote_config(journal_key: str, doc_type: str) -> footnoteConfig:
         """Create a footnoteConfig object for the specified journal and type"""
-        params = JournalConfigManager.get_config_for_journal(journal_key, doc_type)
-
-        if not params:
-            raise ValueError(f"No configuration found for journal '{journal_key}' type '{doc_type}'")
-
-        return footnoteConfig(
-            exclusion_phrases=[
-                "https://about,jstor.org/terms",
-                "[תרביץ", "(תרביץ",
-                "https://about.jstor.org/terms",
-                "https://aboutjstor.org/terms"
-            ],
-            start_row=1,
-            **params  # Unpack all the parameter values
-        )
+        return journal_profiles.get_footnote_config(journal_key, doc_type)
 
 
 class ProcessingTaskManager:
@@ -174,8 +84,14 @@ class ProcessingTaskManager:
     def __init__(self, interface):
         self.interface = interface
 
-    def process_footnotes_folder(self, input_dir, output_dir, meta_dir, journal_key, doc_type):
-        """Process footnotes for an entire folder"""
+    def process_footnotes_folder(self, input_dir, output_dir, meta_dir, journal_key, doc_type, resume=False):
+        """Process footnotes for an entire folder
+
+        Every finished file is written to a checkpoint journal and to the report in the
+        output directory; with resume=True the files finished by an earlier run are skipped.
+        """
+        checkpoint = None
+        report = None
         try:
             self.interface.log_message("Starting folder footnote processing...")
 
@@ -194,9 +110,28 @@ class ProcessingTaskManager:
             total_meta_refs = 0
             processed_files = 0
 
+            checkpoint = RunCheckpoint(checkpoint_path(output_dir, journal_name, "_footnotes"), resume=resume)
+            previous_results = checkpoint.finished_rows()
+            report = IncrementalReportWriter(report_file_path(output_dir, journal_name, "footnotes"),
+                                             FOOTNOTE_REPORT_HEADERS,
+                                             [footnote_report_row(r) for r in previous_results])
+
+            for result_data in previous_results:
+                total_footnotes += result_data["collected_footnotes"]
+                total_meta_refs += result_data["meta_references"]
+                processed_files += 1
+                self.interface.update_results_table(result_data)
+                self.interface.processing_results.append(result_data)
+            if previous_results:
+                self.interface.log_message(f"Resuming: {len(previous_results)} files already processed")
+
             for i, xlsx_file in enumerate(xlsx_files):
                 self.interface.progress_var.set(int((i / len(xlsx_files)) * 100))
 
+                if checkpoint.is_finished(xlsx_file):
+                    continue
+                started = time.perf_counter()
+
                 file_path = os.path.join(input_dir, xlsx_file)
                 base_name = os.path.splitext(xlsx_file)[0]
                 issue_number = extract_issue_number_from_filename(xlsx_file)
@@ -218,13 +153,12 @@ class ProcessingTaskManager:
                 try:
                     self.interface.log_message(f"Processing file: {xlsx_file}")
 
-                    # Process the file
-                    all_footnotes, main_texts = processor.process_workbook(file_path)
-
-                    # Save results
+                    # Process the file, the csv is written while the pages are processed
                     output_xml = os.path.join(output_dir, f"{base_name}_footnotes.xml")
+                    with FootnoteCsvWriter(csv_output_path(output_xml)) as csv_writer:
+                        all_footnotes, main_texts = processor.process_workbook(file_path, csv_writer.write_main_text)
+                        csv_writer.write_footnotes(all_footnotes)
                     save_footnotes_to_xml(all_footnotes, main_texts, output_xml)
-                    save_footnotes_to_csv(all_footnotes, main_texts, output_xml)
 
                     ref_count = len(all_footnotes)
                     total_footnotes += ref_count
@@ -240,6 +174,10 @@ class ProcessingTaskManager:
                     self.interface.log_message(f"Error processing {xlsx_file}: {e}")
                     result_data["status"] = f"Error: {str(e)[:50]}..."
 
+                status = STATUS_DONE if result_data["status"] == "Completed" else STATUS_ERROR
+                checkpoint.record(xlsx_file, status, result_data, time.perf_counter() - started)
+                report.write(footnote_report_row(result_data))
+
                 self.interface.update_results_table(result_data)
                 self.interface.processing_results.append(result_data)
 
@@ -257,6 +195,10 @@ class ProcessingTaskManager:
             self.interface.log_message(f"Error during processing: {e}")
             messagebox.showerror("Error", f"An error occurred: {e}")
         finally:
+            if checkpoint is not None:
+                checkpoint.close()
+            if report is not None:
+                report.close()
             self.interface.start_button.config(state=tk.NORMAL)
 
     def process_footnotes_single(self, file_path, output_dir, journal_key, doc_type):
@@ -287,13 +229,12 @@ class ProcessingTaskManager:
                 self.interface.log_message(f"Processing file: {filename}")
                 self.interface.progress_var.set(50)
 
-                # Process the file
-                all_footnotes, main_texts = processor.process_workbook(file_path)
-
-                # Save results
+                # Process the file, the csv is written while the pages are processed
                 output_xml = os.path.join(output_dir, f"{base_name}_footnotes.xml")
+                with FootnoteCsvWriter(csv_output_path(output_xml)) as csv_writer:
+                    all_footnotes, main_texts = processor.process_workbook(file_path, csv_writer.write_main_text)
+                    csv_writer.write_footnotes(all_footnotes)
                 save_footnotes_to_xml(all_footnotes, main_texts, output_xml)
-                save_footnotes_to_csv(all_footnotes, main_texts, output_xml)
 
                 ref_count = len(all_footnotes)
                 result_data["collected_footnotes"] = ref_count
@@ -466,6 +407,12 @@ class EnhancedOCRInterface(tk.Tk):
                                        state="readonly")
         self.type_combo.grid(row=1, column=1, padx=5, pady=5, sticky="w")
 
+        # Resume an interrupted folder run from its checkpoint journal
+        self.resume_var = tk.BooleanVar(value=False)
+        self.resume_check = ttk.Checkbutton(params_frame, text="Resume (skip files finished by the last run)",
+                                            variable=self.resume_var)
+        self.resume_check.grid(row=2, column=0, columnspan=2, sticky="w", pady=5)
+
         # Results table section
         results_frame = ttk.LabelFrame(self.main_frame, text="Processing Results", padding="10")
         results_frame.pack(fill=tk.BOTH, expand=True, pady=10)
@@ -632,6 +579,7 @@ class EnhancedOCRInterface(tk.Tk):
         mode = self.processing_mode.get()
         if mode == "folder":
             self.input_label.config(text="Input Directory:")
+            self.resume_check.grid()
             self.meta_label.grid()
             self.meta_entry.grid()
             self.meta_browse_btn.grid()
@@ -648,6 +596,7 @@ class EnhancedOCRInterface(tk.Tk):
                 self.input_label.config(text="Input File (XLSX):")
             else:
                 self.input_label.config(text="Input File (PDF):")
+            self.resume_check.grid_remove()
             self.meta_label.grid_remove()
             self.meta_entry.grid_remove()
             self.meta_browse_btn.grid_remove()
@@ -849,7 +798,7 @@ Average per File: {total_items / max(total_files, 1):.1f} abbreviations"""
                 meta_dir = self.meta_dir_var.get()
                 thread = threading.Thread(
                     target=self.task_manager.process_footnotes_folder,
-                    args=(input_path, output_dir, meta_dir, journal, doc_type)
+                    args=(input_path, output_dir, meta_dir, journal, doc_type, self.resume_var.get())
                 )
             else:  # single file
                 thread = threading.Thread(
@@ -889,38 +838,17 @@ Average per File: {total_items / max(total_files, 1):.1f} abbreviations"""
         journal_name = extract_journal_name_from_path(self.input_dir_var.get())
         proc_type = self.processing_type.get()
 
-        # Create filename and full path
-        filename = f"{journal_name}_{proc_type}_processing_report.csv"
-        file_path = os.path.join(output_dir, filename)
+        # Create full path
+        file_path = report_file_path(output_dir, journal_name, proc_type)
 
         try:
             if proc_type == "footnotes":
-                # Define CSV headers for footnotes
-                headers = [
-                    "Issue_Number",
-                    "Filename",
-                    "Meta_References_Count",
-                    "Meta_Biggest_Label_Number",
-                    "Collected_Footnotes_Count",
-                    "Has_Meta_File",
-                    "Processing_Status"
-                ]
-
                 with open(file_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                    writer = csv.DictWriter(csvfile, fieldnames=headers)
+                    writer = csv.DictWriter(csvfile, fieldnames=FOOTNOTE_REPORT_HEADERS)
                     writer.writeheader()
 
                     for result in self.processing_results:
-                        row = {
-                            "Issue_Number": result.get("issue_number", ""),
-                            "Filename": result.get("filename", ""),
-                            "Meta_References_Count": result.get("meta_references", 0),
-                            "Meta_Biggest_Label_Number": result.get("meta_labels", 0),
-                            "Collected_Footnotes_Count": result.get("collected_footnotes", 0),
-                            "Has_Meta_File": result.get("has_meta_file", False),
-                            "Processing_Status": result.get("status", "")
-                        }
-                        writer.writerow(row)
+                        writer.writerow(footnote_report_row(result))
 
             else:  # abbreviations
                 # Define CSV headers for abbreviations
@@ -0,0 +1,288 @@
+"""
+Pages of a born-digital PDF in the layout of a Tesseract workbook
+
+A printed (not scanned) PDF has its text and the exact font size of every
+character, so it does not need OCR. This module converts the spans of
+PyMuPDF (page.get_text("rawdict")) into the page DataFrames that
+footnoteProcessor reads from a Tesseract workbook: one row per block,
+paragraph and line (conf -1) followed by the word rows, with the columns
+level, block_num, par_num, line_num, word_num, left, top, width, height,
+conf, text and Page.
+
+Coordinates are converted from PDF points to pixels of a page image of
+DEFAULT_DPI, the resolution the pixel thresholds of journal_profiles are
+tuned on. The height of a word is its font size in pixels (the size of the
+span with most of its characters), not the height of its glyphs; with
+footnoteProcessor.process_pdf the footnote engine uses it as the font size
+instead of estimating one from the glyph height (calc_font_size).
+
+    python pdf_span_source.py tarbiz_12.pdf -o output/tarbiz
+"""
+
+import argparse
+import logging
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from text_patterns import HEBREW_LETTER, LATIN_LETTER
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # only needed to read PDF files
+    fitz = None
+
+# A4 at 150 dpi is 1240 x 1754 px, the page the bottom margins of the profiles (1600-1700 px) imply
+DEFAULT_DPI = 150
+POINTS_PER_INCH = 72
+
+FRAME_COLUMNS = ["level", "block_num", "par_num", "line_num", "word_num",
+                 "left", "top", "width", "height", "conf", "text"]
+LEVEL_BLOCK, LEVEL_PARAGRAPH, LEVEL_LINE, LEVEL_WORD = 2, 3, 4, 5
+STRUCTURE_CONF = -1
+WORD_CONF = 100  # the text layer is exact
+
+BBox = Tuple[float, float, float, float]
+
+
+def page_name(page_number: int) -> str:
+    """Sheet name of a page in a Tesseract workbook (p01, p02, ...)"""
+    return f"p{page_number:02d}"
+
+
+def _span_chars(span: dict) -> List[Tuple[str, BBox]]:
+    """(character, bbox) of a span; spans without characters ("dict" output) are split evenly"""
+    chars = span.get("chars")
+    if chars is not None:
+        return [(char["c"], tuple(char["bbox"])) for char in chars]
+
+    text = span.get("text", "")
+    if not text:
+        return []
+    x0, y0, x1, y1 = span["bbox"]
+    step = (x1 - x0) / len(text)
+    return [(c, (x0 + i * step, y0, x0 + (i + 1) * step, y1)) for i, c in enumerate(text)]
+
+
+def line_words(line: dict) -> List[Tuple[str, BBox, float]]:
+    """
+    Words of a line: (text, bbox, font size)
+
+    Words are split at whitespace only, so a word may run over several spans
+    (e.g. a superscript footnote number); its size is the size of the span
+    with most of its characters.
+    """
+    words = []
+    text, boxes, sizes = [], [], {}
+
+    def end_word():
+        if text:
+            size = max(sizes.items(), key=lambda item: item[1])[0]
+            bbox = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                    max(b[2] for b in boxes), max(b[3] for b in boxes))
+            words.append(("".join(text), bbox, size))
+            text.clear()
+            boxes.clear()
+            sizes.clear()
+
+    for span in line["spans"]:
+        for char, bbox in _span_chars(span):
+            if char.isspace():
+                end_word()
+                continue
+            text.append(char)
+            boxes.append(bbox)
+            sizes[span["size"]] = sizes.get(span["size"], 0) + 1
+    end_word()
+    return words
+
+
+def _vertical_overlap(a: BBox, b: BBox) -> float:
+    """Vertical overlap of two boxes as a fraction of the lower one"""
+    overlap = min(a[3], b[3]) - max(a[1], b[1])
+    return overlap / max(min(a[3] - a[1], b[3] - b[1]), 1e-6)
+
+
+def visual_lines(lines: List[Tuple[dict, List]]) -> List[Tuple[BBox, List]]:
+    """
+    Merge the lines of a block that are on the same visual line
+
+    PyMuPDF starts a new line at a change of direction or a gap, e.g. after
+    the number of a footnote, where Tesseract has one line. Words of a merged
+    line are in reading order: right to left if it has more Hebrew than
+    Latin letters, like the word order of Tesseract.
+
+    Args:
+        lines: (line dict, line_words) of a block
+
+    Returns:
+        (bbox, words) per visual line, top to bottom
+    """
+    merged = []
+    for line, words in sorted(lines, key=lambda item: (item[0]["bbox"][1] + item[0]["bbox"][3]) / 2):
+        bbox = tuple(line["bbox"])
+        if merged and _vertical_overlap(merged[-1][0], bbox) >= 0.5:
+            last_bbox, last_words = merged[-1]
+            merged[-1] = ((min(last_bbox[0], bbox[0]), min(last_bbox[1], bbox[1]),
+                           max(last_bbox[2], bbox[2]), max(last_bbox[3], bbox[3])), last_words + words)
+        else:
+            merged.append((bbox, list(words)))
+
+    ordered = []
+    for bbox, words in merged:
+        text = "".join(word[0] for word in words)
+        if len(HEBREW_LETTER.findall(text)) > len(LATIN_LETTER.findall(text)):
+            words = sorted(words, key=lambda word: -word[1][2])
+        else:
+            words = sorted(words, key=lambda word: word[1][0])
+        ordered.append((bbox, words))
+    return ordered
+
+
+def _block_size(lines: List[Tuple[dict, List]]) -> float:
+    """Font size of most words of a block"""
+    sizes = [word[2] for _, words in lines for word in words]
+    return max(set(sizes), key=sizes.count)
+
+
+def group_blocks(blocks: List[Tuple[dict, List]]) -> List[List[Tuple[dict, List]]]:
+    """
+    Group consecutive text blocks of the same font size that follow each other
+    with less than a line of space, like the paragraphs of a Tesseract block
+
+    PyMuPDF makes a block of every paragraph, e.g. of every footnote, where
+    Tesseract has one block of several paragraphs; the paragraph split of
+    footnoteProcessor starts a paragraph at every new block.
+
+    Args:
+        blocks: (block dict, its (line, words) list) in page order
+    """
+    groups = []
+    previous = None
+    for block, lines in blocks:
+        size = _block_size(lines)
+        if (previous is not None and abs(size - previous[1]) < 0.5
+                and 0 <= block["bbox"][1] - previous[0]["bbox"][3] < size):
+            groups[-1].append((block, lines))
+        else:
+            groups.append([(block, lines)])
+        previous = (block, size)
+    return groups
+
+
+def _structure_row(level: int, block_num: int, line_num: int, bbox: Sequence[float], scale: float,
+                   par_num: int = 0) -> Dict:
+    return {"level": level, "block_num": block_num, "par_num": par_num,
+            "line_num": line_num, "word_num": 0, **_pixel_box(bbox, scale),
+            "conf": STRUCTURE_CONF, "text": None}
+
+
+def _pixel_box(bbox: Sequence[float], scale: float) -> Dict:
+    x0, y0, x1, y1 = bbox
+    return {"left": int(round(x0 * scale)), "top": int(round(y0 * scale)),
+            "width": int(round((x1 - x0) * scale)), "height": int(round((y1 - y0) * scale))}
+
+
+def page_frame(page_dict: dict, name: str, dpi: float = DEFAULT_DPI) -> pd.DataFrame:
+    """
+    Tesseract-like DataFrame of one page
+
+    Args:
+        page_dict: page.get_text("rawdict") (or "dict", with evenly split word boxes)
+        name: Page name for the Page column
+        dpi: Resolution of the pixel coordinates
+
+    Returns:
+        The page rows (FRAME_COLUMNS and Page)
+    """
+    scale = dpi / POINTS_PER_INCH
+    blocks = []
+    for block in page_dict["blocks"]:
+        if block.get("type", 0) != 0:  # image block
+            continue
+        lines = [(line, line_words(line)) for line in block.get("lines", ())]
+        lines = [(line, words) for line, words in lines if words]
+        if lines:
+            blocks.append((block, lines))
+
+    rows = []
+    for block_num, group in enumerate(group_blocks(blocks), 1):
+        group_bbox = (min(block["bbox"][0] for block, _ in group), group[0][0]["bbox"][1],
+                      max(block["bbox"][2] for block, _ in group), group[-1][0]["bbox"][3])
+        rows.append(_structure_row(LEVEL_BLOCK, block_num, 0, group_bbox, scale))
+        for par_num, (block, lines) in enumerate(group, 1):
+            rows.append(_structure_row(LEVEL_PARAGRAPH, block_num, 0, block["bbox"], scale, par_num))
+            for line_num, (line_bbox, words) in enumerate(visual_lines(lines), 1):
+                rows.append(_structure_row(LEVEL_LINE, block_num, line_num, line_bbox, scale, par_num))
+                for word_num, (text, bbox, size) in enumerate(words, 1):
+                    row = {"level": LEVEL_WORD, "block_num": block_num, "par_num": par_num, "line_num": line_num,
+                           "word_num": word_num, **_pixel_box(bbox, scale), "conf": WORD_CONF, "text": text}
+                    # the font size, not the glyph height (see module docstring)
+                    row["height"] = round(size * scale, 2)
+                    rows.append(row)
+
+    df = pd.DataFrame(rows, columns=FRAME_COLUMNS)
+    df["Page"] = name
+    return df
+
+
+def read_pdf_pages(pdf_path: str, dpi: float = DEFAULT_DPI, pages: Optional[Sequence[int]] = None
+                   ) -> List[pd.DataFrame]:
+    """
+    Page DataFrames of a PDF, as _extract_data_from_xlsx returns them for a workbook
+
+    Pages without text (e.g. scanned pages inside a printed volume) are skipped
+    with a warning, they need OCR.
+
+    Args:
+        pdf_path: Born-digital PDF
+        dpi: Resolution of the pixel coordinates
+        pages: 1-based page numbers, default all pages
+    """
+    if fitz is None:
+        raise ValueError("Reading PDF files needs PyMuPDF (pip install pymupdf)")
+
+    frames = []
+    with fitz.open(pdf_path) as doc:
+        for page_number in pages or range(1, len(doc) + 1):
+            name = page_name(page_number)
+            df = page_frame(doc.load_page(page_number - 1).get_text("rawdict"), name, dpi)
+            if df.empty:
+                logging.warning(f"{os.path.basename(pdf_path)} {name}: no text layer, skipped")
+                continue
+            frames.append(df)
+    return frames
+
+
+def main():
+    from OSTtessToPDF import (FootnoteCsvWriter, csv_output_path, footnoteProcessor,
+                              save_footnotes_to_xml)
+    from journal_profiles import footnote_config_for_path
+
+    parser = argparse.ArgumentParser(prog='pdf-span-source',
+                                     description='Extract footnotes and main text from born-digital PDFs without OCR')
+    parser.add_argument('pdfs', nargs='+', help='PDF files')
+    parser.add_argument('-o', '--output', required=True, help='Output folder')
+    parser.add_argument('--dpi', type=float, default=DEFAULT_DPI,
+                        help=f'Resolution of the pixel thresholds (default {DEFAULT_DPI})')
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    for pdf_path in args.pdfs:
+        config = footnote_config_for_path(pdf_path, doc_type="printed")
+        processor = footnoteProcessor(config)
+        output_xml = os.path.join(args.output, os.path.splitext(os.path.basename(pdf_path))[0] + "_footnotes.xml")
+        try:
+            with FootnoteCsvWriter(csv_output_path(output_xml)) as csv_writer:
+                footnotes, main_texts = processor.process_pdf(pdf_path, csv_writer.write_main_text, args.dpi)
+                csv_writer.write_footnotes(footnotes)
+        except (ValueError, RuntimeError) as e:
+            print(f"Error processing {pdf_path}: {e}")
+            continue
+        save_footnotes_to_xml(footnotes, main_texts, output_xml)
+        print(f"{os.path.basename(pdf_path)}: {len(footnotes)} footnotes, {len(main_texts)} pages")
+
+
+if __name__ == "__main__":
+    main()
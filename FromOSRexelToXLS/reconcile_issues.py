@@ -0,0 +1,163 @@
+"""
+Reconcile output folders with the academic_journals database
+
+Finds the issues that are in the output folders but not imported (missing)
+and the imported issues of the same journals that have no files (extra):
+
+    python reconcile_issues.py output/tarbiz output/zion
+    python reconcile_issues.py output/tarbiz --write-manifest
+    python reconcile_issues.py backup/tarbiz/issues_manifest.json
+
+The issue of a file is derived with issue_keys, the parser of the importer.
+The keys of all folders go into a temporary table and each difference is one
+join for the whole corpus. A folder with a manifest from an earlier run is
+also compared with it (files added or removed since); --write-manifest saves
+the current state. A manifest can be given instead of a folder.
+"""
+
+import argparse
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import mysql.connector
+from tabulate import tabulate
+
+from db_pool import pooled_connection
+from issue_keys import MANIFEST_NAME, IssueKey, read_manifest, scan_folder, write_manifest
+
+EXPECTED_TABLE = "expected_issues"
+
+CREATE_EXPECTED = f"""CREATE TEMPORARY TABLE {EXPECTED_TABLE} (
+    journal_key VARCHAR(255) NOT NULL,
+    issue_number VARCHAR(64) NOT NULL,
+    PRIMARY KEY (journal_key, issue_number)
+) DEFAULT CHARSET = utf8mb4 COLLATE = utf8mb4_unicode_ci"""
+
+# MySQL cannot open a temporary table twice in one statement, so missing and
+# extra issues are two queries (one anti-join each)
+SELECT_MISSING = f"""SELECT e.journal_key, e.issue_number
+FROM {EXPECTED_TABLE} e
+LEFT JOIN journals j ON j.journal_key = e.journal_key
+LEFT JOIN issues i ON i.journal_id = j.journal_id AND i.issue_number = e.issue_number
+WHERE i.issue_id IS NULL
+ORDER BY e.journal_key, CAST(e.issue_number AS UNSIGNED), e.issue_number"""
+
+SELECT_EXTRA = f"""SELECT j.journal_key, i.issue_number
+FROM issues i
+JOIN journals j ON j.journal_id = i.journal_id
+LEFT JOIN {EXPECTED_TABLE} e ON e.journal_key = j.journal_key AND e.issue_number = i.issue_number
+WHERE e.journal_key IS NULL{{journal_filter}}
+ORDER BY j.journal_key, CAST(i.issue_number AS UNSIGNED), i.issue_number"""
+
+
+def diff_with_database(conn, keys: Iterable[IssueKey],
+                       all_journals: bool = False) -> Tuple[List[IssueKey], List[IssueKey]]:
+    """
+    Issues missing from the database and imported issues without files
+
+    Args:
+        conn: Database connection
+        keys: Issue keys of the files
+        all_journals: Report extra issues of every journal, not only of the
+            journals that have files
+
+    Returns:
+        (missing keys, extra keys), sorted by journal and issue
+    """
+    keys = sorted(set(keys))
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {EXPECTED_TABLE}")
+        cursor.execute(CREATE_EXPECTED)
+        if keys:
+            cursor.executemany(f"INSERT INTO {EXPECTED_TABLE} (journal_key, issue_number) VALUES (%s, %s)", keys)
+
+        cursor.execute(SELECT_MISSING)
+        missing = [tuple(row) for row in cursor.fetchall()]
+
+        journals = sorted({journal for journal, _ in keys})
+        journal_filter, params = "", ()
+        if not all_journals:
+            if not journals:
+                return missing, []
+            journal_filter = f" AND j.journal_key IN ({', '.join(['%s'] * len(journals))})"
+            params = tuple(journals)
+        cursor.execute(SELECT_EXTRA.format(journal_filter=journal_filter), params)
+        extra = [tuple(row) for row in cursor.fetchall()]
+        return missing, extra
+    finally:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {EXPECTED_TABLE}")
+        cursor.close()
+
+
+def compare_manifest(previous: Dict[IssueKey, List[str]],
+                     current: Dict[IssueKey, List[str]]) -> Tuple[Set[IssueKey], Set[IssueKey]]:
+    """(issues added, issues removed) of a folder since its manifest"""
+    return set(current) - set(previous), set(previous) - set(current)
+
+
+def load_source(source: str, save_manifest: bool = False) -> Optional[Dict[IssueKey, List[str]]]:
+    """Issue keys of an output folder or a manifest file; prints the changes since the folder manifest"""
+    if os.path.isfile(source):
+        return read_manifest(source)
+    if not os.path.isdir(source):
+        print(f"Folder does not exist: {source}")
+        return None
+
+    files_by_key = scan_folder(source)
+    manifest_path = os.path.join(source, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        added, removed = compare_manifest(read_manifest(manifest_path), files_by_key)
+        if added or removed:
+            print(f"{source}: since the manifest {len(added)} issues added, {len(removed)} removed")
+            for journal, issue in sorted(added):
+                print(f"   + {journal} {issue}")
+            for journal, issue in sorted(removed):
+                print(f"   - {journal} {issue}")
+    if save_manifest:
+        print(f"Saved {write_manifest(source, files_by_key)}")
+    return files_by_key
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='reconcile-issues',
+                                     description='Compare output folders with the imported issues')
+    parser.add_argument('sources', nargs='+', help=f'Output folders or {MANIFEST_NAME} files')
+    parser.add_argument('--write-manifest', action='store_true', help=f'Save {MANIFEST_NAME} in every folder')
+    parser.add_argument('--all-journals', action='store_true',
+                        help='Report extra issues of all journals, not only of the journals of the folders')
+    args = parser.parse_args()
+
+    files_by_key = {}
+    for source in args.sources:
+        try:
+            loaded = load_source(source, args.write_manifest)
+        except ValueError as err:
+            print(err)
+            return
+        if loaded is None:
+            return
+        for key, files in loaded.items():
+            files_by_key.setdefault(key, []).extend(files)
+    print(f"{len(files_by_key)} issues in {len(args.sources)} folders")
+
+    try:
+        with pooled_connection() as conn:
+            missing, extra = diff_with_database(conn, files_by_key, args.all_journals)
+    except (mysql.connector.Error, ValueError) as err:
+        print(f"Database error: {err}")
+        return
+
+    if missing:
+        rows = [[journal, issue, ", ".join(files_by_key[(journal, issue)])] for journal, issue in missing]
+        print(f"\nNot imported ({len(missing)}):")
+        print(tabulate(rows, headers=['Journal', 'Issue', 'Files'], tablefmt='grid'))
+    if extra:
+        print(f"\nImported without files ({len(extra)}):")
+        print(tabulate(extra, headers=['Journal', 'Issue'], tablefmt='grid'))
+    if not missing and not extra:
+        print("Folders and database match")
+
+
+if __name__ == "__main__":
+    main()
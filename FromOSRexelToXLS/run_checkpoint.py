@@ -0,0 +1,159 @@
+"""
+Checkpoint journal and incremental report for long folder runs
+
+Every finished file is appended to a JSONL journal (status, report row, timing),
+flushed to disk before the next file starts. A resumed run reads the journal,
+skips the files that are already done and rewrites the report from it, so an
+interrupted run loses at most the file that was being processed.
+"""
+
+import csv
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+STATUS_DONE = "done"
+STATUS_ERROR = "error"
+STATUS_SKIPPED = "skipped"
+
+# files with these statuses are not processed again on resume; errors are retried
+FINISHED_STATUSES = (STATUS_DONE, STATUS_SKIPPED)
+
+
+def checkpoint_path(output_folder: str, journal_name: str, suffix: str = "") -> str:
+    """Journal file of a run, next to its report"""
+    return os.path.join(output_folder, f"{journal_name}{suffix}_checkpoint.jsonl")
+
+
+class RunCheckpoint:
+    """Append-only JSONL journal with one record per processed file"""
+
+    def __init__(self, path: str, resume: bool = False, append: bool = False):
+        """
+        Args:
+            path: Journal file
+            resume: Load the records of earlier runs (is_finished, finished_rows) and append to them
+            append: Append to the journal without loading it, e.g. for a run of a single file;
+                otherwise a run that does not resume starts a new journal
+        """
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+
+        if resume and os.path.exists(path):
+            self._load()
+            mode = "a"
+        elif append:
+            mode = "a"
+        else:
+            mode = "w"
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._file = open(path, mode, encoding="utf-8")
+        if mode == "a" and not self._ends_with_newline():
+            # terminate a record cut off by the interruption
+            self._file.write("\n")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # the last line may be cut off by the interruption
+                    logging.warning(f"Ignoring broken checkpoint line {line_number} in {self.path}")
+                    continue
+                # later records of the same file (e.g. a retried error) win
+                self.entries[entry["filename"]] = entry
+        logging.info(f"Loaded {len(self.entries)} checkpoint records from {self.path}")
+
+    def is_finished(self, filename: str) -> bool:
+        entry = self.entries.get(filename)
+        return entry is not None and entry.get("status") in FINISHED_STATUSES
+
+    def finished_rows(self) -> List[dict]:
+        """Report rows of the files finished in earlier runs, in journal order"""
+        return [entry["row"] for entry in self.entries.values()
+                if entry.get("status") in FINISHED_STATUSES and entry.get("row") is not None]
+
+    def latest_rows(self) -> List[dict]:
+        """Report rows of the latest record of every file, in journal order"""
+        return [entry["row"] for entry in self.entries.values() if entry.get("row") is not None]
+
+    def record(self, filename: str, status: str, row: Optional[dict] = None, seconds: float = 0.0, **details):
+        """Append the result of a file and flush it to disk (details are stored with the record)"""
+        entry = {
+            "filename": filename,
+            "status": status,
+            "seconds": round(seconds, 3),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "row": row,
+            **details,
+        }
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.entries[filename] = entry
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class IncrementalReportWriter:
+    """CSV report written row by row, so it is always up to date with the journal"""
+
+    def __init__(self, path: str, headers: List[str], initial_rows: List[dict] = ()):
+        self.path = path
+        self.headers = headers
+        self._file = open(path, 'w', newline='', encoding='utf-8-sig')
+        self._writer = csv.DictWriter(self._file, fieldnames=headers, extrasaction='ignore')
+        self._writer.writeheader()
+        for row in initial_rows:
+            self._writer.writerow(row)
+        self._file.flush()
+
+    def write(self, row: dict):
+        self._writer.writerow(row)
+        self._file.flush()
+
+    def rewrite(self, rows: List[dict]):
+        """Replace the rows written so far, e.g. when a file was processed again"""
+        self._file.seek(0)
+        self._file.truncate()
+        self._writer.writeheader()
+        for row in rows:
+            self._writer.writerow(row)
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            logging.info(f"CSV report saved to: {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
@@ -0,0 +1,27 @@
+from abbreviation_matcher import AbbreviationMatcher, extract_abbreviation_label, normalize_with_offsets
+
+
+def test_gershayim_label_keeps_its_quote():
+    assert extract_abbreviation_label('ב"ר = בראשית רבה') == 'ב"ר'
+
+
+def test_gershayim_label_matches_every_quote_form():
+    matcher = AbbreviationMatcher([extract_abbreviation_label('ב"ר = בראשית רבה')])
+
+    assert matcher.is_abbreviation_reference('12 ב"ר פרשה ג') == (True, 'ב"ר')
+    assert matcher.is_abbreviation_reference('12 ב״ר פרשה ג') == (True, 'ב"ר')
+    assert matcher.is_abbreviation_reference('12 בר נש') == (False, None)
+
+
+def test_label_punctuation_is_dropped_in_texts_too():
+    matcher = AbbreviationMatcher([extract_abbreviation_label('מ.ש. - מחקרי שאלות')])
+
+    assert matcher.labels == ['מש']
+    assert matcher.find_matches('3 מ.ש. שם') == [('מש', 2, 5)]
+
+
+def test_offsets_refer_to_the_original_text():
+    normalized, offsets = normalize_with_offsets('x . ,Y  ( z )')
+
+    assert normalized == 'x y z'
+    assert offsets == [0, 1, 5, 6, 10]
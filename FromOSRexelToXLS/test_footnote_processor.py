@@ -0,0 +1,48 @@
+import openpyxl
+
+from OSTtessToPDF import FootnoteCsvWriter, footnoteProcessor
+from journal_profiles import get_footnote_config
+
+COLUMNS = ["level", "page_num", "block_num", "par_num", "line_num", "word_num",
+           "left", "top", "width", "height", "conf", "text"]
+
+
+def _text_page(words):
+    rows = [[1, 1, 0, 0, 0, 0, 0, 0, 2400, 3500, -1, None],
+            [2, 1, 1, 0, 0, 0, 150, 200, 1000, 100, -1, None],
+            [3, 1, 1, 1, 0, 0, 150, 200, 1000, 100, -1, None],
+            [4, 1, 1, 1, 1, 0, 150, 200, 1000, 32, -1, None]]
+    left = 1100
+    for word_num, word in enumerate(words, 1):
+        rows.append([5, 1, 1, 1, 1, word_num, left, 200, 80, 32, 90, word])
+        left -= 100
+    return rows
+
+
+def _write_workbook(path, pages):
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for name, rows in [("p00", [])] + pages:
+        sheet = workbook.create_sheet(name)
+        sheet.append(COLUMNS)
+        for row in rows:
+            sheet.append(row)
+    workbook.save(path)
+
+
+def test_blank_page_is_left_out_of_the_main_texts(tmp_path):
+    xlsx_path = str(tmp_path / "tarbiz_001.xlsx")
+    _write_workbook(xlsx_path, [
+        ("p01", _text_page(["שלום", "עולם"])),
+        ("p02", [[1, 1, 0, 0, 0, 0, 0, 0, 2400, 3500, -1, None]]),  # blank sheet
+        ("p03", _text_page(["תלמוד", "ירושלמי"])),
+    ])
+
+    csv_path = tmp_path / "tarbiz_001_footnotes.csv"
+    with FootnoteCsvWriter(str(csv_path)) as csv_writer:
+        footnotes, main_texts = footnoteProcessor(get_footnote_config("tarbiz", "scanned")).process_workbook(
+            xlsx_path, csv_writer.write_main_text)
+
+    assert list(main_texts) == ["p01", "p03"]
+    pages = [line.split(",")[1] for line in csv_path.read_text(encoding="utf-8-sig").splitlines()[1:]]
+    assert pages == ["p01", "p03"]
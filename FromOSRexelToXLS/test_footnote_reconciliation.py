@@ -0,0 +1,28 @@
+from footnote_reconciliation import MATCH, MISSING, SPLIT, SPURIOUS, align
+
+FIRST = ("בתלמוד הירושלמי נאמר שהחכמים ישבו בבית המדרש ודנו בשאלה מה הדין "
+         "כאשר הנהר עולה על גדותיו ומציף את השדות שבעמק")
+SECOND = "ראו גם את דברי הפרשנים באיטליה ובספרד במאה השתים עשרה"
+THIRD = "על כך כתב שלמה במאמרו הידוע שנדפס בירושלים"
+
+
+def _kinds(steps):
+    return [(step.kind, step.extracted, step.expected) for step in steps]
+
+
+def test_split_and_missing_reference_are_not_wrong_matches():
+    cut = int(len(FIRST) * 0.8)
+    extracted = ["1 " + FIRST[:cut], FIRST[cut:], "3 " + THIRD]
+    expected = [{"label": "1", "text": FIRST}, {"label": "2", "text": SECOND}, {"label": "3", "text": THIRD}]
+
+    assert _kinds(align(extracted, expected)) == [
+        (SPLIT, (0, 1), (0,)),
+        (MISSING, (), (1,)),
+        (MATCH, (2,), (2,)),
+    ]
+
+
+def test_unrelated_texts_are_gaps():
+    steps = align(["1 " + SECOND], [{"label": "1", "text": THIRD}])
+
+    assert sorted(step.kind for step in steps) == [MISSING, SPURIOUS]
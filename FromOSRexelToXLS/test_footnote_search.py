@@ -0,0 +1,76 @@
+import os
+
+from footnote_search import build_index, open_index, search
+from OSTtessToPDF import save_footnotes_to_xml
+
+FOOTNOTES = [{"page": "p01", "text": "1 תלמוד ירושלמי, ברכות"}, {"page": "p02", "text": "2 ראו שם"}]
+MAIN_TEXTS = {"p01": "על התלמוד הבבלי", "p02": "עמוד שני"}
+
+
+def _write(folder, name, footnotes=FOOTNOTES, main_texts=MAIN_TEXTS):
+    path = str(folder / name)
+    save_footnotes_to_xml(footnotes, main_texts, path)
+    return path
+
+
+def _touch_later(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_build_and_rebuild_only_changed_files(tmp_path):
+    _write(tmp_path, "tarbiz_001_footnotes.xml")
+    zion = _write(tmp_path, "zion_005_footnotes.xml")
+    conn = open_index(str(tmp_path / "index.sqlite"))
+
+    assert build_index(conn, [str(tmp_path)]) == (2, 0, 0)
+    assert build_index(conn, [str(tmp_path)]) == (0, 2, 0)
+
+    _write(tmp_path, "zion_005_footnotes.xml", [{"page": "p01", "text": "1 משנה תורה"}])
+    _touch_later(zion)
+    assert build_index(conn, [str(tmp_path)]) == (1, 1, 0)
+    assert [hit[:2] for hit in search(conn, "משנה תורה")] == [("Zion", "005")]
+    assert [hit[0] for hit in search(conn, "ירושלמי")] == ["Tarbiz"]
+
+    os.remove(zion)
+    assert build_index(conn, [str(tmp_path)]) == (0, 1, 1)
+    assert search(conn, "משנה") == []
+    conn.close()
+
+
+def test_journal_and_kind_filters(tmp_path):
+    _write(tmp_path, "tarbiz_001_footnotes.xml")
+    _write(tmp_path, "zion_005_footnotes.xml")
+    conn = open_index(str(tmp_path / "index.sqlite"))
+    build_index(conn, [str(tmp_path)])
+
+    assert len(search(conn, "תלמוד")) == 4
+    assert {hit[0] for hit in search(conn, "תלמוד", journal="zion")} == {"Zion"}
+    hits = search(conn, "תלמוד", journal="Zion", kind="footnote")
+    assert [(hit[2], hit[3], hit[4]) for hit in hits] == [("p01", "footnote", "1")]
+    assert [hit[3] for hit in search(conn, "תלמוד", kind="main_text")] == ["main_text", "main_text"]
+    conn.close()
+
+
+def test_a_broken_file_is_read_again(tmp_path):
+    path = _write(tmp_path, "tarbiz_001_footnotes.xml")
+    conn = open_index(str(tmp_path / "index.sqlite"))
+    build_index(conn, [str(tmp_path)])
+
+    with open(path, "r+", encoding="utf-8") as f:
+        content = f.read()
+        f.seek(0)
+        f.write(content[:len(content) // 2])
+        f.truncate()
+    _touch_later(path)
+
+    assert build_index(conn, [str(tmp_path)]) == (0, 0, 0)
+    assert build_index(conn, [str(tmp_path)]) == (0, 0, 0)
+    # the entries of the last good version stay until the file can be read
+    assert len(search(conn, "ירושלמי")) == 1
+
+    _write(tmp_path, "tarbiz_001_footnotes.xml")
+    _touch_later(path)
+    assert build_index(conn, [str(tmp_path)]) == (1, 0, 0)
+    assert len(search(conn, "ירושלמי")) == 1
+    conn.close()
@@ -0,0 +1,39 @@
+from issue_keys import is_issue_file, scan_folder
+from OSTtessToPDF import REPORT_HEADERS, FootnoteCsvWriter, csv_output_path, report_csv_path, save_footnotes_to_xml
+from run_checkpoint import STATUS_DONE, IncrementalReportWriter, RunCheckpoint, checkpoint_path
+from watch_daemon import CHECKPOINT_SUFFIX
+
+
+def _output_folder(folder):
+    """An output folder as the batch run and the watch daemon leave it"""
+    for issue in ("001", "002"):
+        xml_path = str(folder / f"tarbiz_{issue}_footnotes.xml")
+        save_footnotes_to_xml([{"page": "p01", "text": "1 ראו שם"}], {"p01": "שלום"}, xml_path)
+        with FootnoteCsvWriter(csv_output_path(xml_path)) as writer:
+            writer.write_main_text("p01", "שלום")
+    row = {"Filename": "tarbiz_001.xlsx", "Processing_Status": "Success"}
+    for suffix in ("", CHECKPOINT_SUFFIX):
+        with RunCheckpoint(checkpoint_path(str(folder), "Tarbiz", suffix)) as checkpoint:
+            checkpoint.record("tarbiz_001.xlsx", STATUS_DONE, row)
+    with IncrementalReportWriter(report_csv_path(str(folder), "Tarbiz"), REPORT_HEADERS, [row]):
+        pass
+    with IncrementalReportWriter(str(folder / f"Tarbiz{CHECKPOINT_SUFFIX}_report.csv"), REPORT_HEADERS, [row]):
+        pass
+    # a worker of the watch daemon still writing issue 3
+    (folder / ".tarbiz_003_footnotes.4242.partial.xml").write_text("<Footnotes>", encoding="utf-8")
+
+
+def test_scan_folder_reads_only_issue_files(tmp_path):
+    _output_folder(tmp_path)
+
+    assert scan_folder(str(tmp_path)) == {
+        ("tarbiz", "001"): ["tarbiz_001_footnotes.csv", "tarbiz_001_footnotes.xml"],
+        ("tarbiz", "002"): ["tarbiz_002_footnotes.csv", "tarbiz_002_footnotes.xml"],
+    }
+
+
+def test_plain_issue_files_are_imported():
+    assert is_issue_file("Tarbiz_12.xml")
+    assert is_issue_file("zion_5_references.csv")
+    assert not is_issue_file("Tarbiz_processing_report.csv")
+    assert not is_issue_file("~$tarbiz_12.csv")
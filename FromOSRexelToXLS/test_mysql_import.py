@@ -0,0 +1,422 @@
+"""
+Tests of the database layer (db_pool, db_schema, mysql_import)
+
+The configuration and file format tests run everywhere. The others need a
+MySQL or MariaDB server and an empty scratch database, whose tables they drop
+and create again; they are skipped unless ACADEMIC_DB_TEST_NAME names that
+database (the other settings as for db_pool), e.g.
+
+    docker run -d -p 3306:3306 -e MARIADB_ROOT_PASSWORD=test -e MARIADB_DATABASE=journals_test mariadb
+    ACADEMIC_DB_USER=root ACADEMIC_DB_PASSWORD=test ACADEMIC_DB_TEST_NAME=journals_test python -m pytest
+"""
+
+import json
+import os
+from contextlib import contextmanager
+
+import pytest
+
+mysql_connector = pytest.importorskip("mysql.connector")
+
+import db_pool
+import mysql_import
+from db_pool import PreparedStatements, load_db_config, pooled_connection
+from db_schema import LATEST_VERSION, MIGRATIONS, MIGRATIONS_TABLE, applied_versions, migrate
+from mysql_import import (INSERT_FOOTNOTE, INSERT_MAIN_TEXT, UPSERT_ISSUE, create_issue, import_csv_file,
+                          import_issue, load_csv_fast, load_journal_ids, read_pipeline_csv_format)
+from issue_stats import REFRESH_ISSUE, refresh_all
+from OSTtessToPDF import FootnoteCsvWriter, save_footnotes_to_xml
+
+TEST_DATABASE = os.environ.get("ACADEMIC_DB_TEST_NAME")
+TABLES = ("issue_stats", "footnotes_table", "document_references", "main_texts", "issues", "journals",
+          "schema_migrations")
+
+FOOTNOTES = [{"page": "p01", "text": "1 ראו שם"}, {"page": "p01", "text": "2 תלמוד ירושלמי"},
+             {"page": "p02", "text": "3 שם, עמ' 5"}]
+MAIN_TEXTS = {"p01": "שלום עולם", "p02": "עמוד שני"}
+
+
+@pytest.fixture
+def env_config(tmp_path, monkeypatch):
+    for suffix in db_pool.ENV_KEYS:
+        monkeypatch.delenv(db_pool.ENV_PREFIX + suffix, raising=False)
+    path = tmp_path / "db_config.json"
+    monkeypatch.setenv(db_pool.ENV_PREFIX + "CONFIG", str(path))
+    return path
+
+
+def test_config_from_file_and_environment(env_config, monkeypatch):
+    env_config.write_text(json.dumps({"user": "reader", "port": "3307", "pool_size": 3}))
+    monkeypatch.setenv("ACADEMIC_DB_PORT", "3308")
+
+    config = load_db_config()
+
+    assert (config["user"], config["port"], config["pool_size"]) == ("reader", 3308, 3)
+    assert config["database"] == "academic_journals"
+
+
+@pytest.mark.parametrize("file_config", [{}, {"user": "reader", "pool_size": 0}, {"user": "reader", "port": "x"}])
+def test_config_errors(env_config, file_config):
+    env_config.write_text(json.dumps(file_config))
+
+    with pytest.raises(ValueError):
+        load_db_config()
+
+
+def test_only_import_pools_send_local_files(tmp_path, monkeypatch):
+    created = []
+
+    class Pool:
+        def __init__(self, **kwargs):
+            created.append(kwargs)
+
+    monkeypatch.setattr(db_pool.pooling, "MySQLConnectionPool", Pool)
+    monkeypatch.setattr(db_pool, "_pools", {})
+    monkeypatch.setattr(db_pool, "_pool_config", None)
+    monkeypatch.setattr(db_pool, "_pool_pid", None)
+    config = dict(db_pool.DEFAULT_CONFIG, user="importer")
+
+    default_pool = db_pool.get_pool(config)
+    import_pool = db_pool.get_pool(local_infile_path=str(tmp_path))
+
+    assert import_pool is db_pool.get_pool(local_infile_path=str(tmp_path / "."))
+    assert default_pool is db_pool.get_pool()
+    assert [(kwargs.get("allow_local_infile"), kwargs.get("allow_local_infile_in_path")) for kwargs in created] == [
+        (None, None), (None, os.path.realpath(tmp_path))]
+    assert created[1]["user"] == "importer"
+
+
+def test_reports_need_an_up_to_date_schema(monkeypatch):
+    pytest.importorskip("tabulate")
+    import SqlTesrt
+
+    class Connection:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    conn = Connection()
+    monkeypatch.setattr(SqlTesrt, "get_connection", lambda: conn)
+    monkeypatch.setattr(SqlTesrt, "check_schema", lambda checked: False)
+
+    assert SqlTesrt.connect_to_db() is None
+    assert conn.closed
+
+
+def test_prepared_statements_prepare_every_sql_once():
+    class Cursor:
+        def __init__(self):
+            self.executed = []
+
+        def execute(self, sql, params):
+            self.executed.append(params)
+
+        def close(self):
+            pass
+
+    class Connection:
+        def __init__(self):
+            self.cursors = []
+
+        def cursor(self, prepared=False):
+            assert prepared
+            self.cursors.append(Cursor())
+            return self.cursors[-1]
+
+    conn = Connection()
+    with PreparedStatements(conn) as statements:
+        statements.execute(INSERT_MAIN_TEXT, (1, "p01", "a"))
+        statements.execute(INSERT_MAIN_TEXT, (1, "p02", "b"))
+        statements.execute(INSERT_FOOTNOTE, (1, "p01", 1, "c"))
+
+    assert [cursor.executed for cursor in conn.cursors] == [[(1, "p01", "a"), (1, "p02", "b")], [(1, "p01", 1, "c")]]
+
+
+def test_pipeline_csv_format(tmp_path):
+    pipeline_csv = tmp_path / "tarbiz_901_footnotes.csv"
+    with FootnoteCsvWriter(str(pipeline_csv)) as writer:
+        writer.write_main_text("p01", "שלום")
+    other_csv = tmp_path / "tarbiz_901_other.csv"
+    other_csv.write_text("type,page,content,number\nmaintext,p01,x,\n", encoding="utf-8")
+
+    assert read_pipeline_csv_format(str(pipeline_csv)) == os.linesep
+    assert read_pipeline_csv_format(str(other_csv)) is None
+
+
+class _IssueConnection:
+    """Connection stub that records the transaction statements of import_issue"""
+
+    def __init__(self, log):
+        self.log = log
+
+    def cursor(self, prepared=False):
+        return self
+
+    def execute(self, sql, params=()):
+        self.log.append(sql)
+
+    def commit(self):
+        self.log.append("COMMIT")
+
+    def rollback(self):
+        self.log.append("ROLLBACK")
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def issue_log(monkeypatch):
+    """Transaction statements of import_issue, on stub connections"""
+    log = []
+
+    @contextmanager
+    def connection(timeout=30.0, local_infile_path=None):
+        try:
+            yield _IssueConnection(log)
+        except Exception:
+            log.append("ROLLBACK")
+            raise
+
+    monkeypatch.setattr(mysql_import, "pooled_connection", connection)
+    monkeypatch.setattr(mysql_import, "RETRY_DELAY", 0)
+    return log
+
+
+def _import_files(monkeypatch, log, results):
+    """Replace the file imports with the next result of results[file name] (an exception is raised)"""
+    def import_file(conn, path, commit, statements, journal_ids):
+        log.append(os.path.basename(path))
+        result = results[os.path.basename(path)].pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(mysql_import, "import_xml_file", import_file)
+    monkeypatch.setattr(mysql_import, "import_csv_file", import_file)
+
+
+def test_import_issue_retries_a_deadlock(issue_log, monkeypatch):
+    deadlock = mysql_connector.errors.DatabaseError(errno=1213, msg="Deadlock found")
+    _import_files(monkeypatch, issue_log, {"tarbiz_906_footnotes.xml": [deadlock, True]})
+
+    assert import_issue("out", ["tarbiz_906_footnotes.xml"], {})
+    assert issue_log == ["tarbiz_906_footnotes.xml", "ROLLBACK", "tarbiz_906_footnotes.xml", "COMMIT"]
+
+
+def test_import_issue_gives_up_after_max_attempts(issue_log, monkeypatch):
+    timeout = mysql_connector.errors.DatabaseError(errno=1205, msg="Lock wait timeout exceeded")
+    _import_files(monkeypatch, issue_log, {"tarbiz_907_footnotes.xml": [timeout] * mysql_import.MAX_ISSUE_ATTEMPTS})
+
+    with pytest.raises(mysql_connector.Error):
+        import_issue("out", ["tarbiz_907_footnotes.xml"], {})
+    assert issue_log.count("ROLLBACK") == mysql_import.MAX_ISSUE_ATTEMPTS
+    assert "COMMIT" not in issue_log
+
+
+def test_import_issue_keeps_the_xml_of_a_broken_csv(issue_log, monkeypatch):
+    _import_files(monkeypatch, issue_log, {"tarbiz_908_footnotes.xml": [True], "tarbiz_908_footnotes.csv": [False]})
+
+    assert import_issue("out", ["tarbiz_908_footnotes.csv", "tarbiz_908_footnotes.xml"], {})
+    assert issue_log == ["tarbiz_908_footnotes.xml", "SAVEPOINT before_csv", "tarbiz_908_footnotes.csv",
+                         "ROLLBACK TO SAVEPOINT before_csv", "COMMIT"]
+
+
+def test_import_issue_rolls_back_a_failed_xml(issue_log, monkeypatch):
+    _import_files(monkeypatch, issue_log, {"tarbiz_909_footnotes.xml": [False]})
+
+    assert not import_issue("out", ["tarbiz_909_footnotes.csv", "tarbiz_909_footnotes.xml"], {})
+    assert issue_log == ["tarbiz_909_footnotes.xml", "ROLLBACK"]
+
+
+def _drop_tables(cursor):
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for table in TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+
+@pytest.fixture(scope="module")
+def database():
+    """Journal ids of a freshly migrated scratch database"""
+    if not TEST_DATABASE:
+        pytest.skip("ACADEMIC_DB_TEST_NAME is not set")
+    try:
+        config = load_db_config()
+    except ValueError as err:
+        pytest.skip(str(err))
+    config["database"] = TEST_DATABASE
+    db_pool.get_pool(config)
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        _drop_tables(cursor)
+        migrate(conn)
+        cursor.execute("INSERT INTO journals (journal_name) VALUES ('Tarbiz')")
+        conn.commit()
+        cursor.close()
+        return load_journal_ids(conn)
+
+
+def _count(conn, table, issue_id):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE issue_id = %s", (issue_id,))
+    count = cursor.fetchone()[0]
+    cursor.close()
+    return count
+
+
+def test_migrate_again_applies_nothing(database):
+    with pooled_connection() as conn:
+        assert migrate(conn) == []
+        assert applied_versions(conn) == [m.version for m in MIGRATIONS]
+        assert applied_versions(conn)[-1] == LATEST_VERSION
+
+
+def test_create_issue_returns_the_existing_issue(database):
+    with pooled_connection() as conn:
+        first = create_issue(conn, database["tarbiz"], "901")
+        second = create_issue(conn, database["tarbiz"], "901")
+        other = create_issue(conn, database["tarbiz"], "902")
+
+    assert first == second
+    assert other != first
+
+
+def test_upserts_count_only_new_rows(database):
+    with pooled_connection() as conn, PreparedStatements(conn) as statements:
+        new_issue = statements.execute(UPSERT_ISSUE, (database["tarbiz"], "903"))
+        issue_id = new_issue.lastrowid
+        assert new_issue.rowcount == 1
+        existing_issue = statements.execute(UPSERT_ISSUE, (database["tarbiz"], "903"))
+        assert (existing_issue.rowcount, existing_issue.lastrowid) == (0, issue_id)
+
+        assert statements.execute(INSERT_MAIN_TEXT, (issue_id, "p01", "שלום")).rowcount == 1
+        assert statements.execute(INSERT_MAIN_TEXT, (issue_id, "p01", "שלום")).rowcount == 0
+        conn.commit()
+        assert _count(conn, "main_texts", issue_id) == 1
+
+
+def test_import_issue_twice_adds_nothing(database, tmp_path):
+    save_footnotes_to_xml(FOOTNOTES, MAIN_TEXTS, str(tmp_path / "tarbiz_904_footnotes.xml"))
+
+    assert import_issue(str(tmp_path), ["tarbiz_904_footnotes.xml"], database)
+    assert import_issue(str(tmp_path), ["tarbiz_904_footnotes.xml"], database)
+
+    with pooled_connection() as conn:
+        issue_id = create_issue(conn, database["tarbiz"], "904")
+        assert _count(conn, "main_texts", issue_id) == 2
+        assert _count(conn, "footnotes_table", issue_id) == 3
+
+
+def test_load_csv_fast_skips_existing_rows(database, tmp_path):
+    csv_path = tmp_path / "tarbiz_905_footnotes.csv"
+    with FootnoteCsvWriter(str(csv_path)) as writer:
+        for page_name, text in MAIN_TEXTS.items():
+            writer.write_main_text(page_name, text)
+        writer.write_footnotes(FOOTNOTES)
+
+    with pooled_connection(local_infile_path=str(tmp_path)) as conn:
+        issue_id = create_issue(conn, database["tarbiz"], "905")
+        try:
+            first = load_csv_fast(conn, str(csv_path), issue_id, os.linesep)
+        except mysql_connector.Error as err:
+            pytest.skip(f"LOAD DATA LOCAL INFILE not available: {err}")
+        second = load_csv_fast(conn, str(csv_path), issue_id, os.linesep)
+        conn.commit()
+
+    assert first == (2, 0, 3)
+    assert second == (0, 0, 0)
+
+    with pooled_connection() as conn:
+        with pytest.raises(mysql_connector.Error):
+            load_csv_fast(conn, str(csv_path), issue_id, os.linesep)
+
+
+def test_fast_and_row_by_row_csv_import_store_the_same_rows(database, tmp_path):
+    rows = {}
+    for issue_number, local_infile_path in (("911", str(tmp_path)), ("912", None)):
+        csv_path = tmp_path / f"tarbiz_{issue_number}_footnotes.csv"
+        with FootnoteCsvWriter(str(csv_path)) as writer:
+            writer.write_main_text("p01", "\tשלום עולם\n")
+            writer.write_main_text("p02", "\r\n\n")
+            writer.write_footnotes([{"page": " p01 ", "text": "ראו שם\n\n"}])
+        with pooled_connection(local_infile_path=local_infile_path) as conn:
+            assert import_csv_file(conn, str(csv_path), commit=False, journal_ids=database)
+            conn.commit()
+            issue_id = create_issue(conn, database["tarbiz"], issue_number)
+            cursor = conn.cursor()
+            rows[issue_number] = (
+                _rows(cursor, f"SELECT page_name, content FROM main_texts WHERE issue_id = {issue_id}"),
+                _rows(cursor, f"SELECT page_name, footnote_number, content FROM footnotes_table "
+                              f"WHERE issue_id = {issue_id}"))
+            cursor.close()
+
+    assert rows["911"] == rows["912"] == ([("p01", "שלום עולם")], [("p01", "1", "ראו שם")])
+
+
+def _stats(conn, issue_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT page_count, reference_count, footnote_count FROM issue_stats WHERE issue_id = %s",
+                   (issue_id,))
+    row = cursor.fetchone()
+    cursor.close()
+    return tuple(row) if row else None
+
+
+def test_issue_stats_follow_the_import(database, tmp_path):
+    save_footnotes_to_xml(FOOTNOTES, MAIN_TEXTS, str(tmp_path / "tarbiz_910_footnotes.xml"))
+
+    assert import_issue(str(tmp_path), ["tarbiz_910_footnotes.xml"], database)
+
+    with pooled_connection() as conn:
+        issue_id = create_issue(conn, database["tarbiz"], "910")
+        assert _stats(conn, issue_id) == (2, 0, 3)
+
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM footnotes_table WHERE issue_id = %s AND footnote_number = 3", (issue_id,))
+        cursor.execute("DELETE FROM issue_stats WHERE issue_id = %s", (issue_id,))
+        assert refresh_all(cursor) >= 1
+        assert _stats(conn, issue_id) == (2, 0, 2)
+
+        cursor.execute("DELETE FROM main_texts WHERE issue_id = %s AND page_name = 'p02'", (issue_id,))
+        with PreparedStatements(conn) as statements:
+            statements.execute(REFRESH_ISSUE, (issue_id,))
+        assert _stats(conn, issue_id) == (1, 0, 2)
+        conn.commit()
+        cursor.close()
+
+
+def _rows(cursor, sql):
+    cursor.execute(sql)
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def test_migrations_merge_duplicates_into_the_oldest_row(database):
+    # runs last: it rebuilds the scratch database from the base tables
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        _drop_tables(cursor)
+        for statement in MIGRATIONS[0].statements:
+            cursor.execute(statement)
+        applied_versions(conn)
+        cursor.execute(f"INSERT INTO {MIGRATIONS_TABLE} (version, description) VALUES (1, 'base tables')")
+        cursor.execute("INSERT INTO journals (journal_id, journal_name) VALUES (1, 'Tarbiz'), (2, ' tarbiz')")
+        cursor.execute("INSERT INTO issues (issue_id, journal_id, issue_number) "
+                       "VALUES (1, 1, '1'), (2, 1, '2'), (3, 2, '1'), (4, 2, '3'), (5, 1, '2')")
+        cursor.execute("INSERT INTO main_texts (text_id, issue_id, page_name, content) "
+                       "VALUES (1, 1, 'p01', 'a'), (2, 3, 'p01', 'a'), (3, 3, 'p02', 'b'), (4, 5, 'p05', 'c')")
+        cursor.execute("INSERT INTO footnotes_table (footnote_id, issue_id, page_name, footnote_number, content) "
+                       "VALUES (1, 3, 'p02', '1', 'x'), (2, 5, 'p05', '7', 'y')")
+        conn.commit()
+
+        assert [m.version for m in migrate(conn)] == [m.version for m in MIGRATIONS[1:]]
+
+        assert _rows(cursor, "SELECT journal_id, journal_key FROM journals") == [(1, "tarbiz")]
+        assert _rows(cursor, "SELECT issue_id, journal_id, issue_number FROM issues ORDER BY issue_id") == [
+            (1, 1, "1"), (2, 1, "2"), (4, 1, "3")]
+        assert _rows(cursor, "SELECT text_id, issue_id FROM main_texts ORDER BY text_id") == [(1, 1), (3, 1), (4, 2)]
+        assert _rows(cursor, "SELECT footnote_id, issue_id FROM footnotes_table ORDER BY footnote_id") == [
+            (1, 1), (2, 2)]
+        cursor.close()
@@ -0,0 +1,40 @@
+from run_checkpoint import STATUS_DONE, STATUS_ERROR, IncrementalReportWriter, RunCheckpoint
+
+
+def test_append_keeps_the_journal_of_earlier_runs(tmp_path):
+    path = str(tmp_path / "Tarbiz_checkpoint.jsonl")
+    with RunCheckpoint(path) as checkpoint:
+        checkpoint.record("tarbiz_001.xlsx", STATUS_DONE, {"Filename": "tarbiz_001.xlsx"})
+        checkpoint.record("tarbiz_002.xlsx", STATUS_ERROR, {"Filename": "tarbiz_002.xlsx"})
+
+    with RunCheckpoint(path, append=True) as checkpoint:
+        checkpoint.record("tarbiz_002.xlsx", STATUS_DONE, {"Filename": "tarbiz_002.xlsx"})
+
+    resumed = RunCheckpoint(path, resume=True)
+    resumed.close()
+    assert resumed.is_finished("tarbiz_001.xlsx")
+    assert resumed.is_finished("tarbiz_002.xlsx")
+
+
+def test_new_run_starts_a_new_journal(tmp_path):
+    path = str(tmp_path / "Tarbiz_checkpoint.jsonl")
+    with RunCheckpoint(path) as checkpoint:
+        checkpoint.record("tarbiz_001.xlsx", STATUS_DONE, {"Filename": "tarbiz_001.xlsx"})
+
+    RunCheckpoint(path).close()
+
+    resumed = RunCheckpoint(path, resume=True)
+    resumed.close()
+    assert resumed.entries == {}
+
+
+def test_rewritten_report_keeps_one_row_per_file(tmp_path):
+    path = tmp_path / "Tarbiz_watch_report.csv"
+    with RunCheckpoint(str(tmp_path / "Tarbiz_watch_checkpoint.jsonl")) as checkpoint, \
+            IncrementalReportWriter(str(path), ["Filename", "Collected_Footnotes_Count"]) as report:
+        for count in (31, 32):
+            checkpoint.record("scanned/tarbiz_001.xlsx", STATUS_DONE,
+                              {"Filename": "tarbiz_001.xlsx", "Collected_Footnotes_Count": count})
+            report.rewrite(checkpoint.latest_rows())
+
+    assert path.read_text(encoding="utf-8") == "﻿Filename,Collected_Footnotes_Count\ntarbiz_001.xlsx,32\n"
@@ -0,0 +1,36 @@
+from journal_profiles import get_footnote_config
+from threshold_sweep import build_grid, grid_configs, rank_rows, score_counts, score_reconciliation
+
+EXPECTED = {"tarbiz_001.xlsx": {"number_of_references": 10}, "tarbiz_002.xlsx": {"number_of_references": 20}}
+REFERENCES = {"tarbiz_001.xlsx": [{"label": str(i), "text": "שם"} for i in range(1, 11)]}
+SUMMARY = {"match": 8, "merge": 1, "split": 0, "missing": 0, "spurious": 0, "pages_with_errors": 1}
+
+
+def _row(counts, summaries, failed):
+    row = score_counts(counts, EXPECTED, "number_of_references")
+    row.update(score_reconciliation(summaries, failed, REFERENCES))
+    return row
+
+
+def test_a_failed_workbook_counts_as_collecting_nothing():
+    row = _row({"tarbiz_002.xlsx": 20}, {}, ["tarbiz_001.xlsx"])
+
+    assert (row["Files"], row["Exact_Matches"], row["Mean_Abs_Error"]) == (2, 1, 5.0)
+    assert (row["Failed_Files"], row["Missing"]) == (1, 10)
+
+
+def test_configurations_that_fail_rank_last():
+    failing = _row({}, {}, ["tarbiz_001.xlsx", "tarbiz_002.xlsx"])
+    working = _row({"tarbiz_001.xlsx": 9, "tarbiz_002.xlsx": 20}, {"tarbiz_001.xlsx": SUMMARY}, [])
+
+    assert failing["Pages_With_Errors"] < working["Pages_With_Errors"]
+    assert rank_rows([failing, working]) == [working, failing]
+    assert (working["Rank"], failing["Rank"]) == (1, 2)
+
+
+def test_invalid_grid_points_are_skipped():
+    grid = build_grid(["bottom_margin_min=1600,1700", "bottom_margin_max=1650"])
+
+    configs = grid_configs(get_footnote_config("tarbiz", "scanned"), grid)
+
+    assert [(c.bottom_margin_min, c.bottom_margin_max) for c in configs] == [(1600, 1650)]
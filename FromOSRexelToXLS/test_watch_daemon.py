@@ -0,0 +1,76 @@
+import watch_daemon
+from run_checkpoint import STATUS_ERROR
+from watch_daemon import ChangeWaiter, WatchDaemon
+
+
+class _Executor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, path, *args):
+        self.submitted.append(path)
+        return object()
+
+
+def _daemon(tmp_path):
+    input_dir = tmp_path / "tarbiz" / "ocr-tess-scanned"
+    input_dir.mkdir(parents=True)
+    return input_dir, WatchDaemon([str(input_dir)], str(tmp_path / "out"), settle_seconds=2.0)
+
+
+def test_files_gone_before_they_settle_are_forgotten(tmp_path):
+    input_dir, daemon = _daemon(tmp_path)
+    workbook = input_dir / "tarbiz_001.xlsx"
+    workbook.write_bytes(b"PK")
+    executor = _Executor()
+
+    daemon.scan(executor, now=0.0)
+    assert daemon.tracker.pending
+    workbook.rename(input_dir / "tarbiz_001.tmp")
+    daemon.scan(executor, now=1.0)
+
+    assert not daemon.tracker.pending
+    assert executor.submitted == []
+    daemon.close()
+
+
+def test_a_settled_broken_workbook_is_journaled_as_failed(tmp_path):
+    input_dir, daemon = _daemon(tmp_path)
+    workbook = input_dir / "tarbiz_001.xlsx"
+    workbook.write_bytes(b"not a zip archive")
+    executor = _Executor()
+
+    daemon.scan(executor, now=0.0)
+    daemon.scan(executor, now=3.0)
+    daemon.scan(executor, now=6.0)
+
+    assert executor.submitted == []
+    assert not daemon.tracker.pending
+    entry = daemon.folders[0].checkpoint.entries[WatchDaemon.checkpoint_key(str(workbook))]
+    assert entry["status"] == STATUS_ERROR
+    daemon.close()
+
+
+def test_a_missing_folder_is_not_watched(tmp_path, monkeypatch):
+    class INotify:
+        def __init__(self):
+            self.watched = []
+
+        def add_watch(self, folder, mask):
+            if not folder.exists():
+                raise FileNotFoundError(2, "No such file or directory", str(folder))
+            self.watched.append(folder)
+
+        def close(self):
+            pass
+
+    class Flags:
+        CLOSE_WRITE = MOVED_TO = CREATE = MODIFY = 0
+
+    monkeypatch.setattr(watch_daemon, "INotify", INotify)
+    monkeypatch.setattr(watch_daemon, "inotify_flags", Flags, raising=False)
+
+    waiter = ChangeWaiter([tmp_path / "missing", tmp_path], poll_interval=1.0)
+
+    assert waiter._inotify.watched == [tmp_path]
+    waiter.close()
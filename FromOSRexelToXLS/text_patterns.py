@@ -0,0 +1,106 @@
+"""
+Precompiled Hebrew and bidi text patterns
+
+A pattern passed as a string to regex.search/sub is looked up in the regex
+cache on every call, and compiled again when the cache is purged. For the checks
+that run once per word or per line this lookup costs more than the match itself,
+so the patterns of OSTtessToPDF and the abbreviations package are compiled
+once here.
+
+The *_regex strings are kept for code that builds larger patterns from them.
+
+Benchmark: python bench_text_patterns.py
+"""
+
+import regex as re
+
+# letters and scripts
+HEBREW_LETTER = re.compile(r'[א-ת]')
+LATIN_LETTER = re.compile(r'[a-zA-Z]')
+LATIN_SCRIPT = re.compile(r'\p{Script=Latin}')
+LETTER = re.compile(r'\p{L}')
+LETTER_OR_DIGIT = re.compile(r'[\p{L}\p{Nd}]')
+ONLY_NON_LETTERS = re.compile(r'^\P{L}+$')
+LEADING_NON_LETTERS = re.compile(r'^\P{L}*')
+TRAILING_NON_LETTERS = re.compile(r'\P{L}+$')
+DIGITS = re.compile(r'\d+')
+NUMBER_WITH_PUNCT = re.compile(r'[0-9]+(\p{P}+[0-9]+)?')
+PAGE_NUMBER_LINE = re.compile(r'^\p{P}*\d+\p{P}*$')
+WHITESPACE = re.compile(r'\s+')
+LEADING_WHITESPACE = re.compile(r'^\s+')
+TRAILING_WHITESPACE = re.compile(r'\s+$')
+SPACES = re.compile(r' +')
+
+# bidi classes and controls
+RTL_LETTER = re.compile(r'(?=\p{Bidi_Class=Right_to_Left})\p{General_Category=Letter}')
+RTL_PAIR = re.compile(r'\p{Bidi_Class=Right_to_Left}{2}')
+LTR_CHAR = re.compile(r'\p{Bidi_Class=Left_to_Right}')
+RTL_RUN = re.compile(r'\p{Mn}?\p{Bidi_Class=R}[\p{Zs}\p{P}\p{Mn}\p{Bidi_Class=R}]*[\p{Bidi_Class=R}\p{Mn}\p{P}]+')
+DIRECTION_MARK = re.compile(r'[\u200f\u200e]')
+BIDI_CONTROL = re.compile(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]')
+# a closing parenthesis at the end of a word, and an opening one at its start (adjust_punct)
+CLOSING_PUNCT = re.compile(r'[\p{P}\p{S}]*\)[\u200f\u200e]?$')
+OPENING_PUNCT = re.compile(r'^\([\p{P}\p{S}]*')
+# niqqud written before its letter by the OCR
+MARK_BEFORE_LETTER_AND_MARK = re.compile(r'(\p{Mn})(\p{L})\p{Zs}(\p{Mn})')
+MARK_BEFORE_LETTER = re.compile(r'(\p{Mn})(\p{L})')
+
+# glyph heights, Tesseract workbooks (OSTtessToPDF.calc_font_size)
+ASCENDER = re.compile(r'[לABCDEFGHIJKLMNOPQRSTUVWXYZbdfhklt]')
+DESCENDER = re.compile(r'[ךןףץקgjpqy]')
+NOT_YOD = re.compile(r'[^י]')
+
+# glyph heights, scanned pages (abbreviations.calc_font_size)
+heb_full_height = 'אבגדהוזחטכםמנסעפצרשת'
+LAMED = re.compile('ל')
+SCAN_DESCENDER = re.compile(r'[ךןףץקygqQ]')
+SCAN_EXTENDER = re.compile(r'[ךןףץקלygqQ]')
+HEBREW_DESCENDER = re.compile(r'[ךןףץק]')
+FULL_HEIGHT = re.compile(f'[{heb_full_height}0-9a-zA-Z]')
+
+# dates and reference headings
+heb_months = [ 'תשרי', 'חשוו?ן', 'כסלי?ו', 'טבת', 'שבט', r"אדר(?:\s[אב]'?)?", 'ניסן', 'אייר', 'סיוו?ן', 'תמוז', 'אב', 'אלול' ]
+heb_month_regex = '(?P<month>(?:'+'|'.join(heb_months)+r')(?:\s*\p{Pd}\s*'+'(?:'+'|'.join(heb_months)+'))?)'
+ref_subtypes_regex = r'^([א-ת]\p{P}?)?\s*(מקורות|מחקרים|טקסטים|עדי נוסח|כתבי יד|מאמרים|ספרות|ספרי |ספרים|עי?תונות|לשון הדיבור|מדרשים?|משנה|תלמוד|מילונים|מקרא.{,15}עדי נוסח|מקרא.{,15}כתבי יד)\s*.{,10}$'
+HEB_MONTH = re.compile(heb_month_regex)
+REF_SUBTYPES = re.compile(ref_subtypes_regex)
+
+# opening words of a footnote that comments on the whole paper (the asterisk footnote)
+asterik_start = (
+    'ה?(הרצאה|מחקר|מאמר|חיבור) ',
+    'הער[הת] ה?[המ]ערכת',
+    'מתוך (הרצאה|מחקר|מאמר|חיבור) ',
+    '(ראשיתו|עיקרו) של (מחקר|מאמר|חיבור)',
+    'מוקדש',
+    'להלן רשימת',
+    '(תודה|תודתי)',
+    'אנו מודים ',
+    '(הריני|הרינו|הנני|הננו|אני|אנו|אנחנו|המחבר|המחברים|המחברות) מבקש(ת|ים|ות) להודות ',
+    '(הריני|הרינו|הנני|הננו|אני|אנו|אנחנו|המחבר|המחברים|המחברות) (מודה|מודים|מודות) ',
+    'ברצוני ',
+    'דברים ש',
+    'ה?דברים ',
+    'חלק(ים)? (מה?|מן ה)(דברים|מאמר|עבודה)',
+    'מוקדש ל',
+    'מתוך ',
+    'עיבוד של ',
+    'עיקרי ה?דברים ',
+    'פרק(ים)? מתוך',
+)
+asterik_start_regex = '|'.join(asterik_start)
+ASTERIK_START = re.compile(asterik_start_regex)
+
+# titles of an abbreviation list (paper_abbrev test_abbrev_label)
+ABBREV_LIST_TITLE = re.compile(r'^רשימת ה?קיצורים.{,5}')
+SOURCES_TITLE = re.compile(r'^(ה?מקורות|ביבליוגרא?פיה)')
+LIST_OF_SOURCES_TITLE = re.compile(r'^רשימת.{,10}(ה?מקורות|ביבליוגרא?פי|ה?קיצור|מאמרים|ספרים|מחקרים)')
+LIST_OF_SOURCES_TITLE_NO_BLANKS = re.compile(r'^רשימת.{,10}(ה?מקורות|ביבליוגרא?פי|ה?קיצור)')
+
+# separators between an abbreviation and its expansion
+EQUALS_SEPARATOR = re.compile(r' = ')
+COLON_SEPARATOR = re.compile(r'\p{L}: ')
+DASH_SEPARATOR = re.compile(r'\s(\p{Pd}{2,3}|—)\s')
+
+# "עמ'" read by the OCR as Latin letters (paper_abbrev OCR fixes)
+AMUD_AS_LATIN = re.compile(r'[nmBhdD]y\u200f$')
+AMUD_AS_LATIN_QUOTED = re.compile(r'[‘⸂⸄‛⸌][nmBhdD]y\u200f?$')
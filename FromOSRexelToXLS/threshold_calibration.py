@@ -0,0 +1,314 @@
+"""
+Threshold calibration from page geometry
+
+Scans a sample of a journal's Tesseract workbooks and proposes the footnoteConfig
+thresholds (bottom margins, left margin, width, merge and split thresholds) from
+histograms of the word coordinates, separately for even and odd pages. The merge
+and split thresholds are the low and the high end of the gap between the first
+lines of footnotes and their continuation lines (see propose_thresholds).
+
+Usage:
+    python threshold_calibration.py <ocr-tess folder> [-n 40] [-t scanned] [-o proposal.json]
+
+The proposal has the same layout as a journal entry of journal_profiles.json,
+together with a confidence (0-1) and the number of samples behind every value.
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import random
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from OSTtessToPDF import footnoteProcessor
+from journal_profiles import detect_doc_type, detect_journal_key, get_footnote_config
+
+BIN_WIDTH = 5  # pixels
+FOOTNOTE_HEIGHT_RATIO = 0.95  # footnote words are smaller than the main text words
+LINE_KEYS = ["block_num", "par_num", "line_num"]
+
+
+def _page_parity(page_name: str) -> Optional[str]:
+    digits = ''.join(c for c in page_name if c.isdigit())
+    if not digits:
+        return None
+    return "even" if int(digits) % 2 == 0 else "odd"
+
+
+def build_line_table(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Collapse the words of a page (or a part of a page) to one row per Tesseract line
+
+    Returns:
+        DataFrame with top, min_left, right_word_left (left of the rightmost word),
+        right_edge (max of left+width), height, is_start (first line of a Tesseract paragraph)
+        and is_full (followed by another line of the same paragraph, so it runs to the left margin)
+    """
+    words = df[(df["conf"] != -1) & df["text"].notna()]
+    words = words[words["text"].astype(str).str.strip() != ""]
+    if words.empty or not all(col in words.columns for col in LINE_KEYS + ["top", "left"]):
+        return pd.DataFrame()
+
+    words = words.assign(right=words["left"] + words["width"])
+    lines = words.groupby(LINE_KEYS, sort=False).agg(
+        top=("top", "min"),
+        min_left=("left", "min"),
+        right_word_left=("left", "max"),
+        right_edge=("right", "max"),
+        height=("height", "median"),
+    ).reset_index()
+
+    paragraph_key = lines["block_num"].astype(str) + ":" + lines["par_num"].astype(str)
+    lines["is_start"] = paragraph_key.ne(paragraph_key.shift())
+    lines["is_full"] = ~lines["is_start"].shift(-1, fill_value=True)
+    return lines.sort_values("top", kind="stable").reset_index(drop=True)
+
+
+def collect_page_geometry(xlsx_files: List[str], processor: footnoteProcessor) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Load the workbooks once and build two tables:
+    - pages: last text line top of every page
+    - footnote_lines: lines of the last paragraph of pages where it is set in a smaller font
+    """
+    page_rows = []
+    footnote_frames = []
+
+    for xlsx_file in xlsx_files:
+        for df in processor._extract_data_from_xlsx(xlsx_file):
+            page_name = df["Page"].iloc[0] if "Page" in df.columns else "Unknown"
+            df = processor._validate_and_prepare_dataframe(df, page_name)
+            if df is None or "top" not in df.columns or "left" not in df.columns:
+                continue
+
+            parity = _page_parity(page_name)
+            page_lines = build_line_table(df)
+            if page_lines.empty or parity is None:
+                continue
+
+            page_rows.append({"file": os.path.basename(xlsx_file), "page": page_name,
+                              "parity": parity, "last_top": page_lines["top"].max()})
+
+            paragraphs = processor._split_into_paragraphs(df, page_name)
+            if len(paragraphs) < 2:
+                continue
+
+            main_heights = pd.concat([p["data"]["height"] for p in paragraphs[:-1]])
+            last_data = paragraphs[-1]["data"]
+            last_heights = last_data.loc[last_data["conf"] != -1, "height"]
+            if last_heights.empty or main_heights.empty:
+                continue
+            if last_heights.median() >= FOOTNOTE_HEIGHT_RATIO * main_heights[main_heights > 0].median():
+                continue
+
+            lines = build_line_table(last_data)
+            if not lines.empty:
+                footnote_frames.append(lines.assign(parity=parity, page=page_name))
+
+    pages = pd.DataFrame(page_rows)
+    footnote_lines = pd.concat(footnote_frames, ignore_index=True) if footnote_frames else pd.DataFrame()
+    return pages, footnote_lines
+
+
+def peak_cluster(values: np.ndarray, bin_width: float = BIN_WIDTH,
+                 low_q: float = 0.05, high_q: float = 0.95) -> Tuple[float, float, float]:
+    """
+    Find the dominant cluster of a distribution
+
+    Returns:
+        (lower bound, upper bound, share of the values inside the cluster)
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return float("nan"), float("nan"), 0.0
+
+    edges = np.arange(values.min(), values.max() + 2 * bin_width, bin_width)
+    counts, edges = np.histogram(values, bins=edges)
+    peak = int(np.argmax(counts))
+
+    # grow the cluster while the neighbouring bins hold at least 10% of the peak
+    floor = max(1, 0.1 * counts[peak])
+    lo = peak
+    while lo > 0 and counts[lo - 1] >= floor:
+        lo -= 1
+    hi = peak
+    while hi + 1 < len(counts) and counts[hi + 1] >= floor:
+        hi += 1
+
+    in_cluster = values[(values >= edges[lo]) & (values < edges[hi + 1])]
+    share = in_cluster.size / values.size
+    return float(np.quantile(in_cluster, low_q)), float(np.quantile(in_cluster, high_q)), share
+
+
+def best_split_range(low_values: np.ndarray, high_values: np.ndarray,
+                     bin_width: float = BIN_WIDTH) -> Tuple[float, float, float]:
+    """
+    Range of thresholds t that separate two populations (low <= t < high) best
+
+    Every candidate of the range reaches the best balanced accuracy; with two
+    clean populations it spans the gap between them.
+
+    Returns:
+        (lowest threshold, highest threshold, balanced accuracy of the split)
+    """
+    low = np.sort(np.asarray(low_values, dtype=float))
+    high = np.sort(np.asarray(high_values, dtype=float))
+    low = low[~np.isnan(low)]
+    high = high[~np.isnan(high)]
+    if low.size == 0 or high.size == 0:
+        return float("nan"), float("nan"), 0.0
+
+    candidates = np.arange(min(low[0], high[0]), max(low[-1], high[-1]) + bin_width, bin_width)
+    low_ok = np.searchsorted(low, candidates, side="right") / low.size
+    high_ok = 1 - np.searchsorted(high, candidates, side="right") / high.size
+    accuracy = (low_ok + high_ok) / 2
+
+    best = np.flatnonzero(np.isclose(accuracy, accuracy.max()))
+    return float(candidates[best[0]]), float(candidates[best[-1]]), float(accuracy[best[0]])
+
+
+def best_split(low_values: np.ndarray, high_values: np.ndarray, bin_width: float = BIN_WIDTH) -> Tuple[float, float]:
+    """
+    Threshold t that best separates two populations (low <= t < high)
+
+    Returns:
+        (threshold, balanced accuracy of the split), the lowest of best_split_range
+    """
+    lowest, _, accuracy = best_split_range(low_values, high_values, bin_width)
+    return lowest, accuracy
+
+
+def _margin_after_peak(values: np.ndarray, bin_width: float = BIN_WIDTH) -> Tuple[float, float]:
+    """Upper edge of the dominant cluster plus one bin, with the cluster share as confidence"""
+    _, hi, share = peak_cluster(values, bin_width, low_q=0.0, high_q=0.99)
+    return hi + bin_width, share
+
+
+def propose_thresholds(pages: pd.DataFrame, footnote_lines: pd.DataFrame) -> Tuple[dict, dict]:
+    """
+    Propose footnoteConfig thresholds from the geometry tables
+
+    Returns:
+        (thresholds, confidence) - confidence maps every threshold to {"confidence", "samples"}
+    """
+    thresholds = {}
+    confidence = {}
+
+    def put(name, value, conf, samples):
+        if np.isnan(value):
+            return
+        thresholds[name] = int(round(value))
+        confidence[name] = {"confidence": round(conf, 2), "samples": int(samples)}
+
+    if not pages.empty:
+        lo, hi, share = peak_cluster(pages["last_top"].to_numpy())
+        put("bottom_margin_min", lo, share, len(pages))
+        put("bottom_margin_max", hi, share, len(pages))
+
+    if footnote_lines.empty:
+        return thresholds, confidence
+
+    for parity in ("even", "odd"):
+        lines = footnote_lines[footnote_lines["parity"] == parity]
+        if lines.empty:
+            continue
+        starts = lines[lines["is_start"]]
+        continuations = lines[~lines["is_start"]]
+
+        # inner lines of a footnote run to the left text margin
+        full_lines = lines[lines["is_full"]]
+        value, share = _margin_after_peak(full_lines["min_left"].to_numpy())
+        put(f"left_margin_threshold_{parity}", value, share, len(full_lines))
+
+        # the first line of a footnote starts with its number further to the right
+        value, accuracy = best_split(continuations["right_edge"].to_numpy(), starts["right_edge"].to_numpy())
+        put(f"width_threshold_{parity}", value, accuracy, len(lines))
+
+        # Both thresholds separate the rightmost word of continuation lines from
+        # that of first lines, but they err in opposite directions: a segment
+        # with a word right of the merge threshold stays a footnote of its own,
+        # so the merge threshold is the low end of the gap (no footnote is
+        # merged into the previous one); every word right of the split
+        # threshold starts a footnote, so the split threshold is the high end
+        # (no continuation line is split off)
+        merge_value, split_value, accuracy = best_split_range(continuations["right_word_left"].to_numpy(),
+                                                              starts["right_word_left"].to_numpy())
+        put(f"merge_footnotes_threshold_{parity}", merge_value, accuracy, len(lines))
+        put(f"footnotes_spleat_threshold_{parity}", split_value, accuracy, len(lines))
+
+    return thresholds, confidence
+
+
+def calibrate(input_dir: str, doc_type: str = None, sample_size: int = 40, seed: int = 0) -> dict:
+    """
+    Calibrate the thresholds of the journal whose workbooks are in input_dir
+
+    Returns:
+        Dictionary with journal, doc_type, files, thresholds, confidence and current values
+    """
+    xlsx_files = sorted(glob.glob(os.path.join(input_dir, "*.xlsx")))
+    if sample_size and len(xlsx_files) > sample_size:
+        xlsx_files = sorted(random.Random(seed).sample(xlsx_files, sample_size))
+
+    if doc_type is None:
+        doc_type = detect_doc_type(input_dir)
+    journal_key = detect_journal_key(input_dir)
+    current = get_footnote_config(journal_key, doc_type)
+
+    pages, footnote_lines = collect_page_geometry(xlsx_files, footnoteProcessor(current))
+    thresholds, confidence = propose_thresholds(pages, footnote_lines)
+
+    return {
+        "journal": journal_key,
+        "doc_type": doc_type,
+        "files": len(xlsx_files),
+        "pages": len(pages),
+        "footnote_lines": len(footnote_lines),
+        "thresholds": thresholds,
+        "confidence": confidence,
+        "current": {name: getattr(current, name) for name in thresholds},
+    }
+
+
+def print_proposal(result: dict):
+    print("====================================")
+    print(f"Journal: {result['journal']} ({result['doc_type']})")
+    print(f"Files: {result['files']}, pages: {result['pages']}, footnote lines: {result['footnote_lines']}")
+    print(f"{'Parameter':36} {'Current':>8} {'Proposed':>9} {'Confidence':>11} {'Samples':>8}")
+    for name, value in result["thresholds"].items():
+        conf = result["confidence"][name]
+        print(f"{name:36} {result['current'][name]:>8} {value:>9} {conf['confidence']:>11.2f} {conf['samples']:>8}")
+    print("====================================")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='threshold-calibration',
+                                     description='Propose footnote thresholds from the page geometry of OCR workbooks')
+    parser.add_argument('input_dir', help='Folder with Tesseract .xlsx workbooks of one journal')
+    parser.add_argument('-t', help='Document type, default: taken from the folder name', dest='doc_type',
+                        choices=['printed', 'scanned'], required=False)
+    parser.add_argument('-n', help='Number of workbooks to sample, 0 = all, default: %(default)s', dest='sample_size',
+                        type=int, default=40)
+    parser.add_argument('-s', help='Random seed of the sample, default: %(default)s', dest='seed', type=int, default=0)
+    parser.add_argument('-o', help='Write the proposal as JSON to this file', dest='output', required=False)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    result = calibrate(args.input_dir, args.doc_type, args.sample_size, args.seed)
+    print_proposal(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({result["doc_type"]: result["thresholds"], "confidence": result["confidence"]},
+                      f, ensure_ascii=False, indent=2)
+        print(f"Proposal saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Threshold sweep
+
+Runs footnoteProcessor over a grid of footnoteConfig values and ranks every
+configuration by how well the number of collected footnotes agrees with the
+metadata of each issue (number_of_references or the biggest label number).
+Where the metadata lists the references themselves, the footnotes are also
+aligned with them (footnote_reconciliation) and configurations are ranked by the
+number of pages with merged, split, missing or spurious footnotes first.
+Configurations that fail on a workbook rank after all that process every
+workbook; a failed workbook counts as one with no footnotes collected.
+Grid points with invalid thresholds (e.g. bottom_margin_min above
+bottom_margin_max) are skipped before the sweep.
+
+The workbooks are parsed once; the parsed pages are sent to every worker process
+once, so a run over hundreds of configurations only pays for the footnote logic.
+
+Usage:
+    python threshold_sweep.py <ocr-tess folder> [<ocr-tess folder> ...] -m <meta folder>
+        -p bottom_margin_min=1600:1700:10 -p merge_footnotes_threshold=1040,1050,1070
+
+A parameter without the _even/_odd suffix sets both page parities to the same value.
+One ranked CSV is written per journal and document type.
+"""
+
+import argparse
+import contextlib
+import csv
+import glob
+import io
+import itertools
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields, replace
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from OSTtessToPDF import footnoteConfig, footnoteProcessor
+from footnote_reconciliation import STEP_KINDS, load_expected_references, reconcile, summarize
+from journal_profiles import (THRESHOLD_FIELDS, detect_doc_type, detect_journal_key, get_footnote_config,
+                              validate_thresholds)
+
+# Pages of the sampled workbooks and their metadata references, loaded once per worker process
+_worker_pages: Dict[str, List[pd.DataFrame]] = {}
+_worker_references: Dict[str, List[dict]] = {}
+
+RECONCILIATION_HEADERS = ["Failed_Files", "Matched", "Merged", "Split", "Missing", "Spurious", "Pages_With_Errors"]
+
+
+def parse_param(spec: str) -> Tuple[List[str], List[float]]:
+    """
+    Parse 'name=v1,v2,...' or 'name=start:stop:step' (stop included)
+
+    Returns:
+        (footnoteConfig field names, values)
+    """
+    if "=" not in spec:
+        raise ValueError(f"Parameter '{spec}' must look like name=values")
+    name, values_spec = spec.split("=", 1)
+    name = name.strip()
+
+    known = {f.name for f in fields(footnoteConfig)}
+    if name in known:
+        names = [name]
+    elif f"{name}_even" in known and f"{name}_odd" in known:
+        names = [f"{name}_even", f"{name}_odd"]
+    else:
+        raise ValueError(f"Unknown footnoteConfig parameter '{name}'")
+
+    if ":" in values_spec:
+        start, stop, step = (float(v) for v in values_spec.split(":"))
+        if step <= 0:
+            raise ValueError(f"Step of '{name}' must be positive")
+        count = int(round((stop - start) / step)) + 1
+        values = [start + i * step for i in range(count)]
+    else:
+        values = [float(v) for v in values_spec.split(",") if v.strip()]
+
+    if not values:
+        raise ValueError(f"No values given for '{name}'")
+    return names, [int(v) if v.is_integer() else v for v in values]
+
+
+def build_grid(specs: List[str]) -> List[Dict[str, float]]:
+    """Cartesian product of the parameter values; every item maps field names to values"""
+    parsed = [parse_param(spec) for spec in specs]
+    grid = []
+    for combination in itertools.product(*(values for _, values in parsed)):
+        params = {}
+        for (names, _), value in zip(parsed, combination):
+            for name in names:
+                params[name] = value
+        grid.append(params)
+    return grid
+
+
+def load_expected_counts(xlsx_files: List[str], meta_dir: str, reader: footnoteProcessor) -> Dict[str, dict]:
+    """
+    Read the metadata of every workbook, skipping issues marked as 'skipped'
+
+    Returns:
+        {filename: meta info from footnoteProcessor.extract_meta_info}
+    """
+    expected = {}
+    for xlsx_file in xlsx_files:
+        filename = os.path.basename(xlsx_file)
+        json_file = os.path.join(meta_dir, os.path.splitext(filename)[0] + ".json")
+        if not os.path.exists(json_file):
+            continue
+        with open(json_file, "r", encoding="utf-8") as jf:
+            if json.load(jf).get("skipped", False) is True:
+                continue
+        expected[filename] = reader.extract_meta_info(json_file)
+    return expected
+
+
+def load_references(xlsx_files: List[str], meta_dir: str) -> Dict[str, List[dict]]:
+    """{filename: metadata references} of the workbooks whose metadata lists its references"""
+    references = {}
+    for xlsx_file in xlsx_files:
+        filename = os.path.basename(xlsx_file)
+        json_file = os.path.join(meta_dir, os.path.splitext(filename)[0] + ".json")
+        if os.path.exists(json_file):
+            expected = load_expected_references(json_file)
+            if expected:
+                references[filename] = expected
+    return references
+
+
+def _init_worker(pages: Dict[str, List[pd.DataFrame]], references: Dict[str, List[dict]]):
+    global _worker_pages, _worker_references
+    _worker_pages = pages
+    _worker_references = references
+    logging.getLogger().setLevel(logging.ERROR)
+
+
+def _evaluate_config(config: footnoteConfig) -> Tuple[Dict[str, int], Dict[str, dict], List[str]]:
+    """
+    Collected footnotes per workbook for one configuration (runs in a worker)
+
+    Returns:
+        ({filename: footnote count}, {filename: reconciliation summary}, workbooks that raised)
+    """
+    counts = {}
+    summaries = {}
+    failed = []
+    # the processor reports its decisions with print; keep the sweep output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for filename, pages in _worker_pages.items():
+            try:
+                footnotes, _ = footnoteProcessor(config).process_pages(pages)
+                counts[filename] = len(footnotes)
+                if filename in _worker_references:
+                    summaries[filename] = summarize(reconcile(footnotes, _worker_references[filename]))
+            except Exception as e:
+                logging.error(f"Error processing {filename}: {e}")
+                counts.pop(filename, None)
+                failed.append(filename)
+    return counts, summaries, failed
+
+
+def score_counts(counts: Dict[str, int], expected: Dict[str, dict], target: str) -> dict:
+    """Agreement of the collected footnote counts with the metadata; a workbook without a count collected none"""
+    exact = 0
+    abs_errors = []
+    total_collected = 0
+    total_expected = 0
+    for filename, meta in expected.items():
+        collected = counts.get(filename, 0)
+        wanted = meta[target]
+        total_collected += collected
+        total_expected += wanted
+        abs_errors.append(abs(collected - wanted))
+        exact += collected == wanted
+
+    files = len(abs_errors)
+    return {
+        "Exact_Matches": exact,
+        "Files": files,
+        "Exact_Ratio": round(exact / files, 3) if files else 0.0,
+        "Mean_Abs_Error": round(sum(abs_errors) / files, 3) if files else float("inf"),
+        "Total_Collected": total_collected,
+        "Total_Expected": total_expected,
+    }
+
+
+def score_reconciliation(summaries: Dict[str, dict], failed: List[str] = (),
+                         references: Dict[str, List[dict]] = None) -> dict:
+    """
+    Alignment steps and pages with errors summed over the workbooks
+
+    Args:
+        summaries: Reconciliation summary per workbook
+        failed: Workbooks the configuration failed on, all their references count as missing
+        references: Metadata references per workbook
+    """
+    totals = {kind: sum(summary[kind] for summary in summaries.values()) for kind in STEP_KINDS}
+    failed_missing = sum(len((references or {}).get(filename, ())) for filename in failed)
+    return {
+        "Failed_Files": len(failed),
+        "Matched": totals["match"],
+        "Merged": totals["merge"],
+        "Split": totals["split"],
+        "Missing": totals["missing"] + failed_missing,
+        "Spurious": totals["spurious"],
+        "Pages_With_Errors": sum(summary["pages_with_errors"] for summary in summaries.values()),
+    }
+
+
+def sweep_group(xlsx_files: List[str], meta_dir: str, base_config: footnoteConfig,
+                grid: List[Dict[str, float]], target: str, workers: int = None) -> List[dict]:
+    """
+    Evaluate every grid point on one journal/document type
+
+    Returns:
+        Rows sorted best first, with the full thresholds of each configuration and its score
+    """
+    loader = footnoteProcessor(base_config)
+    expected = load_expected_counts(xlsx_files, meta_dir, loader)
+    if not expected:
+        print("No metadata found for the selected workbooks - nothing to score against")
+        return []
+
+    pages = {os.path.basename(f): loader._extract_data_from_xlsx(f)
+             for f in xlsx_files if os.path.basename(f) in expected}
+    references = load_references([f for f in xlsx_files if os.path.basename(f) in expected], meta_dir)
+    if references:
+        print(f"Reference lists for {len(references)} of {len(expected)} workbooks - scoring per page")
+
+    configs = grid_configs(base_config, grid)
+    if not configs:
+        print("No valid configuration in the grid")
+        return []
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pages, references)) as executor:
+        results = executor.map(_evaluate_config, configs)
+        for i, (config, (counts, summaries, failed)) in enumerate(zip(configs, results), 1):
+            row = {name: getattr(config, name) for name in THRESHOLD_FIELDS}
+            row.update(score_counts(counts, expected, target))
+            row.update(score_reconciliation(summaries, failed, references))
+            rows.append(row)
+            if i % 10 == 0 or i == len(configs):
+                print(f"Evaluated {i}/{len(configs)} configurations")
+
+    return rank_rows(rows)
+
+
+def grid_configs(base_config: footnoteConfig, grid: List[Dict[str, float]]) -> List[footnoteConfig]:
+    """Configurations of the grid points, without those whose thresholds are not valid"""
+    configs = []
+    for params in grid:
+        config = replace(base_config, **params)
+        errors = validate_thresholds(str(params), {name: getattr(config, name) for name in THRESHOLD_FIELDS})
+        if errors:
+            print(f"Skipping invalid configuration {errors[0]}")
+            continue
+        configs.append(config)
+    return configs
+
+
+def rank_rows(rows: List[dict]) -> List[dict]:
+    """Sort the scored configurations best first and number them"""
+    # a configuration that fails on a workbook has no pages with errors there, so failures come first;
+    # without reference lists Pages_With_Errors is 0 everywhere and the counts decide
+    rows.sort(key=lambda r: (r["Failed_Files"], r["Pages_With_Errors"], -r["Exact_Matches"], r["Mean_Abs_Error"]))
+    for rank, row in enumerate(rows, 1):
+        row["Rank"] = rank
+    return rows
+
+
+def save_ranking(rows: List[dict], output_folder: str, journal_key: str, doc_type: str) -> str:
+    csv_path = os.path.join(output_folder, f"{journal_key}_{doc_type}_threshold_sweep.csv")
+    headers = ["Rank", "Exact_Matches", "Files", "Exact_Ratio", "Mean_Abs_Error",
+               "Total_Collected", "Total_Expected", *RECONCILIATION_HEADERS, *THRESHOLD_FIELDS]
+    with open(csv_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=headers)
+        writer.writeheader()
+        writer.writerows(rows)
+    return csv_path
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='threshold-sweep',
+                                     description='Rank footnote thresholds by agreement with the metadata reference counts')
+    parser.add_argument('input_dirs', nargs='+', help='Folders with Tesseract .xlsx workbooks')
+    parser.add_argument('-m', help='Metadata folder with <issue>.json files', dest='meta_dir', required=True)
+    parser.add_argument('-p', help='Parameter values, name=v1,v2 or name=start:stop:step (repeatable)',
+                        dest='params', action='append', required=True)
+    parser.add_argument('-t', help='Document type, default: taken from the folder name', dest='doc_type',
+                        choices=['printed', 'scanned'], required=False)
+    parser.add_argument('--target', help='Metadata count to match, default: %(default)s', dest='target',
+                        choices=['number_of_references', 'biggest_label_number'], default='number_of_references')
+    parser.add_argument('-j', help='Worker processes, default: number of CPUs', dest='workers', type=int)
+    parser.add_argument('-o', help='Output folder for the ranked tables, default: current folder', dest='output',
+                        default='.')
+    parser.add_argument('--top', help='Rows to print per table, default: %(default)s', type=int, default=10)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    try:
+        grid = build_grid(args.params)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Grid size: {len(grid)} configurations")
+
+    # One table per journal and document type
+    groups: Dict[Tuple[str, str], List[str]] = {}
+    for input_dir in args.input_dirs:
+        doc_type = args.doc_type or detect_doc_type(input_dir)
+        key = (detect_journal_key(input_dir), doc_type)
+        groups.setdefault(key, []).extend(sorted(glob.glob(os.path.join(input_dir, "*.xlsx"))))
+
+    os.makedirs(args.output, exist_ok=True)
+    for (journal_key, doc_type), xlsx_files in groups.items():
+        print("====================================")
+        print(f"Journal: {journal_key} ({doc_type}), workbooks: {len(xlsx_files)}")
+
+        rows = sweep_group(xlsx_files, args.meta_dir, get_footnote_config(journal_key, doc_type),
+                           grid, args.target, args.workers)
+        if not rows:
+            continue
+
+        csv_path = save_ranking(rows, args.output, journal_key, doc_type)
+        varied = sorted({name for params in grid for name in params})
+        for row in rows[:args.top]:
+            values = ", ".join(f"{name}={row[name]}" for name in varied)
+            failures = f" failed on {row['Failed_Files']}" if row['Failed_Files'] else ""
+            print(f"#{row['Rank']:<3} exact {row['Exact_Matches']}/{row['Files']} "
+                  f"MAE {row['Mean_Abs_Error']:.2f} pages with errors {row['Pages_With_Errors']}{failures}  {values}")
+        print(f"Ranking saved to: {csv_path}")
+    print("====================================")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+"""
+Watch-folder daemon
+
+Watches folders of Tesseract workbooks and processes every new or rewritten .xlsx
+as soon as it is completely written, so new issues reach the XML/CSV outputs (and
+optionally MySQL) within seconds instead of on the next manual batch.
+
+- Changes are picked up with inotify when inotify_simple is installed, otherwise
+  the folders are polled.
+- A workbook is ready when its size and modification time have not changed for
+  --settle seconds, so files that are still being copied are never read. A
+  settled workbook that is not a complete zip archive is journaled as failed
+  until it changes again.
+- Ready workbooks are processed by a pool of worker processes. The XML and CSV
+  are written under temporary names and renamed, so readers never see half a file.
+  They go to a subfolder per document type (<output>/scanned, <output>/printed),
+  so the scanned and printed workbooks of an issue do not overwrite each other.
+- Every result is journaled in <journal>_watch_checkpoint.jsonl under the path of
+  the workbook, with its size and modification time; a restarted daemon skips
+  what it has done and reprocesses workbooks that were replaced since. The report
+  has one row per workbook, the latest result.
+
+Usage:
+    python watch_daemon.py <ocr-tess folder> [<ocr-tess folder> ...] -o <output folder>
+        [-m <meta folder>] [--db] [-j 4] [--settle 2] [--once]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import signal
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from OSTtessToPDF import (REPORT_HEADERS, FootnoteCsvWriter, build_footnotes_xml, csv_output_path,
+                          extract_issue_number_from_filename, extract_journal_name_from_path, footnoteProcessor)
+from columnar_export import EXPORT_FORMATS, check_export_format, export_issue
+from journal_profiles import detect_doc_type, detect_journal_key, get_footnote_config
+from run_checkpoint import (IncrementalReportWriter, RunCheckpoint, checkpoint_path,
+                            STATUS_DONE, STATUS_ERROR, STATUS_SKIPPED)
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+CHECKPOINT_SUFFIX = "_watch"
+
+
+@dataclass
+class WatchedFolder:
+    """Input folder with the profile it is processed with"""
+    path: str
+    journal_name: str
+    journal_key: str
+    doc_type: str
+    output_folder: str
+    checkpoint: Optional[RunCheckpoint] = None
+    report: Optional[IncrementalReportWriter] = None
+
+
+class ReadinessTracker:
+    """Debounces files that are still being written"""
+
+    def __init__(self, settle_seconds: float):
+        self.settle_seconds = settle_seconds
+        # path -> (size, mtime_ns, time the pair was first seen)
+        self._seen: Dict[str, Tuple[int, int, float]] = {}
+
+    def observe(self, path: str, size: int, mtime_ns: int, now: float) -> bool:
+        """Record the current state of a file and tell whether it has settled"""
+        previous = self._seen.get(path)
+        if previous is None or previous[:2] != (size, mtime_ns):
+            self._seen[path] = (size, mtime_ns, now)
+            return self.settle_seconds <= 0
+        return now - previous[2] >= self.settle_seconds
+
+    def forget(self, path: str):
+        self._seen.pop(path, None)
+
+    def retain(self, paths):
+        """Forget the files that are gone (deleted or renamed before they settled)"""
+        for path in set(self._seen) - set(paths):
+            del self._seen[path]
+
+    @property
+    def pending(self) -> bool:
+        """Files are waiting to settle"""
+        return bool(self._seen)
+
+
+def _is_complete_workbook(path: str) -> bool:
+    # the zip central directory is written last, so a partial copy is not a valid archive
+    try:
+        return zipfile.is_zipfile(path)
+    except OSError:
+        return False
+
+
+def _is_workbook_name(name: str) -> bool:
+    # skip Excel lock files (~$name.xlsx) and hidden temporary copies
+    return name.lower().endswith(".xlsx") and not name.startswith(("~$", "."))
+
+
+def scan_workbooks(folder: str) -> List[Tuple[str, int, int]]:
+    """(path, size, mtime_ns) of the workbooks in a folder"""
+    found = []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if not entry.is_file() or not _is_workbook_name(entry.name):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                found.append((entry.path, stat.st_size, stat.st_mtime_ns))
+    except FileNotFoundError:
+        logging.warning(f"Watched folder {folder} does not exist")
+    return sorted(found)
+
+
+class ChangeWaiter:
+    """Blocks until a watched folder changes (inotify) or the poll interval has passed"""
+
+    def __init__(self, folders: List[str], poll_interval: float):
+        self.poll_interval = poll_interval
+        self._inotify = None
+        if INotify is not None:
+            self._inotify = INotify()
+            mask = (inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO |
+                    inotify_flags.CREATE | inotify_flags.MODIFY)
+            for folder in folders:
+                try:
+                    self._inotify.add_watch(folder, mask)
+                except OSError as e:
+                    # still scanned every poll interval, in case it appears
+                    logging.warning(f"Cannot watch {folder}: {e}")
+            logging.info("Watching with inotify")
+        else:
+            logging.info(f"inotify_simple not installed, polling every {poll_interval}s")
+
+    def wait(self, timeout: float):
+        """Return after a change or after timeout seconds (at most the poll interval)"""
+        timeout = min(timeout, self.poll_interval)
+        if self._inotify is not None:
+            self._inotify.read(timeout=int(timeout * 1000))
+        else:
+            time.sleep(timeout)
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+
+
+def _init_worker():
+    # Ctrl+C is handled by the daemon, which lets the workbooks in progress finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _replace_outputs(temp_xml: str, final_xml: str):
+    os.replace(csv_output_path(temp_xml), csv_output_path(final_xml))
+    os.replace(temp_xml, final_xml)
+
+
+def process_ready_workbook(xlsx_path: str, journal_key: str, doc_type: str, output_folder: str,
+                           meta_folder: Optional[str], export: Optional[Tuple[str, str, str]] = None
+                           ) -> Tuple[str, dict, Optional[str]]:
+    """
+    Process one workbook (runs in a worker process)
+
+    Args:
+        export: (dataset folder, journal name, format) to also write the columnar export
+
+    Returns:
+        (checkpoint status, report row, path of the XML output or None)
+    """
+    filename = os.path.basename(xlsx_path)
+    base_name = os.path.splitext(filename)[0]
+    config = get_footnote_config(journal_key, doc_type)
+
+    meta_info = {"number_of_references": 0, "biggest_label_number": 0, "has_meta_file": False}
+    if meta_folder:
+        json_file = os.path.join(meta_folder, base_name + ".json")
+        if os.path.exists(json_file):
+            with open(json_file, "r", encoding="utf-8") as jf:
+                if json.load(jf).get("skipped", False) is True:
+                    return STATUS_SKIPPED, None, None
+            meta_info = footnoteProcessor(config).extract_meta_info(json_file)
+
+    row_data = {
+        "Issue_Number": extract_issue_number_from_filename(filename),
+        "Filename": filename,
+        "Meta_References_Count": meta_info["number_of_references"],
+        "Meta_biggest_label_number": meta_info["biggest_label_number"],
+        "Collected_Footnotes_Count": 0,
+        "Has_Meta_File": meta_info["has_meta_file"],
+        "Processing_Status": "Processed"
+    }
+
+    output_xml = os.path.join(output_folder, base_name + "_footnotes.xml")
+    temp_xml = os.path.join(output_folder, f".{base_name}_footnotes.{os.getpid()}.partial.xml")
+    try:
+        # the processor reports its decisions with print; keep the daemon log readable
+        with contextlib.redirect_stdout(io.StringIO()), FootnoteCsvWriter(csv_output_path(temp_xml)) as csv_writer:
+            all_footnotes, main_texts = footnoteProcessor(config).process_workbook(xlsx_path,
+                                                                                   csv_writer.write_main_text)
+            csv_writer.write_footnotes(all_footnotes)
+        build_footnotes_xml(all_footnotes, main_texts).write(temp_xml, encoding="utf-8", xml_declaration=True)
+        _replace_outputs(temp_xml, output_xml)
+        logging.info(f"footnotes and main text saved to {output_xml}")
+        if export is not None:
+            export_root, journal_name, fmt = export
+            export_issue(all_footnotes, main_texts, export_root, journal_name, row_data["Issue_Number"], fmt)
+        row_data["Collected_Footnotes_Count"] = len(all_footnotes)
+    except Exception as e:
+        for path in (temp_xml, csv_output_path(temp_xml)):
+            if os.path.exists(path):
+                os.remove(path)
+        row_data["Processing_Status"] = f"Error: {str(e)}"
+        return STATUS_ERROR, row_data, None
+
+    return STATUS_DONE, row_data, output_xml
+
+
+class DatabaseImporter:
+    """Imports finished XML outputs into MySQL, one transaction per workbook"""
+
+    def __init__(self):
+        import mysql_import
+        self._mysql_import = mysql_import
+        self.conn = mysql_import.connect_to_db()
+        if self.conn is None:
+            raise ConnectionError("Could not connect to the database")
+
+    def import_xml(self, xml_path: str) -> bool:
+        try:
+            imported = self._mysql_import.import_xml_file(self.conn, xml_path, commit=False)
+        except Exception as e:
+            logging.error(f"Database import of {xml_path} failed: {e}")
+            imported = False
+        if imported:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+        return imported
+
+    def close(self):
+        self.conn.close()
+
+
+class WatchDaemon:
+    """Scans the watched folders, queues settled workbooks and collects the results"""
+
+    def __init__(self, input_dirs: List[str], output_folder: str, meta_folder: Optional[str] = None,
+                 workers: Optional[int] = None, settle_seconds: float = 2.0, poll_interval: float = 1.0,
+                 importer: Optional[DatabaseImporter] = None, export_format: Optional[str] = None,
+                 export_dir: Optional[str] = None):
+        self.output_folder = output_folder
+        self.meta_folder = meta_folder
+        self.workers = workers
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.importer = importer
+        self.export_format = export_format
+        self.export_dir = export_dir or os.path.join(output_folder, "dataset")
+        self.tracker = ReadinessTracker(settle_seconds)
+        self._in_flight = {}  # future -> (folder, path, size, mtime_ns, started)
+
+        os.makedirs(output_folder, exist_ok=True)
+        self.folders: List[WatchedFolder] = []
+        # one checkpoint and report per journal, shared by its scanned and printed folders
+        journals: Dict[str, Tuple[RunCheckpoint, IncrementalReportWriter]] = {}
+        for input_dir in input_dirs:
+            journal_name = extract_journal_name_from_path(os.path.abspath(input_dir))
+            if journal_name not in journals:
+                checkpoint = RunCheckpoint(checkpoint_path(output_folder, journal_name, CHECKPOINT_SUFFIX), resume=True)
+                report_path = os.path.join(output_folder, f"{journal_name}{CHECKPOINT_SUFFIX}_report.csv")
+                journals[journal_name] = (checkpoint, IncrementalReportWriter(report_path, REPORT_HEADERS,
+                                                                              checkpoint.latest_rows()))
+            checkpoint, report = journals[journal_name]
+            doc_type = detect_doc_type(input_dir)
+            folder_output = os.path.join(output_folder, doc_type)
+            os.makedirs(folder_output, exist_ok=True)
+            self.folders.append(WatchedFolder(input_dir, journal_name, detect_journal_key(input_dir),
+                                              doc_type, folder_output, checkpoint, report))
+
+    @staticmethod
+    def checkpoint_key(path: str) -> str:
+        """Workbooks are journaled by path, the folders of a journal may hold workbooks of the same name"""
+        return os.path.abspath(path)
+
+    def _is_current(self, folder: WatchedFolder, path: str, size: int, mtime_ns: int) -> bool:
+        # journaled with the same size and time: done, skipped or failed on this very file
+        entry = folder.checkpoint.entries.get(self.checkpoint_key(path))
+        return entry is not None and entry.get("size") == size and entry.get("mtime_ns") == mtime_ns
+
+    def scan(self, executor: ProcessPoolExecutor, now: float) -> int:
+        """Queue every settled workbook that was not processed yet; returns the number queued"""
+        busy = {item[1] for item in self._in_flight.values()}
+        workbooks = [(folder, scan_workbooks(folder.path)) for folder in self.folders]
+        self.tracker.retain(path for _, found in workbooks for path, _, _ in found)
+        queued = 0
+        for folder, found in workbooks:
+            for path, size, mtime_ns in found:
+                filename = os.path.basename(path)
+                if path in busy or self._is_current(folder, path, size, mtime_ns):
+                    continue
+                if not self.tracker.observe(path, size, mtime_ns, now):
+                    continue
+                self.tracker.forget(path)
+                if not _is_complete_workbook(path):
+                    row_data = {"Filename": filename, "Processing_Status": "Error: not a complete .xlsx file"}
+                    self._record(folder, path, size, mtime_ns, STATUS_ERROR, row_data, 0.0)
+                    continue
+                export = None
+                if self.export_format:
+                    export = (os.path.join(self.export_dir, folder.doc_type), folder.journal_name, self.export_format)
+                future = executor.submit(process_ready_workbook, path, folder.journal_key, folder.doc_type,
+                                         folder.output_folder, self.meta_folder, export)
+                self._in_flight[future] = (folder, path, size, mtime_ns, time.perf_counter())
+                logging.info(f"Queued {filename}")
+                queued += 1
+        return queued
+
+    def collect(self) -> int:
+        """Journal the finished workbooks; returns the number collected"""
+        finished = [future for future in self._in_flight if future.done()]
+        for future in finished:
+            folder, path, size, mtime_ns, started = self._in_flight.pop(future)
+            filename = os.path.basename(path)
+            try:
+                status, row_data, output_xml = future.result()
+            except Exception as e:
+                # the worker itself died (e.g. out of memory)
+                status, output_xml = STATUS_ERROR, None
+                row_data = {"Filename": filename, "Processing_Status": f"Error: {str(e)}"}
+
+            if output_xml and self.importer is not None and not self.importer.import_xml(output_xml):
+                row_data["Processing_Status"] = "Processed, database import failed"
+                status = STATUS_ERROR
+
+            self._record(folder, path, size, mtime_ns, status, row_data, time.perf_counter() - started)
+        return len(finished)
+
+    def _record(self, folder: WatchedFolder, path: str, size: int, mtime_ns: int, status: str,
+                row_data: Optional[dict], seconds: float):
+        """Journal the result of a workbook and update the report"""
+        filename = os.path.basename(path)
+        key = self.checkpoint_key(path)
+        replaced = key in folder.checkpoint.entries
+        folder.checkpoint.record(key, status, row_data, seconds, size=size, mtime_ns=mtime_ns)
+        if replaced:
+            # a workbook processed again replaces its row
+            folder.report.rewrite(folder.checkpoint.latest_rows())
+        elif row_data is not None:
+            folder.report.write(row_data)
+
+        if status == STATUS_DONE:
+            logging.info(f"{filename}: {row_data['Collected_Footnotes_Count']} footnotes")
+        elif status == STATUS_SKIPPED:
+            logging.info(f"{filename}: skipped according to its meta file")
+        else:
+            logging.error(f"{filename}: {row_data['Processing_Status']}")
+
+    def run(self, once: bool = False):
+        """
+        Process workbooks until interrupted
+
+        Args:
+            once: Process the workbooks present now (without waiting for them to settle) and exit
+        """
+        if once:
+            self.tracker.settle_seconds = 0
+        waiter = None if once else ChangeWaiter([folder.path for folder in self.folders], self.poll_interval)
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as executor:
+                while True:
+                    self.scan(executor, time.monotonic())
+                    if once:
+                        while self._in_flight:
+                            time.sleep(0.1)
+                            self.collect()
+                        return
+                    self.collect()
+                    # wake up early enough to see files settle and results come in
+                    busy = self._in_flight or self.tracker.pending
+                    waiter.wait(min(self.settle_seconds, self.poll_interval) if busy else self.poll_interval)
+        except KeyboardInterrupt:
+            logging.info("Stopping, waiting for the workbooks in progress")
+            self.collect()
+        finally:
+            if waiter is not None:
+                waiter.close()
+            self.close()
+
+    def close(self):
+        for folder in self.folders:
+            folder.checkpoint.close()
+            folder.report.close()
+        if self.importer is not None:
+            self.importer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='watch-daemon',
+                                     description='Process Tesseract workbooks as soon as they appear in the watched folders')
+    parser.add_argument('input_dirs', nargs='+', help='Folders with Tesseract .xlsx workbooks to watch')
+    parser.add_argument('-o', help='Output folder for the reports, the XML/CSV files go to a subfolder per '
+                                   'document type', dest='output', required=True)
+    parser.add_argument('-m', help='Metadata folder with <issue>.json files', dest='meta_dir', required=False)
+    parser.add_argument('--db', help='Import every finished workbook into MySQL', action='store_true')
+    parser.add_argument('-j', help='Worker processes, default: number of CPUs', dest='workers', type=int)
+    parser.add_argument('--settle', help='Seconds a workbook must stay unchanged before it is read, '
+                                         'default: %(default)s', type=float, default=2.0)
+    parser.add_argument('--poll-interval', help='Seconds between folder scans, default: %(default)s',
+                        dest='poll_interval', type=float, default=1.0)
+    parser.add_argument('--once', help='Process the workbooks present now and exit', action='store_true')
+    parser.add_argument('--export', choices=EXPORT_FORMATS,
+                        help='Also write a partitioned columnar dataset of footnotes and main text')
+    parser.add_argument('--export-dir', dest='export_dir',
+                        help='Dataset folder, with a subfolder per document type, default: <output folder>/dataset')
+    args = parser.parse_args()
+    if args.export:
+        try:
+            check_export_format(args.export)
+        except ValueError as e:
+            parser.error(str(e))
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    importer = DatabaseImporter() if args.db else None
+    daemon = WatchDaemon(args.input_dirs, args.output, args.meta_dir, args.workers,
+                         args.settle, args.poll_interval, importer, args.export, args.export_dir)
+    daemon.run(once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,135 @@
 import fitz  # PyMuPDF
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment
 from bidi.algorithm import get_display
+import argparse
+import csv
+import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby, islice
+from operator import itemgetter
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # only needed for --format parquet
+    pa = None
+    pq = None
 
 pdf_text = r'C:/NikWorckSpase/Testingfiles/26580476 - Copy (6).pdf'
 output_xlsx_path = pdf_text.replace(".pdf", "_styled_text.xlsx")
 
-def extract_text_with_styles(pdf_text):
+HEBREW_CHAR = re.compile(r'[\u0590-\u05FF]')
+EXCEL_ILLEGAL_CHARS = re.compile(r'[\x00-\x1F\x7F-\x9F]')
+
+# columns of the unstyled (CSV / Parquet) output
+TABLE_COLUMNS = ["Page", "Text", "FontSize", "FontName", "Bold", "Italic"]
+OUTPUT_FORMATS = ("xlsx", "csv", "parquet")
+
+# one row of the span table of a page
+SPAN_COLUMNS = ("block", "line", "text", "size", "font", "flags", "x0", "y0", "x1", "y1")
+SPAN_BLOCK, SPAN_LINE, SPAN_TEXT, SPAN_SIZE, SPAN_FONT, SPAN_FLAGS = range(6)
+
+def extract_text_with_styles(pdf_text, workers=1):
     """
     Extracts text, font size, font type, bold, and italic from each page in the given PDF file.
     Returns a list of dictionaries for each page, containing text and styling information.
     """
-    doc = fitz.open(pdf_text)
-    pages_data = []
-
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        page_data = []
-
-        # Process each text block with font info
-        for block in page.get_text("dict")["blocks"]:
-            if "lines" in block:  # This block contains text
-                block_text = ""  # Accumulate text with line breaks
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        # Collect text, font size, font name, bold, and italic information
-                        text = clean_text(span["text"])
-                        font_size = span["size"]
-                        font_name = span["font"]
-
-                        # Determine if text is bold or italic based on the font name
-                        is_bold = "Bold" in font_name or "bold" in font_name
-                        is_italic = "Italic" in font_name or "italic" in font_name
+    return list(iter_text_with_styles(pdf_text, workers))
 
-                        # Adjust display for mixed Hebrew and English directions
-                        #text = reorder_mixed_text(text)
+def iter_text_with_styles(pdf_text, workers=1):
+    """
+    Same as extract_text_with_styles, one page at a time, so a writer can flush
+    the rows of a page before the next one is read.
+    """
+    for spans in iter_page_spans(pdf_text, workers):
+        yield blocks_from_spans(spans)
 
-                        # Append text with line break after each line
-                        block_text += text + "\n"
+def page_spans(page):
+    """
+    Span table of a page: one tuple (SPAN_COLUMNS) per text span in reading
+    order of PyMuPDF, with its block and line number, font size, font name,
+    font flags and bounding box
+    """
+    spans = []
+    for block in page.get_text("dict")["blocks"]:
+        for line_num, line in enumerate(block.get("lines", ())):
+            for span in line["spans"]:
+                spans.append((block["number"], line_num, span["text"], span["size"], span["font"], span["flags"])
+                             + tuple(span["bbox"]))
+    return spans
+
+def _extract_page_range(pdf_path, start, stop):
+    """Span tables of pages start..stop-1, run in a worker process with its own document"""
+    doc = fitz.open(pdf_path)
+    try:
+        return [page_spans(doc.load_page(page_num)) for page_num in range(start, stop)]
+    finally:
+        doc.close()
+
+def iter_page_spans(pdf_path, workers=1):
+    """
+    Span tables of all pages, in page order
 
-                # Store each line with detailed styling info
-                page_data.append({
-                    "Text": block_text.strip(),  # Remove trailing newline
-                    "FontSize": font_size,
-                    "FontName": font_name,
-                    "Bold": is_bold,
-                    "Italic": is_italic
-                })
+    With more than one worker the pages are split into ranges that worker
+    processes extract in parallel (a fitz document cannot be shared between
+    processes, every range opens the file itself); the ranges are yielded in
+    order. Only about 2 * workers ranges are in flight at a time, so a slow
+    range holds back at most that many finished ones.
 
-        pages_data.append(page_data)
+    The span tables feed the export of this module; the footnote engine reads
+    the characters of a page itself (pdf_span_source).
+    """
+    with fitz.open(pdf_path) as doc:
+        page_count = len(doc)
+    if workers <= 1 or page_count < 2:
+        yield from _extract_page_range(pdf_path, 0, page_count)
+        return
+
+    # a few ranges per worker, so one slow range does not keep the others idle
+    range_size = max(1, -(-page_count // (workers * 4)))
+    ranges = iter([(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)])
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque(executor.submit(_extract_page_range, pdf_path, start, stop)
+                        for start, stop in islice(ranges, 2 * workers))
+        while pending:
+            range_spans = pending.popleft().result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(executor.submit(_extract_page_range, pdf_path, *next_range))
+            yield from range_spans
+
+def blocks_from_spans(spans):
+    """
+    Text blocks of a page from its span table
 
-    return pages_data
+    The style of a block is the style of its dominant span, the span with the
+    most characters (the first of them on a tie).
+    """
+    page_data = []
+    for _, block_spans in groupby(spans, key=itemgetter(SPAN_BLOCK)):
+        block_spans = list(block_spans)
+        dominant = max(block_spans, key=lambda span: len(span[SPAN_TEXT].strip()))
+        font_name = dominant[SPAN_FONT]
+
+        # Adjust display for mixed Hebrew and English directions
+        #text = reorder_mixed_text(text)
+
+        # Each span on a line of its own, as before
+        block_text = "\n".join(clean_text(span[SPAN_TEXT]) for span in block_spans)
+
+        page_data.append({
+            "Text": block_text.strip(),
+            "FontSize": dominant[SPAN_SIZE],
+            "FontName": font_name,
+            # Determine if text is bold or italic based on the font name
+            "Bold": "Bold" in font_name or "bold" in font_name,
+            "Italic": "Italic" in font_name or "italic" in font_name
+        })
+    return page_data
 
 def reorder_mixed_text(text):
     """
@@ -63,7 +141,7 @@ def reorder_mixed_text(text):
 
     for word in words:
         # Check if word contains Hebrew characters
-        if re.search(r'[\u0590-\u05FF]', word):
+        if HEBREW_CHAR.search(word):
             reordered_words.append(get_display(word[::-1]))  # Reverse Hebrew word
         else:
             reordered_words.append(word)  # English or other language, keep as is
@@ -76,45 +154,92 @@ def clean_text(text):
     Removes characters that are not allowed in Excel cells.
     """
     # Remove control characters and other non-printable characters
-    return re.sub(r'[\x00-\x1F\x7F-\x9F]', '', text)
+    return EXCEL_ILLEGAL_CHARS.sub('', text)
 
 def save_text_to_styled_xlsx(pages_data, output_xlsx_path):
     """
     Save text and styles to an Excel file with each page in a separate sheet.
     Sets entire sheet orientation to right-to-left for Hebrew text.
+
+    The workbook is written in write-only mode: pages_data may be a generator
+    (iter_text_with_styles), the rows of a page are flushed as it is written.
+    Cells with the same (font, size, bold, italic) share one Font object.
     """
-    wb = Workbook()
+    wb = Workbook(write_only=True)
+    fonts = {}
+    alignment = Alignment(horizontal="right", wrap_text=True)  # Right-align and wrap text
+
     for i, page_data in enumerate(pages_data, start=1):
         ws = wb.create_sheet(title=f"Page_{i}")
 
         # Set the sheet orientation to right-to-left if needed
         ws.sheet_view.rightToLeft = True
 
-        row_num = 1
-
         for line_data in page_data:
             # Write the text with font name, size, bold, and italic properties
-            cell = ws.cell(row=row_num, column=1, value=line_data["Text"])
-            cell.font = Font(
-                name=line_data["FontName"],
-                size=line_data["FontSize"],
-                bold=line_data["Bold"],
-                italic=line_data["Italic"]
-            )
-            cell.alignment = Alignment(horizontal="right", wrap_text=True)  # Right-align and wrap text
-
-            row_num += 1  # Move to the next row
-
-    # Remove default sheet created by openpyxl
-    if "Sheet" in wb.sheetnames:
-        wb.remove(wb["Sheet"])
+            key = (line_data["FontName"], line_data["FontSize"], line_data["Bold"], line_data["Italic"])
+            font = fonts.get(key)
+            if font is None:
+                font = fonts[key] = Font(name=key[0], size=key[1], bold=key[2], italic=key[3])
+            cell = WriteOnlyCell(ws, value=line_data["Text"])
+            cell.font = font
+            cell.alignment = alignment
+            ws.append([cell])
 
     wb.save(output_xlsx_path)
     print(f"Text with styles (bold and italic) successfully saved to {output_xlsx_path}")
 
-def extract_pdf_to_styled_excel():
-    pages_data = extract_text_with_styles(pdf_text)
-    save_text_to_styled_xlsx(pages_data, output_xlsx_path)
+def save_text_to_table(pages_data, output_path, output_format="csv"):
+    """
+    Save the text blocks without styling to a CSV or Parquet file, one row per block
+    with the page number and the style columns (TABLE_COLUMNS).
+
+    Rows are written page by page, like save_text_to_styled_xlsx.
+    """
+    if output_format == "csv":
+        with open(output_path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(TABLE_COLUMNS)
+            for page_num, page_data in enumerate(pages_data, start=1):
+                writer.writerows([page_num] + [line_data[column] for column in TABLE_COLUMNS[1:]]
+                                 for line_data in page_data)
+    elif output_format == "parquet":
+        if pq is None:
+            raise ValueError("Parquet output needs pyarrow (pip install pyarrow)")
+        schema = pa.schema([("Page", pa.int32()), ("Text", pa.string()), ("FontSize", pa.float64()),
+                            ("FontName", pa.string()), ("Bold", pa.bool_()), ("Italic", pa.bool_())])
+        with pq.ParquetWriter(output_path, schema) as writer:
+            for page_num, page_data in enumerate(pages_data, start=1):
+                columns = {column: [line_data[column] for line_data in page_data] for column in TABLE_COLUMNS[1:]}
+                columns["Page"] = [page_num] * len(page_data)
+                writer.write_table(pa.table(columns, schema=schema))
+    else:
+        raise ValueError(f"Unknown output format: {output_format}")
+    print(f"Text successfully saved to {output_path}")
+
+def extract_pdf_to_styled_excel(pdf_path=pdf_text, output_path=output_xlsx_path, output_format="xlsx", workers=1):
+    pages_data = iter_text_with_styles(pdf_path, workers)
+    if output_format == "xlsx":
+        save_text_to_styled_xlsx(pages_data, output_path)
+    else:
+        save_text_to_table(pages_data, output_path, output_format)
+
+def main():
+    parser = argparse.ArgumentParser(prog='printed-pdf', description='Export the text and styles of a printed PDF')
+    parser.add_argument('pdf', nargs='?', default=pdf_text, help='PDF file')
+    parser.add_argument('-o', '--output', help='Output file (default: next to the PDF)')
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default="xlsx",
+                        help='xlsx with styles, or csv / parquet without them (default xlsx)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='Processes extracting pages in parallel (default: number of CPUs)')
+    args = parser.parse_args()
+
+    suffix = "_styled_text.xlsx" if args.format == "xlsx" else f"_text.{args.format}"
+    output_path = args.output or os.path.splitext(args.pdf)[0] + suffix
+    try:
+        extract_pdf_to_styled_excel(args.pdf, output_path, args.format, args.workers)
+    except ValueError as e:
+        print(e)
 
 if __name__ == "__main__":
-    extract_pdf_to_styled_excel()
+    main()